@@ -1,26 +1,58 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Request, request, jsonify, Response, send_from_directory, stream_with_context
+from werkzeug.exceptions import RequestEntityTooLarge
+from tempfile import SpooledTemporaryFile
+from dotenv import load_dotenv
+import shutil
+import json
+import os
 from flask_cors import CORS
-from firebase_config import initialize_firebase
+from storage_backend import get_storage_backend, LocalStorageBackend
 from models import init_db
-from auth import AuthService
-from product_service import ProductService
+from migrations import run_migrations
+from auth import AuthService, iter_csv_rows, iter_ndjson_rows
+from password_hashing import HashingBusyError
+from mailer import mailer
+from image_worker import image_worker
+from product_service import ProductService, MAX_UPLOAD_BYTES
 from contracts import (
-    SignupRequest, LoginRequest, VerifyEmailRequest, ResendEmailVerificationTokenRequest,
-    CreateProductRequest, ProductListRequest, PlaceOrderRequest, OrderListRequest,
-    UpdateOrderStatusRequest
+    SignupRequest, LoginRequest, ChangePasswordRequest, VerifyEmailRequest, ResendEmailVerificationTokenRequest,
+    CreateProductRequest, ProductListRequest, PlaceOrderRequest, OrderListRequest, OrderListResponse,
+    UpdateOrderStatusRequest, BulkUpdateOrderStatusRequest, CreateImageUploadsRequest, ConfirmImageUploadsRequest
 )
 from sqlalchemy.orm import Session
 from models import engine
+from read_routing import read_router, user_scope, CATALOG_SCOPE
 from functools import wraps
-from auth import verify_token
+from auth import verify_token, is_token_current, token_identity, token_cache
+from response_cache import catalog_cache, CachedResponse
+from serialization import dumps, json_response
+
+load_dotenv()
+
+UPLOAD_SPOOL_THRESHOLD_BYTES = int(os.getenv('UPLOAD_SPOOL_THRESHOLD_BYTES', str(512 * 1024)))
+
+class SpoolingRequest(Request):
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        # Keep small uploads in memory and spill anything larger to disk
+        return SpooledTemporaryFile(max_size=UPLOAD_SPOOL_THRESHOLD_BYTES, mode='rb+')
 
 app = Flask(__name__)
+app.request_class = SpoolingRequest
+# Enforced by werkzeug while the body is read, before anything is buffered
+app.config['MAX_CONTENT_LENGTH'] = MAX_UPLOAD_BYTES
 auth_service = AuthService()
 
-initialize_firebase()
+# Set up the storage client once at startup rather than on the first upload
+storage_backend = get_storage_backend()
 
 CORS(app, resources={r"/*": {"origins": ["https://artizon-ui.onrender.com", "http://localhost:3000"]}})
 
+@app.before_request
+def start_background_workers():
+    # From the serving process rather than at import, so forking servers
+    # start the threads in each worker
+    image_worker.start()
+
 def auth_required(f):
     @wraps(f)
     def decorated(*args, **kwargs):
@@ -34,14 +66,27 @@ def auth_required(f):
                 return jsonify({"error": "Invalid token type"}), 401
             
             payload = verify_token(token)
-            if not payload:
+            if not payload or not is_token_current(payload):
                 return jsonify({"error": "Invalid or expired token"}), 401
             
-            return f(payload, *args, **kwargs)
+            response = f(payload, *args, **kwargs)
+            if request.method not in ('GET', 'HEAD', 'OPTIONS'):
+                # Keep this user's reads on the primary until replicas catch up
+                read_router.record_write(user_scope(payload['sub']))
+            return response
         except Exception as e:
             return jsonify({"error": str(e)}), 401
     return decorated
 
+def cached_json_response(cached: CachedResponse):
+    response = Response(cached.body, mimetype='application/json')
+    response.set_etag(cached.etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    if request.if_none_match.contains(cached.etag):
+        response.status_code = 304
+        response.set_data(b'')
+    return response
+
 @app.route('/auth/signup', methods=['POST'])
 def signup():
     try:
@@ -50,6 +95,8 @@ def signup():
         return jsonify(result), 201
     except ValueError as e:
         return jsonify({"error": str(e)}), 400
+    except HashingBusyError as e:
+        return jsonify({"error": str(e)}), 503, {"Retry-After": "1"}
     except Exception as e:
         return jsonify({"error": "Internal server error"}), 500
 
@@ -61,6 +108,35 @@ def login():
         return jsonify(result)
     except ValueError as e:
         return jsonify({"error": str(e)}), 401
+    except HashingBusyError as e:
+        return jsonify({"error": str(e)}), 503, {"Retry-After": "1"}
+    except Exception as e:
+        return jsonify({"error": "Internal server error"}), 500
+
+@app.route('/auth/change-password', methods=['POST'])
+@auth_required
+def change_password(payload):
+    try:
+        request_data = ChangePasswordRequest(**request.json)
+        result = auth_service.change_password(
+            int(payload['sub']), request_data.current_password, request_data.new_password
+        )
+        return jsonify(result)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except HashingBusyError as e:
+        return jsonify({"error": str(e)}), 503, {"Retry-After": "1"}
+    except Exception as e:
+        return jsonify({"error": "Internal server error"}), 500
+
+@app.route('/auth/logout', methods=['POST'])
+@auth_required
+def logout(payload):
+    try:
+        result = auth_service.logout(int(payload['sub']))
+        return jsonify(result)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         return jsonify({"error": "Internal server error"}), 500
 
@@ -86,23 +162,46 @@ def resend_verification():
     except Exception as e:
         return jsonify({"error": "Internal server error"}), 500
     
+@app.route('/auth/import', methods=['POST'])
+@auth_required
+def import_users(payload):
+    # Streams one NDJSON result per input row, then a summary line
+    identity = token_identity(payload)
+    if not identity or identity['user_type'] != 'admin':
+        return jsonify({'error': 'Only admins can import users'}), 403
+
+    content_type = request.mimetype
+    if content_type == 'text/csv':
+        rows = iter_csv_rows(request.stream)
+    elif content_type in ('application/x-ndjson', 'application/jsonl'):
+        rows = iter_ndjson_rows(request.stream)
+    else:
+        return jsonify({'error': 'Content-Type must be text/csv or application/x-ndjson'}), 415
+
+    def generate():
+        try:
+            for result in auth_service.import_users(rows):
+                yield json.dumps(result) + '\n'
+        except Exception as e:
+            print(f"User import error: {str(e)}")
+            yield json.dumps({'error': 'Import aborted; rows without a result were not imported'}) + '\n'
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
 @app.route('/auth/profile', methods=['GET'])
 @auth_required
 def get_profile(payload):
     try:
-        user_id = int(payload['sub'])
-        from models import User
-        with Session(engine) as db:
-            user = db.get(User, user_id)
-            if not user:
-                return jsonify({'error': 'User not found'}), 404
-            profile = {
-                'first_name': user.first_name,
-                'last_name': user.last_name,
-                'email': user.email,
-                'user_type': user.user_type,
-            }
-            return jsonify(profile)
+        identity = token_identity(payload)
+        if not identity:
+            return jsonify({'error': 'User not found'}), 404
+        profile = {
+            'first_name': identity['first_name'],
+            'last_name': identity['last_name'],
+            'email': identity['email'],
+            'user_type': identity['user_type'],
+        }
+        return jsonify(profile)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -125,13 +224,15 @@ def create_product(payload):
             image_files = request.files.getlist('images')
             for image in image_files:
                 if image.filename:
-                    images.append((image.read(), image.filename))
+                    images.append((image.stream, image.filename))
         
         with Session(engine) as db:
             product_service = ProductService(db)
             result = product_service.create_product(request_data, user_id, images)
             
-        return jsonify(result.dict()), 201
+        return json_response(result, 201)
+    except RequestEntityTooLarge:
+        return jsonify({"error": f"Upload exceeds the {MAX_UPLOAD_BYTES} byte limit"}), 413
     except ValueError as e:
         return jsonify({"error": str(e)}), 400
     except Exception as e:
@@ -142,14 +243,21 @@ def get_all_products():
     try:
         request_data = ProductListRequest(
             page=int(request.args.get('page', 1)),
-            limit=int(request.args.get('limit', 10))
+            limit=int(request.args.get('limit', 10)),
+            cursor=request.args.get('cursor')
         )
 
-        with Session(engine) as db:
-            product_service = ProductService(db)
-            result = product_service.get_all_products(request_data)
+        cache_key = catalog_cache.key_for(request_data.page, request_data.limit, request_data.cursor)
+        cached = catalog_cache.get(cache_key)
+        if cached is None:
+            with read_router.session(CATALOG_SCOPE) as db:
+                product_service = ProductService(db)
+                result = product_service.get_all_products(request_data)
+            cached = catalog_cache.set(cache_key, dumps(result) + b'\n')
             
-        return jsonify(result.dict())
+        return cached_json_response(cached)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         return jsonify({"error": "Internal server error"}), 500
 
@@ -159,16 +267,53 @@ def get_my_products(payload):
     try:
         request_data = ProductListRequest(
             page=int(request.args.get('page', 1)),
-            limit=int(request.args.get('limit', 10))
+            limit=int(request.args.get('limit', 10)),
+            cursor=request.args.get('cursor')
         )
         
         user_id = int(payload['sub'])
 
-        with Session(engine) as db:
+        with read_router.session(user_scope(user_id), CATALOG_SCOPE) as db:
             product_service = ProductService(db)
             result = product_service.get_my_products(user_id, request_data)
             
-        return jsonify(result.dict())
+        return json_response(result)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": "Internal server error"}), 500
+
+@app.route('/products/<int:product_id>/images/upload-urls', methods=['POST'])
+@auth_required
+def create_image_uploads(payload, product_id):
+    try:
+        request_data = CreateImageUploadsRequest(**request.json)
+        user_id = int(payload['sub'])
+
+        with Session(engine) as db:
+            product_service = ProductService(db)
+            result = product_service.create_image_uploads(product_id, user_id, request_data)
+
+        return json_response(result, 201)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": "Internal server error"}), 500
+
+@app.route('/products/<int:product_id>/images/confirm', methods=['POST'])
+@auth_required
+def confirm_image_uploads(payload, product_id):
+    try:
+        request_data = ConfirmImageUploadsRequest(**request.json)
+        user_id = int(payload['sub'])
+
+        with Session(engine) as db:
+            product_service = ProductService(db)
+            result = product_service.confirm_image_uploads(product_id, user_id, request_data)
+
+        return json_response(result, 201)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         return jsonify({"error": "Internal server error"}), 500
 
@@ -199,7 +344,7 @@ def place_order(payload):
             from order_service import place_order as place_order_service
             result = place_order_service(db, request_data, customer_id)
             
-        return jsonify(result.dict()), 201
+        return json_response(result, 201)
     except ValueError as e:
         return jsonify({"error": str(e)}), 400
     except Exception as e:
@@ -210,19 +355,26 @@ def place_order(payload):
 def get_vendor_orders(payload):
     try:
         vendor_id = int(payload['sub'])
-        page = int(request.args.get('page', 1))
-        limit = int(request.args.get('limit', 10))
+        request_data = OrderListRequest(
+            page=int(request.args.get('page', 1)),
+            limit=int(request.args.get('limit', 10)),
+            cursor=request.args.get('cursor')
+        )
+        page, limit = request_data.page, request_data.limit
 
-        with Session(engine) as db:
+        with read_router.session(user_scope(vendor_id)) as db:
             from order_service import get_vendor_orders as get_vendor_orders_service
-            orders, total = get_vendor_orders_service(db, vendor_id, page, limit)
+            orders, total, next_cursor = get_vendor_orders_service(db, vendor_id, page, limit, request_data.cursor)
             
-            return jsonify({
-                "orders": [order.dict() for order in orders],
-                "total": total,
-                "page": page,
-                "total_pages": (total + limit - 1) // limit
-            })
+            return json_response(OrderListResponse(
+                orders=orders,
+                total=total,
+                page=page,
+                total_pages=(total + limit - 1) // limit,
+                next_cursor=next_cursor
+            ))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -231,22 +383,52 @@ def get_vendor_orders(payload):
 def get_my_orders(payload):
     try:
         customer_id = int(payload['sub'])
-        page = int(request.args.get('page', 1))
-        limit = int(request.args.get('limit', 10))
+        request_data = OrderListRequest(
+            page=int(request.args.get('page', 1)),
+            limit=int(request.args.get('limit', 10)),
+            cursor=request.args.get('cursor')
+        )
+        page, limit = request_data.page, request_data.limit
 
-        with Session(engine) as db:
+        with read_router.session(user_scope(customer_id)) as db:
             from order_service import get_customer_orders as get_customer_orders_service
-            orders, total = get_customer_orders_service(db, customer_id, page, limit)
+            orders, total, next_cursor = get_customer_orders_service(db, customer_id, page, limit, request_data.cursor)
             
-            return jsonify({
-                "orders": [order.dict() for order in orders],
-                "total": total,
-                "page": page,
-                "total_pages": (total + limit - 1) // limit
-            })
+            return json_response(OrderListResponse(
+                orders=orders,
+                total=total,
+                page=page,
+                total_pages=(total + limit - 1) // limit,
+                next_cursor=next_cursor
+            ))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@app.route('/orders/status', methods=['PATCH'])
+@auth_required
+def bulk_update_order_status(payload):
+    try:
+        request_data = BulkUpdateOrderStatusRequest(**request.json)
+        user_id = int(payload['sub'])
+
+        identity = token_identity(payload)
+        if not identity:
+            return jsonify({'error': 'User not found'}), 404
+
+        with Session(engine) as db:
+            from order_service import bulk_update_order_status as bulk_update_order_status_service
+            result = bulk_update_order_status_service(
+                db, request_data.order_ids, request_data.status, user_id, identity['user_type']
+            )
+
+        return json_response(result)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/orders/<int:order_id>/status', methods=['PATCH'])
 @auth_required
 def update_order_status(payload, order_id):
@@ -254,26 +436,61 @@ def update_order_status(payload, order_id):
         request_data = UpdateOrderStatusRequest(**request.json)
         user_id = int(payload['sub'])
         
+        identity = token_identity(payload)
+        if not identity:
+            return jsonify({'error': 'User not found'}), 404
+
         with Session(engine) as db:
-            from models import User
-            user = db.get(User, user_id)
-            if not user:
-                return jsonify({'error': 'User not found'}), 404
-            
             from order_service import update_order_status as update_order_status_service
-            result = update_order_status_service(db, order_id, request_data.status, user_id, user.user_type)
+            result = update_order_status_service(db, order_id, request_data.status, user_id, identity['user_type'])
             
-        return jsonify(result.dict())
+        return json_response(result)
     except ValueError as e:
         return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/media/<path:path>', methods=['GET'])
+def get_media(path):
+    # Serves files stored by the local storage stand-in
+    if not isinstance(storage_backend, LocalStorageBackend):
+        return jsonify({"error": "Not found"}), 404
+    return send_from_directory(storage_backend.root_dir, path)
+
+@app.route('/media/upload/<path:path>', methods=['PUT'])
+def put_media(path):
+    # Accepts signed direct uploads for the local storage stand-in
+    if not isinstance(storage_backend, LocalStorageBackend):
+        return jsonify({"error": "Not found"}), 404
+    try:
+        content_type = request.headers.get('Content-Type', '')
+        if not storage_backend.verify_upload_signature(
+            path, content_type, int(request.args.get('expires', 0)), request.args.get('signature', '')
+        ):
+            return jsonify({"error": "Invalid or expired upload URL"}), 403
+
+        with SpooledTemporaryFile(max_size=UPLOAD_SPOOL_THRESHOLD_BYTES, mode='rb+') as body:
+            shutil.copyfileobj(request.stream, body)
+            storage_backend.put(body, path)
+        return '', 200
+    except RequestEntityTooLarge:
+        return jsonify({"error": f"Upload exceeds the {MAX_UPLOAD_BYTES} byte limit"}), 413
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+@app.route('/stats', methods=['GET'])
+@auth_required
+def get_stats(payload):
+    identity = token_identity(payload)
+    if not identity or identity['user_type'] != 'admin':
+        return jsonify({'error': 'Only admins can view stats'}), 403
+    return jsonify({"token_cache": token_cache.stats(), "mail": mailer.stats()})
+
 @app.route('/')
 def home():
     return 'Service running - healthy'
 
 if __name__ == '__main__':
     init_db()
-    initialize_firebase()
+    run_migrations()
     app.run(debug=True)
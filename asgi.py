@@ -0,0 +1,344 @@
+"""
+Async serving mode: hypercorn asgi:application
+
+The hot routes run on the event loop. Database work goes through
+AsyncSession.run_sync over asyncpg, so the existing sync services run
+unchanged without holding a thread while they wait on the database.
+Routes that talk to object storage or hash passwords are awaited in
+worker threads, as are the catalog cache and write-mark calls, which go to
+Redis when it is configured. Every other route, and CORS preflight, is
+served by the WSGI app in app.py through asgiref.
+
+One blocking call is left on the event loop: with COUNT_STRATEGY=counter,
+the first listing read of a key seeds its row_counters row over the sync
+driver from inside run_sync (counts.CountProvider._seed). That happens once
+per key for the life of the database, not per request.
+"""
+from quart import Quart, request, jsonify, Response, send_from_directory
+from werkzeug.exceptions import HTTPException, RequestEntityTooLarge
+from asgiref.wsgi import WsgiToAsgi
+from functools import wraps
+from sqlalchemy.orm import Session
+import asyncio
+from app import app as wsgi_app, auth_service, storage_backend
+from models import engine
+from storage_backend import LocalStorageBackend
+from async_db import async_session, async_read_session
+from read_routing import read_router, user_scope, CATALOG_SCOPE
+from auth import verify_token, is_token_current, token_identity
+from password_hashing import HashingBusyError
+from product_service import ProductService, MAX_UPLOAD_BYTES
+from response_cache import catalog_cache
+from image_worker import image_worker
+from serialization import dumps, json_response
+from contracts import (
+    SignupRequest, LoginRequest, CreateProductRequest, ProductListRequest, PlaceOrderRequest,
+    OrderListRequest, OrderListResponse, UpdateOrderStatusRequest, BulkUpdateOrderStatusRequest
+)
+import order_service
+
+CORS_ORIGINS = {"https://artizon-ui.onrender.com", "http://localhost:3000"}
+
+app = Quart(__name__)
+app.config['MAX_CONTENT_LENGTH'] = MAX_UPLOAD_BYTES
+
+@app.before_serving
+async def start_background_workers():
+    image_worker.start()
+
+@app.after_request
+async def add_cors_headers(response):
+    # Mirrors the flask-cors setup in app.py; preflight is answered there
+    origin = request.headers.get('Origin')
+    if origin in CORS_ORIGINS:
+        response.headers['Access-Control-Allow-Origin'] = origin
+        response.vary.add('Origin')
+    return response
+
+def auth_required(f):
+    @wraps(f)
+    async def decorated(*args, **kwargs):
+        auth_header = request.headers.get('Authorization')
+        if not auth_header:
+            return jsonify({"error": "Missing authorization header"}), 401
+
+        try:
+            token_type, token = auth_header.split()
+            if token_type.lower() != 'bearer':
+                return jsonify({"error": "Invalid token type"}), 401
+
+            payload = verify_token(token)
+            # The token version check may query the database
+            if not payload or not await asyncio.to_thread(is_token_current, payload):
+                return jsonify({"error": "Invalid or expired token"}), 401
+
+            response = await f(payload, *args, **kwargs)
+            if request.method not in ('GET', 'HEAD', 'OPTIONS'):
+                await asyncio.to_thread(read_router.record_write, user_scope(payload['sub']))
+            return response
+        except Exception as e:
+            return jsonify({"error": str(e)}), 401
+    return decorated
+
+def _list_params(model):
+    return model(
+        page=int(request.args.get('page', 1)),
+        limit=int(request.args.get('limit', 10)),
+        cursor=request.args.get('cursor')
+    )
+
+@app.route('/auth/signup', methods=['POST'])
+async def signup():
+    try:
+        request_data = SignupRequest(**(await request.get_json()))
+        result = await asyncio.to_thread(auth_service.signup, request_data)
+        return jsonify(result), 201
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except HashingBusyError as e:
+        return jsonify({"error": str(e)}), 503, {"Retry-After": "1"}
+    except Exception as e:
+        return jsonify({"error": "Internal server error"}), 500
+
+@app.route('/auth/login', methods=['POST'])
+async def login():
+    try:
+        request_data = LoginRequest(**(await request.get_json()))
+        result = await asyncio.to_thread(auth_service.login, request_data)
+        return jsonify(result)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 401
+    except HashingBusyError as e:
+        return jsonify({"error": str(e)}), 503, {"Retry-After": "1"}
+    except Exception as e:
+        return jsonify({"error": "Internal server error"}), 500
+
+@app.route('/auth/profile', methods=['GET'])
+@auth_required
+async def get_profile(payload):
+    try:
+        identity = await asyncio.to_thread(token_identity, payload)
+        if not identity:
+            return jsonify({'error': 'User not found'}), 404
+        return jsonify({
+            'first_name': identity['first_name'],
+            'last_name': identity['last_name'],
+            'email': identity['email'],
+            'user_type': identity['user_type'],
+        })
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+def _create_product(request_data, user_id, images):
+    with Session(engine) as db:
+        return ProductService(db).create_product(request_data, user_id, images)
+
+@app.route('/products/create', methods=['POST'])
+@auth_required
+async def create_product(payload):
+    try:
+        product_data = await request.form
+        request_data = CreateProductRequest(
+            name=product_data.get('name'),
+            description=product_data.get('description'),
+            price=float(product_data.get('price'))
+        )
+
+        files = await request.files
+        images = [(image.stream, image.filename) for image in files.getlist('images') if image.filename]
+
+        # Staging or uploading the images is blocking file and storage I/O
+        result = await asyncio.to_thread(_create_product, request_data, int(payload['sub']), images)
+        return json_response(result, 201)
+    except RequestEntityTooLarge:
+        return jsonify({"error": f"Upload exceeds the {MAX_UPLOAD_BYTES} byte limit"}), 413
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": "Internal server error"}), 500
+
+def _cached_catalog_page(*params):
+    # The generation lookup and the entry lookup are both cache round trips
+    cache_key = catalog_cache.key_for(*params)
+    return cache_key, catalog_cache.get(cache_key)
+
+@app.route('/products', methods=['GET'])
+async def get_all_products():
+    try:
+        request_data = _list_params(ProductListRequest)
+
+        cache_key, cached = await asyncio.to_thread(
+            _cached_catalog_page, request_data.page, request_data.limit, request_data.cursor
+        )
+        if cached is None:
+            async with await async_read_session(CATALOG_SCOPE) as db:
+                result = await db.run_sync(lambda sync_db: ProductService(sync_db).get_all_products(request_data))
+            cached = await asyncio.to_thread(catalog_cache.set, cache_key, dumps(result) + b'\n')
+
+        response = Response(cached.body, mimetype='application/json')
+        response.set_etag(cached.etag)
+        response.headers['Cache-Control'] = 'no-cache'
+        if request.if_none_match.contains(cached.etag):
+            response.status_code = 304
+            response.set_data(b'')
+        return response
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": "Internal server error"}), 500
+
+@app.route('/products/my', methods=['GET'])
+@auth_required
+async def get_my_products(payload):
+    try:
+        request_data = _list_params(ProductListRequest)
+        user_id = int(payload['sub'])
+
+        async with await async_read_session(user_scope(user_id), CATALOG_SCOPE) as db:
+            result = await db.run_sync(lambda sync_db: ProductService(sync_db).get_my_products(user_id, request_data))
+
+        return json_response(result)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": "Internal server error"}), 500
+
+def _delete_product(product_id, user_id):
+    with Session(engine) as db:
+        ProductService(db).delete_product(product_id, user_id)
+
+@app.route('/products/<int:product_id>', methods=['DELETE'])
+@auth_required
+async def delete_product(payload, product_id):
+    try:
+        # Releasing the product's blobs may delete them from storage
+        await asyncio.to_thread(_delete_product, product_id, int(payload['sub']))
+        return jsonify({"message": "Product deleted successfully"}), 200
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": "Internal server error"}), 500
+
+def _place_order(request_data, customer_id):
+    with Session(engine) as db:
+        return order_service.place_order(db, request_data, customer_id)
+
+@app.route('/orders/place', methods=['POST'])
+@auth_required
+async def place_order(payload):
+    try:
+        request_data = PlaceOrderRequest(**(await request.get_json()))
+        customer_id = int(payload['sub'])
+
+        # Placing an order records write marks for every vendor, which may go to Redis
+        result = await asyncio.to_thread(_place_order, request_data, customer_id)
+
+        return json_response(result, 201)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+async def _order_list(user_id: int, list_orders):
+    request_data = _list_params(OrderListRequest)
+    page, limit = request_data.page, request_data.limit
+
+    async with await async_read_session(user_scope(user_id)) as db:
+        orders, total, next_cursor = await db.run_sync(list_orders, user_id, page, limit, request_data.cursor)
+
+    return json_response(OrderListResponse(
+        orders=orders,
+        total=total,
+        page=page,
+        total_pages=(total + limit - 1) // limit,
+        next_cursor=next_cursor
+    ))
+
+@app.route('/orders/vendor', methods=['GET'])
+@auth_required
+async def get_vendor_orders(payload):
+    try:
+        return await _order_list(int(payload['sub']), order_service.get_vendor_orders)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/orders/my', methods=['GET'])
+@auth_required
+async def get_my_orders(payload):
+    try:
+        return await _order_list(int(payload['sub']), order_service.get_customer_orders)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/orders/status', methods=['PATCH'])
+@auth_required
+async def bulk_update_order_status(payload):
+    try:
+        request_data = BulkUpdateOrderStatusRequest(**(await request.get_json()))
+        user_id = int(payload['sub'])
+
+        identity = await asyncio.to_thread(token_identity, payload)
+        if not identity:
+            return jsonify({'error': 'User not found'}), 404
+
+        async with async_session() as db:
+            result = await db.run_sync(
+                order_service.bulk_update_order_status,
+                request_data.order_ids, request_data.status, user_id, identity['user_type']
+            )
+
+        return json_response(result)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/orders/<int:order_id>/status', methods=['PATCH'])
+@auth_required
+async def update_order_status(payload, order_id):
+    try:
+        request_data = UpdateOrderStatusRequest(**(await request.get_json()))
+        user_id = int(payload['sub'])
+
+        identity = await asyncio.to_thread(token_identity, payload)
+        if not identity:
+            return jsonify({'error': 'User not found'}), 404
+
+        async with async_session() as db:
+            result = await db.run_sync(
+                order_service.update_order_status,
+                order_id, request_data.status, user_id, identity['user_type']
+            )
+
+        return json_response(result)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/media/<path:path>', methods=['GET'])
+async def get_media(path):
+    if not isinstance(storage_backend, LocalStorageBackend):
+        return jsonify({"error": "Not found"}), 404
+    return await send_from_directory(storage_backend.root_dir, path)
+
+_wsgi_fallback = WsgiToAsgi(wsgi_app)
+
+def _served_async(scope) -> bool:
+    if scope['method'] == 'OPTIONS':
+        return False
+    try:
+        app.url_map.bind('').match(scope['path'], method=scope['method'])
+    except HTTPException:
+        return False
+    return True
+
+async def application(scope, receive, send):
+    if scope['type'] == 'http' and not _served_async(scope):
+        await _wsgi_fallback(scope, receive, send)
+        return
+    await app(scope, receive, send)
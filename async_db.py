@@ -0,0 +1,38 @@
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine
+from models import DATABASE_URL, READ_DATABASE_URL, read_engine
+from read_routing import read_router
+from typing import Optional
+import asyncio
+
+def _asyncpg_url(url: str) -> str:
+    return make_url(url).set(drivername='postgresql+asyncpg').render_as_string(hide_password=False)
+
+def _create_async_engine(url: str, target_session_attrs: str) -> AsyncEngine:
+    return create_async_engine(
+        _asyncpg_url(url),
+        connect_args={
+            'ssl': 'require',
+            'target_session_attrs': target_session_attrs
+        },
+        pool_size=10,
+        max_overflow=20,
+        pool_timeout=30,
+        pool_recycle=1800,
+        pool_pre_ping=True
+    )
+
+# asyncpg counterparts of models.engine and models.read_engine for the ASGI app
+async_engine = _create_async_engine(DATABASE_URL, 'read-write')
+async_read_engine: Optional[AsyncEngine] = _create_async_engine(READ_DATABASE_URL, 'any') if READ_DATABASE_URL else None
+
+def async_session() -> AsyncSession:
+    return AsyncSession(async_engine)
+
+async def async_read_session(*scopes: str) -> AsyncSession:
+    """Async session on the engine read_router picks for these scopes."""
+    # The router may probe replica lag over the sync driver
+    engine = await asyncio.to_thread(read_router.engine_for, *scopes)
+    if async_read_engine is not None and engine is read_engine:
+        return AsyncSession(async_read_engine)
+    return AsyncSession(async_engine)
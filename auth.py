@@ -1,23 +1,42 @@
 from datetime import datetime, timedelta
 import jwt
-from werkzeug.security import generate_password_hash, check_password_hash
+from password_hashing import hash_password, hash_passwords, check_password, needs_rehash, HashingBusyError
 from dotenv import load_dotenv
 import os
 from models import User
 from sqlalchemy.orm import Session
-from sqlalchemy import select
+from sqlalchemy import select, update, insert
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import IntegrityError
 from models import engine
 from contracts import SignupRequest, LoginRequest
-import smtplib
+from enums import UserTypeEnum
+from pydantic import ValidationError
+from mailer import mailer
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
-from typing import cast
+from typing import IO, Iterable, Iterator, List, Optional, Tuple, cast
+from itertools import islice
+import json
+import csv
+import io
+from collections import OrderedDict
+import threading
+import hashlib
+import time
 
 load_dotenv()
 
 JWT_SECRET_KEY = os.getenv('JWT_SECRET_KEY')
 JWT_ALGORITHM = os.getenv('JWT_ALGORITHM')
 JWT_ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv('JWT_ACCESS_TOKEN_EXPIRE_MINUTES', '30'))
+TOKEN_CACHE_MAX_ENTRIES = int(os.getenv('TOKEN_CACHE_MAX_ENTRIES', '10000'))
+TOKEN_VERSION_CACHE_TTL_SECONDS = float(os.getenv('TOKEN_VERSION_CACHE_TTL_SECONDS', '5'))
+USER_IMPORT_BATCH_SIZE = int(os.getenv('USER_IMPORT_BATCH_SIZE', '500'))
+
+# Bump when the set of identity claims in access tokens changes
+ACCESS_CLAIMS_VERSION = 1
 
 def create_access_token(data: dict):
     to_encode = data.copy()
@@ -26,26 +45,165 @@ def create_access_token(data: dict):
     encoded_jwt = jwt.encode(to_encode, JWT_SECRET_KEY, algorithm=JWT_ALGORITHM)
     return encoded_jwt
 
+class TokenCache:
+    """
+    Bounded LRU of verified token payloads, keyed by a SHA-256 digest of the
+    token so raw tokens are never held. Entries expire with the token's exp.
+    """
+
+    def __init__(self, max_entries: int = 10000):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[bytes, dict]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, token: str) -> Optional[dict]:
+        key = hashlib.sha256(token.encode()).digest()
+        with self._lock:
+            payload = self._entries.get(key)
+            if payload is not None and payload['exp'] <= time.time():
+                del self._entries[key]
+                payload = None
+            if payload is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return dict(payload)
+
+    def put(self, token: str, payload: dict) -> None:
+        if not isinstance(payload.get('exp'), (int, float)):
+            return
+        key = hashlib.sha256(token.encode()).digest()
+        with self._lock:
+            self._entries[key] = dict(payload)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "size": len(self._entries)}
+
+token_cache = TokenCache(TOKEN_CACHE_MAX_ENTRIES)
+
 def verify_token(token: str):
+    payload = token_cache.get(token)
+    if payload is not None:
+        return payload
+
     try:
         payload = jwt.decode(token, JWT_SECRET_KEY, algorithms=[JWT_ALGORITHM])
-        return payload
     except jwt.ExpiredSignatureError:
         return None
     except jwt.InvalidTokenError:
         return None
 
+    token_cache.put(token, payload)
+    return payload
+
+def access_token_claims(user: User) -> dict:
+    """Identity claims embedded in access tokens so handlers need not load the user."""
+    return {
+        "sub": str(user.id),
+        "type": "access",
+        "cv": ACCESS_CLAIMS_VERSION,
+        "ver": user.token_version or 0,
+        "user_type": user.user_type,
+        "first_name": user.first_name,
+        "last_name": user.last_name,
+        "email": user.email,
+        "email_verified": bool(user.is_email_verified),
+    }
+
+def token_identity(payload: dict) -> Optional[dict]:
+    """
+    Identity claims of an access token. Tokens issued before the claims
+    were embedded fall back to loading the user; returns None if the user
+    no longer exists.
+    """
+    if payload.get("cv") == ACCESS_CLAIMS_VERSION:
+        return payload
+
+    with Session(engine) as session:
+        user = session.get(User, int(payload["sub"]))
+        if not user:
+            return None
+        return access_token_claims(user)
+
+class TokenVersionCache:
+    """
+    Short-lived per-process cache of users' token versions, so revocation
+    costs one query per user every few seconds rather than one per request.
+    Revocations made in another process are seen once the entry expires.
+    """
+
+    def __init__(self, ttl_seconds: float = 5.0):
+        self.ttl_seconds = ttl_seconds
+        self._entries: dict[int, tuple[int, float]] = {}
+        self._lock = threading.Lock()
+        # Bumped by invalidate() so a lookup that raced a revocation is not cached
+        self._generation = 0
+
+    def get(self, user_id: int) -> Optional[int]:
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry and entry[1] > time.monotonic():
+                return entry[0]
+            generation = self._generation
+
+        with Session(engine) as session:
+            version = session.scalar(select(User.token_version).where(User.id == user_id))
+        if version is None:
+            return None
+
+        with self._lock:
+            if self._generation != generation:
+                return version
+            self._entries[user_id] = (version, time.monotonic() + self.ttl_seconds)
+            # Expired entries are dropped lazily once the map grows
+            if len(self._entries) > TOKEN_CACHE_MAX_ENTRIES:
+                now = time.monotonic()
+                self._entries = {k: v for k, v in self._entries.items() if v[1] > now}
+        return version
+
+    def invalidate(self, user_id: int) -> None:
+        with self._lock:
+            self._entries.pop(user_id, None)
+            self._generation += 1
+
+token_versions = TokenVersionCache(TOKEN_VERSION_CACHE_TTL_SECONDS)
+
+def is_token_current(payload: dict) -> bool:
+    """False if the user is gone or their tokens were revoked after this one was issued."""
+    if "ver" not in payload:
+        # Issued before token versions existed; it expires on its own
+        return True
+    return token_versions.get(int(payload["sub"])) == payload["ver"]
+
+def revoke_user_tokens(session: Session, user: User) -> None:
+    """
+    Invalidate the user's outstanding access tokens. Commits the session,
+    with any other pending changes to the user, before dropping the cached
+    version so a concurrent request cannot cache the old one again.
+    """
+    user_id = user.id
+    user.token_version = User.token_version + 1
+    session.commit()
+    token_versions.invalidate(user_id)
+
 def get_password_hash(password: str) -> str:
-    return generate_password_hash(password)
+    return hash_password(password)
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return check_password_hash(hashed_password, plain_password)
+    return check_password(hashed_password, plain_password)
+
+def password_needs_rehash(hashed_password: str) -> bool:
+    return needs_rehash(hashed_password)
 
 def send_verification_email(email: str, token: str):
-    smtp_server = os.getenv('SMTP_SERVER')
-    smtp_port = int(os.getenv('SMTP_PORT'))
-    smtp_username = os.getenv('SMTP_USERNAME')
-    smtp_password = os.getenv('SMTP_PASSWORD')
+    """Queue the verification email; delivery happens on the mailer's workers."""
     from_email = os.getenv('SMTP_FROM_EMAIL')
     frontend_url = os.getenv('FRONTEND_URL')
 
@@ -68,11 +226,31 @@ def send_verification_email(email: str, token: str):
     
     msg.attach(MIMEText(body, 'plain'))
 
+    mailer.send(msg)
+
+IMPORT_FIELDS = ('email', 'password', 'first_name', 'last_name', 'user_type')
+
+def iter_csv_rows(stream: IO[bytes]) -> Iterator[dict]:
+    """Rows of a CSV upload with a header line, read incrementally."""
+    reader = csv.DictReader(io.TextIOWrapper(stream, encoding='utf-8-sig', newline=''))
+    for row in reader:
+        yield row
 
-    with smtplib.SMTP(smtp_server, smtp_port) as server:
-        server.starttls()
-        server.login(smtp_username, smtp_password)
-        server.send_message(msg)
+def iter_ndjson_rows(stream: IO[bytes]) -> Iterator[dict]:
+    """Objects of an NDJSON upload, one per line; unparseable lines come back as an error marker."""
+    for line in io.TextIOWrapper(stream, encoding='utf-8-sig'):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except json.JSONDecodeError as e:
+            row = {'_error': f"Invalid JSON: {e.msg}"}
+        yield row if isinstance(row, dict) else {'_error': "Each line must be a JSON object"}
+
+def _validation_message(error: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in err['loc'])}: {err['msg']}" for err in error.errors()
+    )
 
 class AuthService:
     def __init__(self):
@@ -80,88 +258,78 @@ class AuthService:
 
     def signup(self, request: SignupRequest):
         try:
+            hashed_password = get_password_hash(request.password)
+
+            values = dict(
+                email=request.email,
+                password_hash=hashed_password,
+                first_name=request.first_name,
+                last_name=request.last_name,
+                user_type=request.user_type,
+                is_email_verified=False,
+                token_version=0
+            )
+
+            # One round trip: the unique constraint on email rejects
+            # duplicates, including concurrent signups for the same address
             with Session(engine) as session:
-            
-                existing_user = session.scalar(
-                    select(User).where(User.email == request.email)
-                )
-                if existing_user:
+                try:
+                    user_id = session.scalar(insert(User).values(**values).returning(User.id))
+                    session.commit()
+                except IntegrityError:
                     raise ValueError("Email already registered")
 
-                hashed_password = get_password_hash(request.password)
-                new_user = User(
-                    email=request.email,
-                    password_hash=hashed_password,
-                    first_name=request.first_name,
-                    last_name=request.last_name,
-                    user_type=request.user_type,
-                    is_email_verified=False
-                )
-                
-                session.add(new_user)
-                session.commit()
-                session.refresh(new_user)
-            
-                verification_token = create_access_token(
-                    {"sub": str(new_user.id), "type": "email_verification"}
-                )
-            
-                # try:
-                #     send_verification_email(request.email, verification_token)
-                # except Exception as e:
-                #     print(f"Failed to send verification email: {e}")
+            new_user = User(id=user_id, **values)
 
-            
-                access_token = create_access_token(
-                    {"sub": str(new_user.id), "type": "access"}
-                )
+            verification_token = create_access_token(
+                {"sub": str(new_user.id), "type": "email_verification"}
+            )
+        
+            try:
+                send_verification_email(request.email, verification_token)
+            except Exception as e:
+                print(f"Failed to send verification email: {e}")
 
-                return {
-                    "user_id": str(new_user.id),
-                    "access_token": access_token,
-                    "token_type": "bearer"
-                }
-        except ValueError as ve:
+            access_token = create_access_token(access_token_claims(new_user))
+
+            return {
+                "user_id": str(new_user.id),
+                "access_token": access_token,
+                "token_type": "bearer"
+            }
+        except (ValueError, HashingBusyError) as ve:
             raise ve
         except Exception as e:
             print(f"Signup error: {str(e)}")
             raise Exception("An error occurred during signup")
 
-        access_token = create_access_token(
-            {"sub": str(new_user.id), "type": "access"}
-        )
-
-        return {
-            "user_id": str(new_user.id),
-            "access_token": access_token,
-            "token_type": "bearer"
-        }
     def login(self, request: LoginRequest):
         try:
         
+            # The session is closed before hashing so no connection is held
+            # while the KDF runs; the loaded user stays readable
             with Session(engine) as session:
             
                 user = session.scalar(
                     select(User).where(User.email == request.email)
                 )
                 
-                if not user:
-                    raise ValueError("Invalid email or password")
+            if not user:
+                raise ValueError("Invalid email or password")
 
-            
-                if not verify_password(request.password, str(user.password_hash)):
-                    raise ValueError("Invalid email or password")
+            if not verify_password(request.password, str(user.password_hash)):
+                raise ValueError("Invalid email or password")
 
-            
-                access_token = create_access_token(
-                    {"sub": str(user.id), "type": "access"}
-                )
+            if password_needs_rehash(str(user.password_hash)):
+                self._upgrade_password_hash(user.id, request.password)
 
-                return {
-                    "access_token": access_token,
-                    "token_type": "bearer"
-                }
-        except ValueError as ve:
+            access_token = create_access_token(access_token_claims(user))
+
+            return {
+                "access_token": access_token,
+                "token_type": "bearer"
+            }
+        except (ValueError, HashingBusyError) as ve:
         
             raise ve
         except Exception as e:
@@ -169,6 +337,80 @@ class AuthService:
             print(f"Login error: {str(e)}")
             raise Exception("An error occurred during login")
 
+    def _upgrade_password_hash(self, user_id: int, password: str) -> None:
+        """Re-hash with the configured parameters; best effort, login succeeds regardless."""
+        try:
+            password_hash = get_password_hash(password)
+            with Session(engine) as session:
+                session.execute(
+                    update(User).where(User.id == user_id).values(password_hash=password_hash)
+                )
+                session.commit()
+        except Exception as e:
+            print(f"Password rehash error for user {user_id}: {str(e)}")
+
+    def change_password(self, user_id: int, current_password: str, new_password: str):
+        """Set a new password and revoke every token issued so far; returns a fresh access token."""
+        try:
+            with Session(engine) as session:
+                user = session.get(User, user_id)
+
+            if not user:
+                raise ValueError("User not found")
+
+            if not verify_password(current_password, str(user.password_hash)):
+                raise ValueError("Current password is incorrect")
+
+            password_hash = get_password_hash(new_password)
+
+            with Session(engine) as session:
+                user = session.get(User, user_id)
+                if not user:
+                    raise ValueError("User not found")
+
+                user.password_hash = password_hash
+                revoke_user_tokens(session, user)
+                access_token = create_access_token(access_token_claims(user))
+
+            return {
+                "access_token": access_token,
+                "token_type": "bearer"
+            }
+        except (ValueError, HashingBusyError) as ve:
+            raise ve
+        except Exception as e:
+            print(f"Change password error: {str(e)}")
+            raise Exception("An error occurred while changing the password")
+
+    def logout(self, user_id: int):
+        """Access tokens are stateless, so logging out revokes all of the user's tokens."""
+        try:
+            with Session(engine) as session:
+                user = session.get(User, user_id)
+                if not user:
+                    raise ValueError("User not found")
+
+                revoke_user_tokens(session, user)
+
+            return {"message": "Logged out successfully"}
+        except ValueError as ve:
+            raise ve
+        except Exception as e:
+            print(f"Logout error: {str(e)}")
+            raise Exception("An error occurred during logout")
+
+    def change_user_type(self, email: str, user_type: UserTypeEnum):
+        """Move a user to another role; tokens carrying the old role are revoked."""
+        with Session(engine) as session:
+            user = session.scalar(select(User).where(User.email == email))
+            if not user:
+                raise ValueError("User not found")
+
+            user.user_type = user_type.value
+            revoke_user_tokens(session, user)
+
+        return {"message": f"{email} is now a {user_type.value}"}
+
     def verify_email(self, token: str):
         try:
             payload = verify_token(token)
@@ -182,8 +424,10 @@ class AuthService:
                 if not user:
                     raise ValueError("User not found")
 
-                user.is_email_verified = True
-                session.commit()
+                if not user.is_email_verified:
+                    user.is_email_verified = True
+                    # Outstanding tokens still claim the email is unverified
+                    revoke_user_tokens(session, user)
 
             return {"message": "Email verified successfully"}
         except ValueError as ve:
@@ -206,10 +450,90 @@ class AuthService:
                     {"sub": user_id, "type": "email_verification"}
                 )
 
-                # send_verification_email(user.email, verification_token)
+                send_verification_email(user.email, verification_token)
                 return {"message": "Verification email sent successfully"}
         except ValueError as ve:
             raise ve
         except Exception as e:
             print(f"Resend verification error: {str(e)}")
-            raise Exception("An error occurred while resending verification email")
\ No newline at end of file
+            raise Exception("An error occurred while resending verification email")
+
+    def import_users(self, rows: Iterable[dict]) -> Iterator[dict]:
+        """
+        Create accounts in bulk, yielding one result per input row in order.
+        Rows are handled USER_IMPORT_BATCH_SIZE at a time: validated as
+        signups, hashed in parallel, and inserted with a single statement
+        per batch that skips emails which already exist. Only one batch is
+        held in memory. Imported accounts get no verification email; users
+        can request one through /auth/resend-verification.
+        """
+        totals = {"created": 0, "conflict": 0, "invalid": 0}
+        row_number = 0
+        rows = iter(rows)
+        while True:
+            batch = list(islice(rows, USER_IMPORT_BATCH_SIZE))
+            if not batch:
+                break
+            for result in self._import_batch(list(enumerate(batch, start=row_number + 1))):
+                totals[result["status"]] += 1
+                yield result
+            row_number += len(batch)
+
+        yield {"summary": totals}
+
+    def _import_batch(self, batch: List[Tuple[int, dict]]) -> List[dict]:
+        results = {}
+        valid: List[Tuple[int, SignupRequest]] = []
+        seen_emails = set()
+        for row_number, row in batch:
+            if '_error' in row:
+                results[row_number] = {"row": row_number, "status": "invalid", "error": row['_error']}
+                continue
+            try:
+                signup = SignupRequest(**{field: row.get(field) for field in IMPORT_FIELDS})
+            except ValidationError as e:
+                results[row_number] = {
+                    "row": row_number, "email": row.get('email'), "status": "invalid",
+                    "error": _validation_message(e)
+                }
+                continue
+            if signup.email in seen_emails:
+                results[row_number] = {"row": row_number, "email": signup.email, "status": "conflict"}
+                continue
+            seen_emails.add(signup.email)
+            valid.append((row_number, signup))
+
+        if valid:
+            password_hashes = hash_passwords([signup.password for _, signup in valid])
+            with Session(engine) as session:
+                insert_users = pg_insert if session.get_bind().dialect.name == 'postgresql' else sqlite_insert
+                created = dict(session.execute(
+                    insert_users(User)
+                    .values([
+                        dict(
+                            email=signup.email,
+                            password_hash=password_hash,
+                            first_name=signup.first_name,
+                            last_name=signup.last_name,
+                            user_type=signup.user_type,
+                            is_email_verified=False,
+                            token_version=0,
+                            created_at_utc=datetime.utcnow()
+                        )
+                        for (_, signup), password_hash in zip(valid, password_hashes)
+                    ])
+                    .on_conflict_do_nothing(index_elements=[User.email])
+                    .returning(User.email, User.id)
+                ).all())
+                session.commit()
+
+            for row_number, signup in valid:
+                if signup.email in created:
+                    results[row_number] = {
+                        "row": row_number, "email": signup.email, "status": "created",
+                        "user_id": str(created[signup.email])
+                    }
+                else:
+                    results[row_number] = {"row": row_number, "email": signup.email, "status": "conflict"}
+
+        return [results[row_number] for row_number, _ in batch]
@@ -0,0 +1,100 @@
+"""
+Measures password check throughput with many concurrent logins, hashing
+inline in the request threads (the old behaviour) and on the process pool
+at several sizes. Alongside the logins a probe thread runs a small piece
+of pure-Python work, like any other request would, and reports how long
+it took: that is the latency the rest of the worker sees while a login
+burst is being hashed.
+
+Uses PASSWORD_HASH_METHOD; no database is needed.
+
+    python bench_hashing.py
+    python bench_hashing.py --callers 32 --processes 1,2,4 --seconds 5
+"""
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, List, Tuple
+from werkzeug.security import generate_password_hash, check_password_hash
+import password_hashing
+import multiprocessing
+import threading
+import argparse
+import json
+import time
+import os
+
+PROBE_PAYLOAD = {'products': [{'id': i, 'name': f'Product {i}', 'price': i * 1.5} for i in range(200)]}
+
+def percentile(values: List[float], fraction: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+def run(check: Callable[[], bool], callers: int, seconds: float) -> Tuple[float, float, float, float]:
+    """Checks per second, p50 and p99 check latency, and p99 probe latency, in milliseconds."""
+    stop = time.perf_counter() + seconds
+    latencies: List[float] = []
+    probes: List[float] = []
+    lock = threading.Lock()
+
+    def login():
+        while time.perf_counter() < stop:
+            started = time.perf_counter()
+            check()
+            with lock:
+                latencies.append(time.perf_counter() - started)
+
+    def probe():
+        while time.perf_counter() < stop:
+            started = time.perf_counter()
+            json.dumps(PROBE_PAYLOAD)
+            probes.append(time.perf_counter() - started)
+            time.sleep(0.01)
+
+    threads = [threading.Thread(target=login) for _ in range(callers)] + [threading.Thread(target=probe)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    return (
+        len(latencies) / elapsed,
+        percentile(latencies, 0.5) * 1000,
+        percentile(latencies, 0.99) * 1000,
+        percentile(probes, 0.99) * 1000
+    )
+
+def main() -> None:
+    cpus = os.cpu_count() or 1
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--callers', type=int, default=4 * cpus, help='concurrent login threads')
+    parser.add_argument('--processes', default=','.join(str(n) for n in sorted({1, max(1, cpus // 2), cpus})))
+    parser.add_argument('--seconds', type=float, default=5.0, help='duration of each run')
+    args = parser.parse_args()
+
+    password = 'correct horse battery staple'
+    password_hash = generate_password_hash(password, password_hashing.PASSWORD_HASH_METHOD)
+    # Every caller gets a queue slot; this measures throughput, not load shedding
+    password_hashing._pending = threading.BoundedSemaphore(args.callers)
+
+    print(f"{password_hashing.PASSWORD_HASH_METHOD}, {args.callers} concurrent logins, {cpus} CPUs")
+    print(f"{'hashing':>12}  {'checks/s':>8}  {'p50':>9}  {'p99':>9}  {'probe p99':>9}")
+
+    def report(label: str, result: Tuple[float, float, float, float]) -> None:
+        print(f"{label:>12}  {result[0]:>8.1f}  {result[1]:>7.1f}ms  {result[2]:>7.1f}ms  {result[3]:>7.2f}ms")
+
+    report('inline', run(lambda: check_password_hash(password_hash, password), args.callers, args.seconds))
+
+    for processes in sorted({int(n) for n in args.processes.split(',')}):
+        password_hashing._executor = ProcessPoolExecutor(
+            max_workers=processes, mp_context=multiprocessing.get_context('spawn')
+        )
+        # Start the workers before timing
+        for future in [password_hashing._executor.submit(int) for _ in range(processes)]:
+            future.result()
+        report(f'{processes} processes', run(
+            lambda: password_hashing.check_password(password_hash, password), args.callers, args.seconds
+        ))
+        password_hashing._executor.shutdown()
+
+if __name__ == '__main__':
+    main()
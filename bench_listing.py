@@ -0,0 +1,121 @@
+"""
+Counts the SQL statements and times one product listing page against
+DATABASE_URL, with images and thumbnails batch-loaded as the service does
+and, for comparison, lazy-loaded one product at a time. Batch loading
+should need the same handful of statements at every page size.
+
+The products are inserted in a transaction that is rolled back at the end,
+so nothing is left behind.
+
+    python bench_listing.py
+    python bench_listing.py --products 200 --images 3 --repeat 20
+"""
+from datetime import datetime, timedelta
+from typing import Callable, List, Tuple
+from sqlalchemy import event, insert, select, text
+from sqlalchemy.orm import Session
+from models import engine, User, Product, ProductImage, ProductImageVariant
+from contracts import ProductListRequest, ProductListResponse, ProductResponse
+from counts import CountProvider, owner_products_key
+from pagination import paginate, next_cursor
+import product_service
+import argparse
+import statistics
+import time
+import uuid
+
+PAGE_SIZES = (10, 50, 100)
+
+def seed(db: Session, products: int, images: int) -> int:
+    base = datetime(2024, 1, 1)
+    vendor_id = db.scalar(insert(User).values(
+        email=f'bench-vendor-{uuid.uuid4().hex}@example.com', password_hash='-', first_name='Bench',
+        last_name='Vendor', user_type='vendor', is_email_verified=True, token_version=0, created_at_utc=base
+    ).returning(User.id))
+    product_ids = db.scalars(insert(Product).returning(Product.id, sort_by_parameter_order=True), [
+        dict(name=f'Product {i}', price=10.0 + i % 90, owner_id=vendor_id, created_at_utc=base + timedelta(minutes=i))
+        for i in range(products)
+    ]).all()
+    image_ids = db.scalars(insert(ProductImage).returning(ProductImage.id, sort_by_parameter_order=True), [
+        dict(url=f'https://example.com/{product_id}-{i}.jpg', is_primary=(i == 0), product_id=product_id,
+             status='ready', created_at_utc=base)
+        for product_id in product_ids
+        for i in range(images)
+    ]).all()
+    db.execute(insert(ProductImageVariant), [
+        dict(image_id=image_id, name='thumbnail', url=f'https://example.com/{image_id}_thumbnail.webp',
+             width=256, height=256, created_at_utc=base)
+        for image_id in image_ids
+    ])
+    # Plan against the seeded rows rather than empty-table estimates; rolled back with them
+    for table in (User, Product, ProductImage, ProductImageVariant):
+        db.execute(text(f'ANALYZE {table.__tablename__}'))
+    return vendor_id
+
+def lazy_listing(db: Session, owner_id: int, request: ProductListRequest) -> ProductListResponse:
+    """get_my_products without the eager-load options: one query per product and per image."""
+    stmt = select(Product).where(Product.owner_id == owner_id)
+    total = product_service.count_provider.count(db, owner_products_key(owner_id), stmt)
+    products = db.scalars(paginate(stmt, Product, request.page, request.limit, request.cursor)).all()
+    products, cursor = next_cursor(list(products), request.limit)
+    return ProductListResponse(
+        products=[ProductResponse.model_validate(product) for product in products],
+        total=total,
+        page=request.page,
+        total_pages=(total + request.limit - 1) // request.limit,
+        next_cursor=cursor
+    )
+
+def measure(db: Session, listing: Callable[[], ProductListResponse], repeat: int) -> Tuple[int, float]:
+    """Statements issued by one call, and the median wall time in milliseconds."""
+    statements: List[str] = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    timings = []
+    connection = db.connection()
+    event.listen(connection, 'before_cursor_execute', record)
+    try:
+        for _ in range(repeat):
+            statements.clear()
+            # Drop loaded rows so every call goes back to the database
+            db.expunge_all()
+            started = time.perf_counter()
+            listing()
+            timings.append((time.perf_counter() - started) * 1000)
+    finally:
+        event.remove(connection, 'before_cursor_execute', record)
+    return len(statements), statistics.median(timings)
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--products', type=int, default=max(PAGE_SIZES))
+    parser.add_argument('--images', type=int, default=3, help='images per product')
+    parser.add_argument('--repeat', type=int, default=10)
+    args = parser.parse_args()
+
+    # Count every call exactly so each one costs the same whatever COUNT_STRATEGY is set to
+    product_service.count_provider = CountProvider('exact')
+
+    with Session(engine) as db:
+        try:
+            vendor_id = seed(db, args.products, args.images)
+            service = product_service.ProductService(db)
+            requests = [ProductListRequest(page=1, limit=limit) for limit in PAGE_SIZES]
+            # Warm SQLAlchemy's statement cache and the database before timing anything
+            for request in requests:
+                service.get_my_products(vendor_id, request)
+                lazy_listing(db, vendor_id, request)
+                db.expunge_all()
+
+            print(f"{'page size':>9}  {'batched':>20}  {'lazy':>20}")
+            for request in requests:
+                batched = measure(db, lambda: service.get_my_products(vendor_id, request), args.repeat)
+                lazy = measure(db, lambda: lazy_listing(db, vendor_id, request), args.repeat)
+                print(f"{request.limit:>9}  {batched[0]:>4} queries {batched[1]:>6.1f}ms  {lazy[0]:>4} queries {lazy[1]:>6.1f}ms")
+        finally:
+            db.rollback()
+
+if __name__ == '__main__':
+    main()
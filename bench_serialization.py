@@ -0,0 +1,106 @@
+"""
+Measures the CPU time to turn one listing page of ORM rows into a JSON
+response body: building the response models from the rows, then encoding
+them. It compares the current path (ProductResponse.model_validate, then
+serialization.dumps) with the previous one (models built field by field,
+then jsonify(result.dict())).
+
+The rows are built in memory; no database connection is made.
+
+    python bench_serialization.py
+    python bench_serialization.py --items 100 --images 3 --repeat 500
+"""
+from datetime import datetime, timedelta
+from typing import Callable, List
+from flask import Flask, jsonify
+from models import Product, ProductImage, ProductImageVariant
+from contracts import ProductListResponse, ProductResponse, ProductImage as ProductImageSchema
+from serialization import dumps
+import argparse
+import json
+import time
+
+def listing_rows(items: int, images: int) -> List[Product]:
+    base = datetime(2024, 1, 1)
+    products = []
+    for i in range(items):
+        product = Product(
+            id=i + 1, name=f'Product {i}', description='Hand-made, one of a kind. ' * 4,
+            price=10.0 + i % 90, owner_id=1, created_at_utc=base + timedelta(minutes=i)
+        )
+        for j in range(images):
+            image_id = i * images + j + 1
+            image = ProductImage(
+                id=image_id, url=f'https://example.com/images/{image_id}.webp', is_primary=(j == 0),
+                status='ready', product_id=product.id, created_at_utc=base
+            )
+            image.thumbnail = ProductImageVariant(
+                id=image_id, image_id=image_id, name='thumbnail', width=256, height=256,
+                url=f'https://example.com/images/{image_id}_thumbnail.webp'
+            )
+            product.images.append(image)
+        products.append(product)
+    return products
+
+def current_body(products: List[Product]) -> bytes:
+    return dumps(ProductListResponse(
+        products=[ProductResponse.model_validate(product) for product in products],
+        total=len(products), page=1, total_pages=1
+    )) + b'\n'
+
+def previous_body(products: List[Product]) -> bytes:
+    result = ProductListResponse(
+        products=[
+            ProductResponse(
+                id=product.id,
+                name=product.name,
+                description=product.description,
+                price=product.price,
+                images=[
+                    ProductImageSchema(
+                        url=img.url,
+                        is_primary=img.is_primary,
+                        status=img.status,
+                        thumbnail_url=img.thumbnail.url if img.thumbnail else None
+                    )
+                    for img in product.images
+                ],
+                created_at_utc=product.created_at_utc,
+                owner_id=product.owner_id
+            )
+            for product in products
+        ],
+        total=len(products), page=1, total_pages=1
+    )
+    # model_dump is what the deprecated .dict() the routes called forwards to
+    return jsonify(result.model_dump()).get_data()
+
+def cpu_per_call(body: Callable[[], bytes], repeat: int) -> float:
+    """CPU microseconds per call."""
+    body()
+    started = time.process_time()
+    for _ in range(repeat):
+        body()
+    return (time.process_time() - started) / repeat * 1_000_000
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--items', type=int, default=100)
+    parser.add_argument('--images', type=int, default=3, help='images per product')
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args()
+
+    products = listing_rows(args.items, args.images)
+    with Flask(__name__).app_context():
+        if json.loads(current_body(products)) != json.loads(previous_body(products)):
+            raise SystemExit("The two paths produce different JSON")
+
+        current = cpu_per_call(lambda: current_body(products), args.repeat)
+        previous = cpu_per_call(lambda: previous_body(products), args.repeat)
+
+    print(f"{args.items} products with {args.images} images each, {len(current_body(products))} bytes")
+    print(f"{'previous':>9}  {previous:>8.0f}us")
+    print(f"{'current':>9}  {current:>8.0f}us  {previous / current:.1f}x")
+
+if __name__ == '__main__':
+    main()
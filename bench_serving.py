@@ -0,0 +1,132 @@
+"""
+Compares request throughput and latency of the WSGI app (gunicorn with
+threaded workers) and the ASGI app (hypercorn) with one process each, at
+several levels of concurrent keep-alive connections. The default route,
+/orders/my, is database-bound, so run this against a DATABASE_URL with
+realistic network latency to see the difference the event loop makes.
+
+A customer account is created for the run, as bench-serving-*@example.com,
+and deleted at the end. Both servers are started on local ports with the
+current environment.
+
+    python bench_serving.py
+    python bench_serving.py --concurrency 16,64,256 --seconds 10 --wsgi-threads 8
+"""
+from typing import List, Tuple
+from sqlalchemy import delete
+from sqlalchemy.orm import Session
+from models import engine, User
+from auth import create_access_token, access_token_claims
+import http.client
+import subprocess
+import threading
+import argparse
+import time
+import uuid
+import sys
+
+def percentile(values: List[float], fraction: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))] if values else 0.0
+
+def get(conn: http.client.HTTPConnection, path: str, headers: dict) -> int:
+    conn.request('GET', path, headers=headers)
+    response = conn.getresponse()
+    response.read()
+    return response.status
+
+def wait_until_serving(port: int, path: str, headers: dict, server: subprocess.Popen, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise SystemExit(f"Server exited with status {server.returncode}")
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=5)
+            status = get(conn, path, headers)
+            conn.close()
+            if status == 200:
+                return
+            raise SystemExit(f"GET {path} returned {status}")
+        except OSError:
+            time.sleep(0.2)
+    raise SystemExit(f"Server on port {port} did not start within {timeout:g}s")
+
+def load(port: int, path: str, headers: dict, connections: int, seconds: float) -> Tuple[float, float, float, int]:
+    """Requests per second, p50 and p99 latency in milliseconds, and failed requests."""
+    stop = time.perf_counter() + seconds
+    latencies: List[float] = []
+    failures = [0]
+    lock = threading.Lock()
+
+    def client():
+        conn = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+        while time.perf_counter() < stop:
+            started = time.perf_counter()
+            try:
+                ok = get(conn, path, headers) == 200
+            except (OSError, http.client.HTTPException):
+                conn.close()
+                conn = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+                ok = False
+            with lock:
+                if ok:
+                    latencies.append(time.perf_counter() - started)
+                else:
+                    failures[0] += 1
+        conn.close()
+
+    threads = [threading.Thread(target=client) for _ in range(connections)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    return len(latencies) / elapsed, percentile(latencies, 0.5) * 1000, percentile(latencies, 0.99) * 1000, failures[0]
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--path', default='/orders/my')
+    parser.add_argument('--concurrency', default='8,32,128', help='concurrent connections')
+    parser.add_argument('--seconds', type=float, default=5.0, help='duration of each run')
+    parser.add_argument('--wsgi-threads', type=int, default=4, help='gunicorn threads per worker')
+    parser.add_argument('--port', type=int, default=8765)
+    args = parser.parse_args()
+
+    servers = [
+        ('wsgi', [sys.executable, '-m', 'gunicorn', 'app:app', '--bind', f'127.0.0.1:{args.port}',
+                  '--workers', '1', '--worker-class', 'gthread', '--threads', str(args.wsgi_threads)]),
+        ('asgi', [sys.executable, '-m', 'hypercorn', 'asgi:application', '--bind', f'127.0.0.1:{args.port}',
+                  '--workers', '1']),
+    ]
+
+    email = f'bench-serving-{uuid.uuid4().hex[:12]}@example.com'
+    with Session(engine) as db:
+        user = User(
+            email=email, password_hash='-', first_name='Bench', last_name='Serving',
+            user_type='customer', is_email_verified=True, token_version=0
+        )
+        db.add(user)
+        db.commit()
+        headers = {'Authorization': f'Bearer {create_access_token(access_token_claims(user))}'}
+
+    try:
+        print(f"GET {args.path}, one process per server, gunicorn with {args.wsgi_threads} threads")
+        print(f"{'server':>6}  {'conns':>5}  {'req/s':>8}  {'p50':>9}  {'p99':>9}  {'failed':>6}")
+        for name, command in servers:
+            server = subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            try:
+                wait_until_serving(args.port, args.path, headers, server)
+                for connections in sorted({int(c) for c in args.concurrency.split(',')}):
+                    rps, p50, p99, failed = load(args.port, args.path, headers, connections, args.seconds)
+                    print(f"{name:>6}  {connections:>5}  {rps:>8.1f}  {p50:>7.1f}ms  {p99:>7.1f}ms  {failed:>6}")
+            finally:
+                server.terminate()
+                server.wait()
+    finally:
+        with Session(engine) as db:
+            db.execute(delete(User).where(User.email == email))
+            db.commit()
+
+if __name__ == '__main__':
+    main()
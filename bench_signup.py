@@ -0,0 +1,106 @@
+"""
+Times signups against DATABASE_URL with many concurrent callers, through
+AuthService.signup (one INSERT ... RETURNING) and through the previous
+flow (SELECT by email, INSERT, then SELECT the row back), and races
+concurrent signups for a single address through both. Password hashing
+is replaced by a precomputed hash and verification mail is not queued, so
+the numbers are the database round trips alone.
+
+Accounts are created as bench-signup-*@example.com and deleted at the end.
+
+    python bench_signup.py
+    python bench_signup.py --callers 16 --signups 50
+"""
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List
+from sqlalchemy import delete, select
+from sqlalchemy.orm import Session
+from models import engine, User
+from contracts import SignupRequest
+from enums import UserTypeEnum
+from werkzeug.security import generate_password_hash
+import auth
+import argparse
+import time
+import uuid
+
+def legacy_signup(request: SignupRequest) -> dict:
+    """The signup database work as it was before the single-statement insert."""
+    with Session(engine) as session:
+        if session.scalar(select(User).where(User.email == request.email)):
+            raise ValueError("Email already registered")
+        new_user = User(
+            email=request.email,
+            password_hash=auth.get_password_hash(request.password),
+            first_name=request.first_name,
+            last_name=request.last_name,
+            user_type=request.user_type,
+            is_email_verified=False
+        )
+        session.add(new_user)
+        session.commit()
+        session.refresh(new_user)
+        return {"user_id": str(new_user.id), "access_token": auth.create_access_token(auth.access_token_claims(new_user))}
+
+def signup_request(email: str) -> SignupRequest:
+    return SignupRequest(
+        email=email, password='bench-password', first_name='Bench', last_name='Signup', user_type=UserTypeEnum.CUSTOMER
+    )
+
+def percentile(values: List[float], fraction: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+def timed(signup: Callable[[SignupRequest], dict], email: str) -> float:
+    started = time.perf_counter()
+    signup(signup_request(email))
+    return time.perf_counter() - started
+
+def race(signup: Callable[[SignupRequest], dict], email: str, callers: int) -> str:
+    def attempt(_):
+        try:
+            signup(signup_request(email))
+            return 'created'
+        except ValueError:
+            return 'rejected'
+        except Exception:
+            return 'failed'
+
+    with ThreadPoolExecutor(max_workers=callers) as pool:
+        outcomes = list(pool.map(attempt, range(callers)))
+    return ', '.join(f"{outcomes.count(outcome)} {outcome}" for outcome in ('created', 'rejected', 'failed'))
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--callers', type=int, default=8, help='concurrent signups')
+    parser.add_argument('--signups', type=int, default=25, help='signups per caller')
+    args = parser.parse_args()
+
+    password_hash = generate_password_hash('bench-password', 'pbkdf2:sha256:1000')
+    auth.get_password_hash = lambda password: password_hash
+    auth.send_verification_email = lambda email, token: None
+
+    prefix = f'bench-signup-{uuid.uuid4().hex[:12]}'
+    service = auth.AuthService()
+    flows = [('insert returning', 'insert', service.signup), ('select + insert', 'legacy', legacy_signup)]
+    try:
+        print(f"{args.callers} concurrent callers, {args.signups} signups each")
+        print(f"{'flow':>16}  {'signups/s':>9}  {'p50':>8}  {'p99':>8}  duplicate race")
+        for name, slug, signup in flows:
+            # Warm the connection pool
+            timed(signup, f'{prefix}-{slug}-warm@example.com')
+            emails = [f'{prefix}-{slug}-{i}@example.com' for i in range(args.callers * args.signups)]
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=args.callers) as pool:
+                latencies = list(pool.map(lambda email: timed(signup, email), emails))
+            elapsed = time.perf_counter() - started
+            outcome = race(signup, f'{prefix}-{slug}-race@example.com', args.callers)
+            print(f"{name:>16}  {len(emails) / elapsed:>9.1f}  {percentile(latencies, 0.5) * 1000:>6.1f}ms  "
+                  f"{percentile(latencies, 0.99) * 1000:>6.1f}ms  {outcome}")
+    finally:
+        with Session(engine) as db:
+            db.execute(delete(User).where(User.email.like(f'{prefix}-%')))
+            db.commit()
+
+if __name__ == '__main__':
+    main()
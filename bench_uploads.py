@@ -0,0 +1,81 @@
+"""
+Times storing one product's images, with their derivatives, through
+ProductService._upload_images with upload pools of different widths. The
+images are PNGs of random pixels. Uploads go to a LocalStorageBackend
+in a temporary directory that sleeps for a fixed latency per object, to
+stand in for a round trip to cloud storage. The blob index rows live in
+DATABASE_URL and are released again after every batch.
+
+    python bench_uploads.py
+    python bench_uploads.py --images 8 --size-kb 512 --latency-ms 80 --workers 1,4,8
+"""
+from concurrent.futures import ThreadPoolExecutor
+from typing import BinaryIO
+from sqlalchemy.orm import Session
+from models import engine
+from blob_store import blob_index
+from storage_backend import LocalStorageBackend
+from PIL import Image
+import product_service
+import storage_backend
+import argparse
+import statistics
+import tempfile
+import time
+import io
+import os
+
+class SlowLocalStorageBackend(LocalStorageBackend):
+    def __init__(self, root_dir: str, latency_seconds: float):
+        super().__init__(root_dir, 'http://localhost/media')
+        self.latency_seconds = latency_seconds
+
+    def put(self, file_obj: BinaryIO, path: str) -> str:
+        time.sleep(self.latency_seconds)
+        return super().put(file_obj, path)
+
+def random_png(size: int) -> BinaryIO:
+    """A PNG of about size bytes; random content so no image is deduplicated against an earlier run."""
+    side = max(1, int((size / 3) ** 0.5))
+    png = io.BytesIO()
+    Image.frombytes('RGB', (side, side), os.urandom(side * side * 3)).save(png, 'PNG')
+    png.seek(0)
+    return png
+
+def upload_batch(service: product_service.ProductService, images: int, size: int) -> float:
+    """Seconds to store a batch of fresh images; their references are released afterwards."""
+    batch = [(random_png(size), f'image-{i}.png') for i in range(images)]
+    started = time.perf_counter()
+    stored_images = service._upload_images(batch)
+    elapsed = time.perf_counter() - started
+    blob_index.release_now(product_service._acquired_keys(stored_images))
+    return elapsed
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--images', type=int, default=8, help='images per product')
+    parser.add_argument('--size-kb', type=int, default=256)
+    parser.add_argument('--latency-ms', type=float, default=50.0, help='simulated storage round trip')
+    parser.add_argument('--workers', default=f'1,{product_service.IMAGE_UPLOAD_WORKERS},{2 * product_service.IMAGE_UPLOAD_WORKERS}')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as root_dir:
+        storage_backend._storage_backend = SlowLocalStorageBackend(root_dir, args.latency_ms / 1000)
+        with Session(engine) as db:
+            service = product_service.ProductService(db)
+            print(f"{args.images} images of {args.size_kb}KB, {args.latency_ms:g}ms per upload")
+            print(f"{'workers':>7}  {'median':>9}  {'speedup':>7}")
+            baseline = None
+            for workers in sorted({int(w) for w in args.workers.split(',')}):
+                product_service._upload_executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='image-upload')
+                upload_batch(service, args.images, args.size_kb * 1024)
+                median = statistics.median(
+                    upload_batch(service, args.images, args.size_kb * 1024) for _ in range(args.repeat)
+                )
+                product_service._upload_executor.shutdown()
+                baseline = baseline or median
+                print(f"{workers:>7}  {median * 1000:>7.1f}ms  {baseline / median:>6.1f}x")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,155 @@
+from collections import Counter, defaultdict
+from dataclasses import dataclass
+from sqlalchemy.orm import Session
+from sqlalchemy import select, update, delete
+from sqlalchemy.exc import IntegrityError
+from models import engine, StoredBlob
+from storage_backend import get_storage_backend
+from typing import BinaryIO, Callable, Iterable, List, Optional
+import hashlib
+
+HASH_CHUNK_BYTES = 1024 * 1024
+IMAGE_PREFIX = 'product_images/'
+
+@dataclass(frozen=True)
+class BlobRef:
+    key: str
+    url: str
+    width: Optional[int] = None
+    height: Optional[int] = None
+
+def content_hash(file_obj: BinaryIO) -> str:
+    """SHA-256 of a file object, read in chunks and rewound afterwards."""
+    digest = hashlib.sha256()
+    file_obj.seek(0)
+    for chunk in iter(lambda: file_obj.read(HASH_CHUNK_BYTES), b''):
+        digest.update(chunk)
+    file_obj.seek(0)
+    return digest.hexdigest()
+
+def content_key(digest: str, extension: str, variant: Optional[str] = None) -> str:
+    """Storage name for content with this digest, e.g. content_key(d, '.webp', 'thumbnail')."""
+    suffix = f'_{variant}' if variant else ''
+    return f'{digest}{suffix}{extension.lower() or ".bin"}'
+
+class BlobIndex:
+    """
+    Reference-counted index of content-addressed blobs in storage.
+    Identical content is uploaded once; later references only bump the
+    count. A blob is deleted from storage when its last reference goes.
+    """
+
+    def acquire_existing(self, key: str) -> Optional[BlobRef]:
+        """Take a reference to an already stored blob, or return None."""
+        with Session(engine) as db:
+            row = db.execute(
+                update(StoredBlob)
+                .where(StoredBlob.key == key)
+                .values(ref_count=StoredBlob.ref_count + 1)
+                .returning(StoredBlob.url, StoredBlob.width, StoredBlob.height)
+            ).first()
+            db.commit()
+        if row is None:
+            return None
+        return BlobRef(key, row.url, row.width, row.height)
+
+    def acquire(self, key: str, upload: Callable[[], str], width: Optional[int] = None, height: Optional[int] = None) -> BlobRef:
+        """Take a reference to the blob, calling upload() only if it is not stored yet."""
+        existing = self.acquire_existing(key)
+        if existing:
+            return existing
+
+        return self.register(key, upload(), width, height)
+
+    def register(self, key: str, url: str, width: Optional[int] = None, height: Optional[int] = None) -> BlobRef:
+        """Record a freshly uploaded blob with its first reference."""
+        try:
+            with Session(engine) as db:
+                db.add(StoredBlob(key=key, url=url, ref_count=1, width=width, height=height))
+                db.commit()
+        except IntegrityError:
+            # A concurrent upload of the same content registered it first;
+            # both wrote identical bytes to the same name
+            existing = self.acquire_existing(key)
+            if existing:
+                return existing
+            raise
+        return BlobRef(key, url, width, height)
+
+    def release(self, db: Session, keys: Iterable[Optional[str]]) -> List[str]:
+        """
+        Drop references inside the caller's transaction and return the keys
+        that are no longer referenced. Nothing is deleted from storage here;
+        pass the keys to purge() once the transaction has committed, so a
+        rollback never leaves rows pointing at deleted objects.
+        """
+        counts = Counter(key for key in keys if key)
+        if not counts:
+            return []
+
+        by_amount = defaultdict(list)
+        for key, amount in counts.items():
+            by_amount[amount].append(key)
+        for amount, amount_keys in by_amount.items():
+            db.execute(
+                update(StoredBlob)
+                .where(StoredBlob.key.in_(amount_keys))
+                .values(ref_count=StoredBlob.ref_count - amount)
+            )
+
+        return list(db.scalars(
+            select(StoredBlob.key)
+            .where(StoredBlob.key.in_(list(counts)), StoredBlob.ref_count <= 0)
+        ).all())
+
+    def release_now(self, keys: Iterable[Optional[str]]) -> None:
+        """Drop references in a transaction of their own, e.g. to undo a failed create."""
+        with Session(engine) as db:
+            orphaned = self.release(db, keys)
+            db.commit()
+        self.purge(orphaned)
+
+    def purge(self, keys: Optional[Iterable[str]] = None) -> List[str]:
+        """
+        Delete unreferenced blobs from storage and the index, in a short
+        transaction of their own. Rows are locked while the objects are
+        deleted, so a concurrent acquire of the same key either takes its
+        reference first (and the blob is kept) or waits, finds the row gone
+        and re-uploads. With no keys, sweeps every unreferenced blob, e.g.
+        ones left behind when a process stopped between commit and purge.
+        """
+        query = select(StoredBlob.key).where(StoredBlob.ref_count <= 0)
+        if keys is not None:
+            keys = list(keys)
+            if not keys:
+                return []
+            query = query.where(StoredBlob.key.in_(keys))
+
+        with Session(engine) as db:
+            orphaned = list(db.scalars(query.with_for_update(skip_locked=True)).all())
+            if not orphaned:
+                return []
+            try:
+                get_storage_backend().delete_many([object_path(key) for key in orphaned])
+            except Exception as e:
+                # Rows stay at zero references and are retried by the next sweep
+                print(f"Failed to delete blobs {', '.join(orphaned)}: {str(e)}")
+                db.rollback()
+                return []
+            db.execute(delete(StoredBlob).where(StoredBlob.key.in_(orphaned)))
+            db.commit()
+        return orphaned
+
+def object_path(key: str) -> str:
+    return f'{IMAGE_PREFIX}{key}'
+
+def upload_file(file_obj: BinaryIO, key: str) -> Callable[[], str]:
+    return lambda: get_storage_backend().put(file_obj, object_path(key))
+
+def upload_path(path: str, key: str) -> Callable[[], str]:
+    def _upload() -> str:
+        with open(path, 'rb') as file_obj:
+            return get_storage_backend().put(file_obj, object_path(key))
+    return _upload
+
+blob_index = BlobIndex()
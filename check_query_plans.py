@@ -0,0 +1,138 @@
+"""
+Runs EXPLAIN on the service queries against DATABASE_URL and exits non-zero
+if any of them needs a sequential scan. Sequential scans are disabled for
+the session, so a Seq Scan that remains in a plan means no index can serve
+that query, however small the seeded tables are.
+
+    python check_query_plans.py          # database already has data
+    python check_query_plans.py --seed   # insert a synthetic data set first
+"""
+from datetime import datetime, timedelta
+from typing import Iterator, List, Tuple
+from sqlalchemy import select, func, insert
+from sqlalchemy.orm import Session
+from models import engine, init_db, User, Product, ProductImage, ProductImageVariant, Order, OrderItem
+from migrations import run_migrations
+from pagination import paginate, encode_cursor
+from order_service import vendor_order_filter
+import json
+import sys
+
+SEED_VENDORS = 20
+SEED_PRODUCTS_PER_VENDOR = 50
+SEED_CUSTOMERS = 200
+SEED_ORDERS_PER_CUSTOMER = 10
+
+def seed(db: Session) -> None:
+    base = datetime(2024, 1, 1)
+    users = [
+        dict(email=f'plan-vendor-{i}@example.com', password_hash='-', first_name='Plan', last_name='Vendor',
+             user_type='vendor', is_email_verified=True, token_version=0, created_at_utc=base)
+        for i in range(SEED_VENDORS)
+    ] + [
+        dict(email=f'plan-customer-{i}@example.com', password_hash='-', first_name='Plan', last_name='Customer',
+             user_type='customer', is_email_verified=True, token_version=0, created_at_utc=base)
+        for i in range(SEED_CUSTOMERS)
+    ]
+    user_ids = db.scalars(insert(User).returning(User.id, sort_by_parameter_order=True), users).all()
+    vendor_ids, customer_ids = user_ids[:SEED_VENDORS], user_ids[SEED_VENDORS:]
+
+    products = [
+        dict(name=f'Product {i}', price=10.0 + i % 90, owner_id=vendor_ids[i % SEED_VENDORS],
+             created_at_utc=base + timedelta(minutes=i))
+        for i in range(SEED_VENDORS * SEED_PRODUCTS_PER_VENDOR)
+    ]
+    product_ids = db.scalars(insert(Product).returning(Product.id, sort_by_parameter_order=True), products).all()
+    db.execute(insert(ProductImage), [
+        dict(url=f'https://example.com/{product_id}.jpg', is_primary=True, product_id=product_id,
+             status='ready', created_at_utc=base)
+        for product_id in product_ids
+    ])
+
+    orders = [
+        dict(customer_id=customer_id, total_amount=30.0, shipping_address='1 Plan Street', status='PLACED',
+             created_at_utc=base + timedelta(minutes=i * SEED_ORDERS_PER_CUSTOMER + j))
+        for i, customer_id in enumerate(customer_ids)
+        for j in range(SEED_ORDERS_PER_CUSTOMER)
+    ]
+    order_ids = db.scalars(insert(Order).returning(Order.id, sort_by_parameter_order=True), orders).all()
+    db.execute(insert(OrderItem), [
+        dict(order_id=order_id, product_id=product_ids[(i * 7 + k) % len(product_ids)], product_name='Product',
+             product_price=10.0, quantity=1, total_price=10.0)
+        for i, order_id in enumerate(order_ids)
+        for k in range(3)
+    ])
+    db.commit()
+
+def service_queries(db: Session) -> Iterator[Tuple[str, object]]:
+    """The statements the services issue on hot paths, with ids taken from the data."""
+    vendor_id = db.scalar(select(Product.owner_id).limit(1)) or 1
+    customer_id = db.scalar(select(Order.customer_id).limit(1)) or 1
+    email = db.scalar(select(User.email).limit(1)) or ''
+    product = db.execute(select(Product.id, Product.created_at_utc).order_by(Product.id).limit(1)).first()
+    order = db.execute(select(Order.id, Order.created_at_utc).order_by(Order.id).limit(1)).first()
+    product_ids = [product.id if product else 1]
+    order_ids = [order.id if order else 1]
+    product_cursor = encode_cursor(product.created_at_utc, product.id) if product else None
+    order_cursor = encode_cursor(order.created_at_utc, order.id) if order else None
+
+    yield 'login user by email', select(User).where(User.email == email)
+    yield 'product listing page', paginate(select(Product), Product, 3, 10)
+    yield 'product listing cursor', paginate(select(Product), Product, 1, 10, product_cursor)
+    yield 'vendor products page', paginate(select(Product).where(Product.owner_id == vendor_id), Product, 1, 10)
+    yield 'vendor products cursor', paginate(select(Product).where(Product.owner_id == vendor_id), Product, 1, 10, product_cursor)
+    yield 'vendor products count', select(func.count()).select_from(
+        select(Product).where(Product.owner_id == vendor_id).subquery()
+    )
+    yield 'listing images', select(ProductImage).where(ProductImage.product_id.in_(product_ids))
+    yield 'confirmed uploads', select(ProductImage.upload_path).where(
+        ProductImage.product_id == product_ids[0], ProductImage.upload_path.in_([f'uploads/{product_ids[0]}/a.jpg'])
+    )
+    yield 'listing thumbnails', select(ProductImageVariant).where(
+        ProductImageVariant.image_id.in_(product_ids), ProductImageVariant.name == 'thumbnail'
+    )
+    yield 'order products', select(Product.id, Product.name, Product.price, Product.owner_id).where(Product.id.in_(product_ids))
+    yield 'customer orders page', paginate(select(Order).where(Order.customer_id == customer_id), Order, 1, 10)
+    yield 'customer orders cursor', paginate(select(Order).where(Order.customer_id == customer_id), Order, 1, 10, order_cursor)
+    yield 'customer orders count', select(func.count()).select_from(
+        select(Order).where(Order.customer_id == customer_id).subquery()
+    )
+    yield 'vendor orders page', paginate(select(Order).where(vendor_order_filter(vendor_id)), Order, 1, 10)
+    yield 'vendor orders cursor', paginate(select(Order).where(vendor_order_filter(vendor_id)), Order, 1, 10, order_cursor)
+    yield 'order items', select(OrderItem).where(OrderItem.order_id.in_(order_ids))
+    yield 'product order items', select(OrderItem).where(OrderItem.product_id.in_(product_ids))
+
+def seq_scans(plan: dict) -> List[str]:
+    found = []
+    if plan.get('Node Type') == 'Seq Scan':
+        found.append(plan.get('Relation Name', '?'))
+    for child in plan.get('Plans', []):
+        found.extend(seq_scans(child))
+    return found
+
+def check() -> bool:
+    ok = True
+    with Session(engine) as db:
+        connection = db.connection()
+        connection.exec_driver_sql("ANALYZE")
+        connection.exec_driver_sql("SET enable_seqscan = off")
+        for name, stmt in service_queries(db):
+            compiled = stmt.compile(dialect=engine.dialect, compile_kwargs={'render_postcompile': True})
+            plan = connection.exec_driver_sql(
+                f"EXPLAIN (FORMAT JSON) {compiled.string}", compiled.params
+            ).scalar()
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            scanned = seq_scans(plan[0]['Plan'])
+            ok = ok and not scanned
+            print(f"{'FAIL' if scanned else 'ok  '} {name}" + (f" (seq scan on {', '.join(scanned)})" if scanned else ''))
+        db.rollback()
+    return ok
+
+if __name__ == '__main__':
+    init_db()
+    run_migrations()
+    if '--seed' in sys.argv:
+        with Session(engine) as db:
+            seed(db)
+    sys.exit(0 if check() else 1)
@@ -1,7 +1,11 @@
-from pydantic import BaseModel, EmailStr, Field
-from typing import Optional, List
+from pydantic import BaseModel, ConfigDict, EmailStr, Field, PlainSerializer, field_validator
+from typing import Annotated, Dict, Literal, Optional, List
 from datetime import datetime
-from enums import UserTypeEnum
+from werkzeug.http import http_date
+from enums import UserTypeEnum, ImageStatusEnum
+
+# Response timestamps are written as HTTP dates, as Flask's jsonify does
+HttpDatetime = Annotated[datetime, PlainSerializer(http_date, return_type=str, when_used='json')]
 
 class SignupRequest(BaseModel):
     first_name: str = Field(..., min_length=1, description="User's first name")
@@ -10,6 +14,13 @@ class SignupRequest(BaseModel):
     email: EmailStr = Field(..., description="User's email address")
     password: str = Field(..., min_length=8, description="Password for the user")
 
+    @field_validator('user_type')
+    @classmethod
+    def not_admin(cls, user_type: UserTypeEnum) -> UserTypeEnum:
+        if user_type == UserTypeEnum.ADMIN:
+            raise ValueError("Admin accounts cannot be created through signup")
+        return user_type
+
 class SignupResponse(BaseModel):
     user_id: str = Field(..., description="ID of the created user")
     access_token: str = Field(..., description="JWT token for authentication")
@@ -19,6 +30,10 @@ class LoginRequest(BaseModel):
     email: EmailStr = Field(..., description="User's email address")
     password: str = Field(..., min_length=8, description="User's password")
 
+class ChangePasswordRequest(BaseModel):
+    current_password: str = Field(..., min_length=8, description="User's current password")
+    new_password: str = Field(..., min_length=8, description="New password for the user")
+
 class TokenResponse(BaseModel):
     access_token: str = Field(..., description="JWT token for authentication")
     token_type: str = Field("bearer", description="Type of the token")
@@ -31,8 +46,12 @@ class ResendEmailVerificationTokenRequest(BaseModel):
 
 
 class ProductImage(BaseModel):
-    url: str = Field(..., description="URL of the uploaded image")
+    model_config = ConfigDict(from_attributes=True)
+
+    url: Optional[str] = Field(None, description="URL of the uploaded image, once it is ready")
     is_primary: bool = Field(default=False, description="Whether this is the primary product image")
+    status: ImageStatusEnum = Field(default=ImageStatusEnum.READY, description="Processing status of the image (pending, processing, ready, failed)")
+    thumbnail_url: Optional[str] = Field(None, description="URL of the WebP thumbnail, for listing cards")
 
 class CreateProductRequest(BaseModel):
     name: str = Field(..., min_length=1, max_length=100, description="Name of the product")
@@ -45,34 +64,58 @@ class CreateProductResponse(BaseModel):
     description: Optional[str] = Field(None, description="Detailed description of the product")
     price: float = Field(..., description="Price of the product")
     images: List[ProductImage] = Field(default=[], description="List of product images")
-    created_at_utc: datetime = Field(..., description="Timestamp when the product was created")
+    created_at_utc: HttpDatetime = Field(..., description="Timestamp when the product was created")
     owner_id: int = Field(..., description="ID of the product owner")
 
 class ProductResponse(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
     id: int = Field(..., description="Unique identifier of the product")
     name: str = Field(..., description="Name of the product")
     description: Optional[str] = Field(None, description="Detailed description of the product")
     price: float = Field(..., description="Price of the product")
     images: List[ProductImage] = Field(default=[], description="List of product images")
-    created_at_utc: datetime = Field(..., description="Timestamp when the product was created")
+    created_at_utc: HttpDatetime = Field(..., description="Timestamp when the product was created")
     owner_id: int = Field(..., description="ID of the product owner")
 
 class ProductListRequest(BaseModel):
     page: int = Field(default=1, ge=1, description="Page number for pagination")
     limit: int = Field(default=10, ge=1, le=100, description="Number of items per page")
+    cursor: Optional[str] = Field(None, description="Opaque cursor from a previous page; takes precedence over page")
 
 class ProductListResponse(BaseModel):
     products: List[ProductResponse] = Field(..., description="List of products")
     total: int = Field(..., description="Total number of products")
     page: int = Field(..., description="Current page number")
     total_pages: int = Field(..., description="Total number of pages available")
+    next_cursor: Optional[str] = Field(None, description="Cursor for the next page, if there is one")
+
+class ImageUploadFile(BaseModel):
+    filename: str = Field(..., min_length=1, description="Original file name of the image")
+    content_type: Literal["image/jpeg", "image/png", "image/gif", "image/webp"] = Field(..., description="MIME type the client will upload the image with")
+
+class CreateImageUploadsRequest(BaseModel):
+    files: List[ImageUploadFile] = Field(..., min_length=1, max_length=10, description="Images the client wants to upload")
+
+class ImageUpload(BaseModel):
+    object_path: str = Field(..., description="Storage path to pass back when confirming the upload")
+    upload_url: str = Field(..., description="Signed URL to upload the image bytes to")
+    method: str = Field("PUT", description="HTTP method to use for the upload")
+    headers: Dict[str, str] = Field(default={}, description="Headers the upload request must carry")
+    expires_at_utc: HttpDatetime = Field(..., description="Timestamp after which the upload URL stops working")
+
+class CreateImageUploadsResponse(BaseModel):
+    uploads: List[ImageUpload] = Field(..., description="One signed upload per requested file, in request order")
+
+class ConfirmImageUploadsRequest(BaseModel):
+    object_paths: List[str] = Field(..., min_length=1, max_length=10, description="Storage paths of completed uploads, in display order")
 
 class OrderItemRequest(BaseModel):
     product_id: int = Field(..., description="ID of the product being ordered")
     quantity: int = Field(..., gt=0, description="Quantity of the product")
 
 class PlaceOrderRequest(BaseModel):
-    items: List[OrderItemRequest] = Field(default=..., description="List of items to order")
+    items: List[OrderItemRequest] = Field(default=..., min_length=1, description="List of items to order")
     shipping_address: str = Field(..., min_length=1, description="Shipping address for the order")
 
     class Config:
@@ -87,6 +130,8 @@ class PlaceOrderRequest(BaseModel):
         }
 
 class OrderItem(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
     id: int = Field(..., description="ID of the order item")
     product_id: int = Field(..., description="ID of the product")
     product_name: str = Field(..., description="Name of the product at time of order")
@@ -95,23 +140,27 @@ class OrderItem(BaseModel):
     total_price: float = Field(..., description="Total price for this item")
 
 class OrderResponse(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
     id: int = Field(..., description="Unique identifier of the order")
     customer_id: int = Field(..., description="ID of the customer who placed the order")
     items: List[OrderItem] = Field(..., description="List of items in the order")
     total_amount: float = Field(..., description="Total amount of the order")
     shipping_address: str = Field(..., description="Shipping address for the order")
     status: str = Field(..., description="Current status of the order")
-    created_at_utc: datetime = Field(..., description="Timestamp when the order was created")
+    created_at_utc: HttpDatetime = Field(..., description="Timestamp when the order was created")
 
 class OrderListResponse(BaseModel):
     orders: List[OrderResponse] = Field(..., description="List of orders")
     total: int = Field(..., description="Total number of orders")
     page: int = Field(..., description="Current page number")
     total_pages: int = Field(..., description="Total number of pages available")
+    next_cursor: Optional[str] = Field(None, description="Cursor for the next page, if there is one")
 
 class OrderListRequest(BaseModel):
     page: int = Field(default=1, ge=1, description="Page number for pagination")
     limit: int = Field(default=10, ge=1, le=100, description="Number of items per page")
+    cursor: Optional[str] = Field(None, description="Opaque cursor from a previous page; takes precedence over page")
 
 class UpdateOrderStatusRequest(BaseModel):
     status: str = Field(..., description="New status for the order (PLACED, SHIPPED, DELIVERED, CANCELLED)")
@@ -121,4 +170,26 @@ class UpdateOrderStatusRequest(BaseModel):
             "example": {
                 "status": "SHIPPED"
             }
-        }
\ No newline at end of file
+        }
+
+class BulkUpdateOrderStatusRequest(BaseModel):
+    order_ids: List[int] = Field(..., min_length=1, max_length=500, description="Orders to update")
+    status: str = Field(..., description="New status for the orders (PLACED, SHIPPED, DELIVERED, CANCELLED)")
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "order_ids": [101, 102, 103],
+                "status": "SHIPPED"
+            }
+        }
+
+class OrderStatusResult(BaseModel):
+    order_id: int = Field(..., description="ID of the order")
+    updated: bool = Field(..., description="Whether the order's status was changed")
+    error: Optional[str] = Field(None, description="Why the order was not updated")
+
+class BulkUpdateOrderStatusResponse(BaseModel):
+    status: str = Field(..., description="Status applied to the updated orders")
+    updated: int = Field(..., description="Number of orders updated")
+    results: List[OrderStatusResult] = Field(..., description="Per-order outcome, in request order")
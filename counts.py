@@ -0,0 +1,170 @@
+from collections import OrderedDict
+from sqlalchemy.orm import Session
+from sqlalchemy import Select, select, func, literal, text, true, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from models import engine, RowCounter
+from typing import Iterable, Optional
+from dotenv import load_dotenv
+import threading
+import time
+import os
+
+load_dotenv()
+
+COUNT_STRATEGY = os.getenv('COUNT_STRATEGY', 'cached')
+COUNT_CACHE_TTL_SECONDS = float(os.getenv('COUNT_CACHE_TTL_SECONDS', '60'))
+COUNT_CACHE_MAX_ENTRIES = int(os.getenv('COUNT_CACHE_MAX_ENTRIES', '10000'))
+
+# First key of the two-part advisory locks that order counter seeding
+# against writes; migrations.py uses a single-key lock
+COUNTER_LOCK_NAMESPACE = 4129072
+
+def products_key() -> str:
+    return 'products'
+
+def owner_products_key(owner_id: int) -> str:
+    return f'products:owner:{owner_id}'
+
+def customer_orders_key(customer_id: int) -> str:
+    return f'orders:customer:{customer_id}'
+
+def vendor_orders_key(vendor_id: int) -> str:
+    return f'orders:vendor:{vendor_id}'
+
+class CountProvider:
+    """
+    Serves listing totals without a full count(*) on every page request.
+    - exact: always run count(*) (the old behaviour)
+    - cached: exact count kept for a TTL and dropped when the listing changes
+    - counter: totals maintained in the row_counters table by the write paths
+    - estimate: planner row estimate for whole-table counts, cached exact otherwise
+    """
+    STRATEGIES = ('exact', 'cached', 'counter', 'estimate')
+
+    def __init__(self, strategy: str = 'cached', ttl_seconds: float = 60.0, max_entries: int = 10000):
+        if strategy not in self.STRATEGIES:
+            raise ValueError(f"Invalid count strategy. Must be one of: {', '.join(self.STRATEGIES)}")
+        self.strategy = strategy
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._cache: "OrderedDict[str, tuple[int, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def count(self, db: Session, key: str, stmt: Select, table: Optional[str] = None) -> int:
+        """
+        Total rows matched by the unpaginated listing statement.
+        Pass table only when stmt is an unfiltered scan of that table, which
+        makes it eligible for the planner estimate.
+        """
+        if self.strategy == 'exact':
+            return self._exact(db, stmt)
+
+        if self.strategy == 'counter':
+            return self._counter(db, key, stmt)
+
+        if self.strategy == 'estimate' and table is not None:
+            estimate = self._estimate(db, table)
+            if estimate is not None:
+                return estimate
+
+        return self._cached(db, key, stmt)
+
+    def adjust(self, db: Session, keys: Iterable[str], delta: int) -> None:
+        """Apply a row delta inside the caller's transaction; call before commit."""
+        if self.strategy != 'counter':
+            return
+        keys = list(keys)
+        if keys:
+            # Waits for a seed of any of these keys to commit, see _seed
+            self._lock_counters(db, keys, shared=True)
+            db.execute(
+                update(RowCounter)
+                .where(RowCounter.key.in_(keys))
+                .values(value=RowCounter.value + delta)
+            )
+
+    def invalidate(self, keys: Iterable[str]) -> None:
+        """Drop cached totals; call after the write has been committed."""
+        with self._lock:
+            for key in keys:
+                self._cache.pop(key, None)
+
+    def _exact(self, db: Session, stmt: Select) -> int:
+        return db.scalar(select(func.count()).select_from(stmt.subquery())) or 0
+
+    def _cached(self, db: Session, key: str, stmt: Select) -> int:
+        now = time.monotonic()
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached and cached[1] > now:
+                self._cache.move_to_end(key)
+                return cached[0]
+
+        total = self._exact(db, stmt)
+
+        with self._lock:
+            self._cache[key] = (total, now + self.ttl_seconds)
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+        return total
+
+    def _counter(self, db: Session, key: str, stmt: Select) -> int:
+        value = db.scalar(select(RowCounter.value).where(RowCounter.key == key))
+        if value is not None:
+            return value
+        return self._seed(key, stmt)
+
+    def _seed(self, key: str, stmt: Select) -> int:
+        """
+        Create the counter from an exact count on the primary, whatever
+        session the read came in on. The count and the insert are one
+        statement, under an exclusive lock that adjust() takes shared: writes
+        already in flight commit before the count runs and are included in it,
+        and later ones wait for the row to exist and then update it.
+        This uses the sync driver even under asgi.py's run_sync, so a seed
+        blocks the event loop once per key.
+        """
+        with Session(engine) as seed_db:
+            self._lock_counters(seed_db, [key], shared=False)
+            insert = pg_insert if seed_db.get_bind().dialect.name == 'postgresql' else sqlite_insert
+            total = seed_db.scalar(
+                insert(RowCounter)
+                .from_select(
+                    ['key', 'value'],
+                    # WHERE keeps SQLite from reading ON CONFLICT as a join constraint
+                    select(literal(key), func.count()).select_from(stmt.subquery()).where(true())
+                )
+                .on_conflict_do_nothing(index_elements=[RowCounter.key])
+                .returning(RowCounter.value)
+            )
+            if total is None:
+                # Another request seeded it first
+                total = seed_db.scalar(select(RowCounter.value).where(RowCounter.key == key))
+            seed_db.commit()
+        return total or 0
+
+    def _lock_counters(self, db: Session, keys: Iterable[str], shared: bool) -> None:
+        if db.get_bind().dialect.name != 'postgresql':
+            return
+        lock = 'pg_advisory_xact_lock_shared' if shared else 'pg_advisory_xact_lock'
+        for key in sorted(set(keys)):
+            db.execute(
+                text(f"SELECT {lock}(:namespace, hashtext(:key))"),
+                {'namespace': COUNTER_LOCK_NAMESPACE, 'key': key}
+            )
+
+    def _estimate(self, db: Session, table: str) -> Optional[int]:
+        if db.get_bind().dialect.name != 'postgresql':
+            return None
+        estimate = db.scalar(
+            text("SELECT reltuples::bigint FROM pg_class WHERE oid = CAST(:table AS regclass)"),
+            {'table': table}
+        )
+        # reltuples is -1 until the table has been vacuumed or analyzed
+        if estimate is None or estimate < 0:
+            return None
+        return int(estimate)
+
+count_provider = CountProvider(COUNT_STRATEGY, COUNT_CACHE_TTL_SECONDS, COUNT_CACHE_MAX_ENTRIES)
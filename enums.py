@@ -3,6 +3,8 @@ from enum import Enum
 class UserTypeEnum(str, Enum):
     CUSTOMER = "customer"
     VENDOR = "vendor"
+    # Operators; only granted through set_user_type.py
+    ADMIN = "admin"
 
     def __str__(self) -> str:
         return self.value
@@ -14,4 +16,14 @@ class OrderStatusEnum(str, Enum):
     CANCELLED = "cancelled"
 
     def __str__(self) -> str:
-        return self.value
\ No newline at end of file
+        return self.value
+
+class ImageStatusEnum(str, Enum):
+    PENDING = "pending"
+    # Claimed by a worker; see ImageWorkerPool.process
+    PROCESSING = "processing"
+    READY = "ready"
+    FAILED = "failed"
+
+    def __str__(self) -> str:
+        return self.value
@@ -1,65 +1,91 @@
 import firebase_admin
 from firebase_admin import credentials, storage
 import os
+import threading
+from datetime import timedelta
+from typing import BinaryIO, Optional
 from dotenv import load_dotenv
+from storage_backend import StorageBackend, guess_content_type, file_size
 
 load_dotenv()
 
+# Must be a multiple of 256 KiB
+STORAGE_UPLOAD_CHUNK_BYTES = int(os.getenv('STORAGE_UPLOAD_CHUNK_BYTES', str(1024 * 1024)))
+
 def initialize_firebase():
+    if firebase_admin._apps:
+        return
     cred = credentials.Certificate('firebase-credentials.json')
     firebase_admin.initialize_app(cred, {
         'storageBucket': os.getenv('FIREBASE_STORAGE_BUCKET')
     })
 
-def upload_image_to_firebase(file_bytes: bytes, filename: str) -> str:
-    try:
-        if not firebase_admin._apps:
-            raise ValueError("Firebase app not initialized. Call initialize_firebase() first")
-
-        if not file_bytes:
-            raise ValueError("Empty file data received")
+class FirebaseStorageBackend(StorageBackend):
+    """
+    Firebase Storage backend. The bucket, and with it the underlying HTTP
+    session, is resolved once and reused by every upload and delete.
+    """
 
-        try:
-            bucket = storage.bucket()
-        except Exception as e:
-            raise ValueError(f"Failed to get storage bucket. Check FIREBASE_STORAGE_BUCKET env variable. Error: {str(e)}")
+    def __init__(self):
+        initialize_firebase()
+        self._bucket = None
+        self._lock = threading.Lock()
 
-        content_type = 'application/octet-stream'
-        if filename.lower().endswith(('.jpg', '.jpeg')):
-            content_type = 'image/jpeg'
-        elif filename.lower().endswith('.png'):
-            content_type = 'image/png'
-        elif filename.lower().endswith('.gif'):
-            content_type = 'image/gif'
-        elif filename.lower().endswith('.webp'):
-            content_type = 'image/webp'
+    @property
+    def bucket(self):
+        if self._bucket is None:
+            with self._lock:
+                if self._bucket is None:
+                    try:
+                        self._bucket = storage.bucket()
+                    except Exception as e:
+                        raise ValueError(f"Failed to get storage bucket. Check FIREBASE_STORAGE_BUCKET env variable. Error: {str(e)}")
+        return self._bucket
 
+    def put(self, file_obj: BinaryIO, path: str) -> str:
         try:
-            import uuid
-            unique_filename = f"{uuid.uuid4()}_{filename}"
-            blob = bucket.blob(f'product_images/{unique_filename}')
-            
-            blob.upload_from_string(
-                file_bytes,
-                content_type=content_type
-            )
-        except Exception as e:
-            raise ValueError(f"Failed to upload file to Firebase Storage: {str(e)}")
-        
-        try:
-            blob.make_public()
-        except Exception as e:
+            size = file_size(file_obj)
+            if not size:
+                raise ValueError("Empty file data received")
+
             try:
-                blob.delete()
-            except:
-                pass
-            raise ValueError(f"Failed to make file public: {str(e)}")
-        
-        if not blob.public_url:
-            raise ValueError("Failed to get public URL after upload")
+                # A chunk size switches the client to a resumable upload that reads
+                # the file one chunk at a time instead of loading it into memory
+                blob = self.bucket.blob(path, chunk_size=STORAGE_UPLOAD_CHUNK_BYTES)
+                
+                # Publishing through the upload's ACL saves a separate make_public round trip
+                blob.upload_from_file(
+                    file_obj,
+                    size=size,
+                    content_type=guess_content_type(path),
+                    predefined_acl='publicRead'
+                )
+            except Exception as e:
+                raise ValueError(f"Failed to upload file to Firebase Storage: {str(e)}")
             
-        return blob.public_url
+            if not blob.public_url:
+                raise ValueError("Failed to get public URL after upload")
+                
+            return blob.public_url
+
+        except Exception as e:
+            print(f"Firebase upload error: {str(e)}")
+            raise Exception(f"Failed to upload image: {str(e)}")
+
+    def delete(self, path: str) -> None:
+        self.bucket.blob(path).delete()
+
+    def signed_upload_url(self, path: str, content_type: str, expires_in: int) -> str:
+        return self.bucket.blob(path).generate_signed_url(
+            version='v4',
+            expiration=timedelta(seconds=expires_in),
+            method='PUT',
+            content_type=content_type
+        )
+
+    def stat(self, path: str) -> Optional[int]:
+        blob = self.bucket.get_blob(path)
+        return blob.size if blob else None
 
-    except Exception as e:
-        print(f"Firebase upload error: {str(e)}")
-        raise Exception(f"Failed to upload image: {str(e)}")
\ No newline at end of file
+    def download(self, path: str, file_obj: BinaryIO) -> None:
+        self.bucket.blob(path, chunk_size=STORAGE_UPLOAD_CHUNK_BYTES).download_to_file(file_obj)
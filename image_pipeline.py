@@ -0,0 +1,65 @@
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import List, Optional
+from dotenv import load_dotenv
+from PIL import Image, ImageOps
+import multiprocessing
+import threading
+import os
+
+load_dotenv()
+
+IMAGE_PIPELINE_PROCESSES = int(os.getenv('IMAGE_PIPELINE_PROCESSES', str(os.cpu_count() or 1)))
+DERIVATIVE_QUALITY = int(os.getenv('DERIVATIVE_QUALITY', '80'))
+
+# Longest edge in pixels; None keeps the original dimensions
+DERIVATIVE_SIZES = {
+    'thumbnail': 320,
+    'medium': 1024,
+    'original': None,
+}
+
+@dataclass(frozen=True)
+class Derivative:
+    name: str
+    path: str
+    width: int
+    height: int
+
+def _render_derivatives(source_path: str) -> List[tuple]:
+    """Runs in a pool process; writes WebP files next to the source and returns their metadata."""
+    stem = os.path.splitext(source_path)[0]
+    rendered = []
+    with Image.open(source_path) as source:
+        source = ImageOps.exif_transpose(source)
+        if source.mode not in ('RGB', 'RGBA'):
+            has_alpha = source.mode in ('LA', 'PA') or 'transparency' in source.info
+            source = source.convert('RGBA' if has_alpha else 'RGB')
+
+        for name, max_edge in DERIVATIVE_SIZES.items():
+            image = source.copy()
+            if max_edge is not None:
+                image.thumbnail((max_edge, max_edge), Image.Resampling.LANCZOS)
+            path = f"{stem}_{name}.webp"
+            image.save(path, 'WEBP', quality=DERIVATIVE_QUALITY, method=4)
+            rendered.append((name, path, image.width, image.height))
+    return rendered
+
+_executor: Optional[ProcessPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # Spawned rather than forked: callers are threaded background workers
+            _executor = ProcessPoolExecutor(
+                max_workers=IMAGE_PIPELINE_PROCESSES,
+                mp_context=multiprocessing.get_context('spawn')
+            )
+        return _executor
+
+def generate_derivatives(source_path: str) -> List[Derivative]:
+    """Render every configured derivative of a local image on the process pool."""
+    rendered = _get_executor().submit(_render_derivatives, source_path).result()
+    return [Derivative(name, path, width, height) for name, path, width, height in rendered]
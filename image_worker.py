@@ -0,0 +1,343 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import Row, select, update, or_, and_
+from models import engine, ProductImage, ProductImageVariant
+from enums import ImageStatusEnum
+from blob_store import blob_index, BlobRef, content_hash, content_key, object_path, upload_path
+from storage_backend import get_storage_backend
+from response_cache import catalog_cache
+from read_routing import read_router, CATALOG_SCOPE
+from image_pipeline import generate_derivatives, DERIVATIVE_SIZES
+from typing import BinaryIO, List, Optional, Tuple
+from datetime import datetime, timedelta
+from dotenv import load_dotenv
+import threading
+import tempfile
+import shutil
+import queue
+import time
+import os
+
+load_dotenv()
+
+IMAGE_WORKERS = int(os.getenv('IMAGE_WORKERS', '4'))
+IMAGE_UPLOAD_ATTEMPTS = int(os.getenv('IMAGE_UPLOAD_ATTEMPTS', '3'))
+# How long a worker's claim on an image holds before another process may take it over
+IMAGE_CLAIM_LEASE_SECONDS = float(os.getenv('IMAGE_CLAIM_LEASE_SECONDS', '600'))
+IMAGE_STAGING_DIR = os.getenv('IMAGE_STAGING_DIR', os.path.join(tempfile.gettempdir(), 'artizon-image-staging'))
+STORAGE_SOURCE_PREFIX = 'storage:'
+
+def stage_image(file_obj: BinaryIO, storage_filename: str) -> str:
+    """Copy an uploaded file to the local staging area and return its path."""
+    os.makedirs(IMAGE_STAGING_DIR, exist_ok=True)
+    path = os.path.join(IMAGE_STAGING_DIR, storage_filename)
+    file_obj.seek(0)
+    with open(path, 'wb') as staged:
+        shutil.copyfileobj(file_obj, staged)
+    return path
+
+def discard_staged(path: Optional[str]) -> None:
+    if not path:
+        return
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+def storage_source_ref(path: str) -> str:
+    """source_ref for an image uploaded straight to storage rather than staged locally."""
+    return f'{STORAGE_SOURCE_PREFIX}{path}'
+
+def storage_upload_path(source_ref: Optional[str]) -> Optional[str]:
+    if source_ref and source_ref.startswith(STORAGE_SOURCE_PREFIX):
+        return source_ref[len(STORAGE_SOURCE_PREFIX):]
+    return None
+
+def discard_source(source_ref: Optional[str]) -> None:
+    """Remove the raw upload behind a source_ref, wherever it lives."""
+    upload_path = storage_upload_path(source_ref)
+    if upload_path is None:
+        discard_staged(source_ref)
+        return
+    try:
+        get_storage_backend().delete(upload_path)
+    except Exception as e:
+        print(f"Failed to delete raw upload {upload_path}: {str(e)}")
+
+class LocalJobQueue:
+    """In-process job queue, so image processing runs without external services."""
+
+    def __init__(self):
+        self._queue: "queue.Queue[int]" = queue.Queue()
+
+    def put(self, image_id: int) -> None:
+        self._queue.put(image_id)
+
+    def get(self) -> int:
+        return self._queue.get()
+
+    def task_done(self) -> None:
+        self._queue.task_done()
+
+    def join(self) -> None:
+        self._queue.join()
+
+class ImageWorkerPool:
+    """
+    Background workers that store staged images and their WebP derivatives
+    through the content-addressed blob index and mark the image rows ready.
+    Threads are started on first use so that forking servers start them in
+    each worker process rather than in the master.
+    """
+
+    def __init__(self, job_queue, workers: int = 4):
+        self.job_queue = job_queue
+        self.workers = workers
+        self._threads: list[threading.Thread] = []
+        self._lock = threading.Lock()
+        self._recovered = False
+
+    def submit(self, image_id: int) -> None:
+        self._ensure_started()
+        self.job_queue.put(image_id)
+
+    def start(self) -> None:
+        """
+        Start the workers and, once per process, a background sweep that
+        picks up work a stopped process left behind: images whose claim
+        lapsed and unpurged blobs. Cheap to call on every request.
+        """
+        if self._recovered:
+            return
+        with self._lock:
+            if self._recovered:
+                return
+            self._recovered = True
+        self._ensure_started()
+        threading.Thread(target=self._recover, name='image-worker-recovery', daemon=True).start()
+
+    def _recover(self) -> None:
+        # Repeats so that a claim lapsing while this process runs is picked up too
+        while True:
+            try:
+                requeued = self.requeue_pending()
+                if requeued:
+                    print(f"Requeued {requeued} stale image(s)")
+            except Exception as e:
+                print(f"Failed to requeue stale images: {str(e)}")
+            try:
+                # Blobs released by a process that stopped before purging them
+                blob_index.purge()
+            except Exception as e:
+                print(f"Failed to purge unreferenced blobs: {str(e)}")
+            time.sleep(IMAGE_CLAIM_LEASE_SECONDS)
+
+    def requeue_pending(self) -> int:
+        """
+        Re-submit images that no live worker is on, as far as the database
+        can tell: claims older than the lease, and pending images that have
+        waited longer than the lease without being claimed. Only those whose
+        raw upload is reachable from this host are submitted. A resubmitted
+        image still waiting in another process's queue is processed once,
+        by whichever process claims it first.
+        """
+        cutoff = datetime.utcnow() - timedelta(seconds=IMAGE_CLAIM_LEASE_SECONDS)
+        with Session(engine) as db:
+            rows = db.execute(
+                select(ProductImage.id, ProductImage.source_ref)
+                .where(or_(
+                    and_(ProductImage.status == ImageStatusEnum.PENDING.value, ProductImage.created_at_utc < cutoff),
+                    and_(ProductImage.status == ImageStatusEnum.PROCESSING.value, ProductImage.claimed_at_utc < cutoff)
+                ))
+            ).all()
+
+        requeued = 0
+        for image_id, source_ref in rows:
+            if storage_upload_path(source_ref) or (source_ref and os.path.exists(source_ref)):
+                self.submit(image_id)
+                requeued += 1
+        return requeued
+
+    def _ensure_started(self) -> None:
+        with self._lock:
+            if self._threads:
+                return
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._run, name=f'image-worker-{i}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def _run(self) -> None:
+        while True:
+            image_id = self.job_queue.get()
+            try:
+                self.process(image_id)
+            except Exception as e:
+                print(f"Image worker error for image {image_id}: {str(e)}")
+            finally:
+                self.job_queue.task_done()
+
+    def _claim(self, db: Session, image_id: int, claimed_at: datetime) -> Optional[Row]:
+        """
+        Mark the image as being processed by this worker, if it is pending or
+        its previous claim has lapsed. The conditional UPDATE lets exactly one
+        process win when several were handed the same image.
+        """
+        cutoff = claimed_at - timedelta(seconds=IMAGE_CLAIM_LEASE_SECONDS)
+        claimed = db.execute(
+            update(ProductImage)
+            .where(
+                ProductImage.id == image_id,
+                or_(
+                    ProductImage.status == ImageStatusEnum.PENDING.value,
+                    and_(ProductImage.status == ImageStatusEnum.PROCESSING.value, ProductImage.claimed_at_utc < cutoff)
+                )
+            )
+            .values(status=ImageStatusEnum.PROCESSING.value, claimed_at_utc=claimed_at)
+            .returning(ProductImage.source_ref)
+        ).first()
+        db.commit()
+        return claimed
+
+    def process(self, image_id: int) -> None:
+        claimed_at = datetime.utcnow()
+        with Session(engine) as db:
+            claimed = self._claim(db, image_id, claimed_at)
+            if claimed is None:
+                # Gone, finished, or claimed by another worker
+                return
+            source_ref = claimed.source_ref
+
+            staged_path = self._fetch(source_ref)
+            try:
+                image_blob, variants = self.store_image(staged_path)
+            finally:
+                if staged_path != source_ref:
+                    discard_staged(staged_path)
+            acquired_keys = ([image_blob.key] if image_blob else []) + [variant.blob_key for variant in variants]
+
+            try:
+                image = db.get(ProductImage, image_id, with_for_update=True)
+                if not image:
+                    # Product was deleted while the upload ran
+                    db.rollback()
+                    blob_index.release_now(acquired_keys)
+                    discard_source(source_ref)
+                    return
+                if image.status != ImageStatusEnum.PROCESSING.value or image.claimed_at_utc != claimed_at:
+                    # The claim lapsed and another worker took the image over
+                    db.rollback()
+                    blob_index.release_now(acquired_keys)
+                    return
+
+                image.url = image_blob.url if image_blob else None
+                image.blob_key = image_blob.key if image_blob else None
+                image.status = (ImageStatusEnum.READY if image_blob else ImageStatusEnum.FAILED).value
+                image.source_ref = None
+                image.claimed_at_utc = None
+                image.variants = variants
+                db.commit()
+            except Exception:
+                db.rollback()
+                blob_index.release_now(acquired_keys)
+                raise
+
+        discard_source(source_ref)
+        read_router.record_write(CATALOG_SCOPE)
+        catalog_cache.invalidate()
+
+    def _fetch(self, source_ref: Optional[str]) -> Optional[str]:
+        """Local path of the raw image, downloading direct uploads into the staging area first."""
+        upload_path = storage_upload_path(source_ref)
+        if upload_path is None:
+            return source_ref
+
+        os.makedirs(IMAGE_STAGING_DIR, exist_ok=True)
+
+        def _download() -> str:
+            # A file of its own per attempt; the extension is kept for the content key
+            fd, staged_path = tempfile.mkstemp(dir=IMAGE_STAGING_DIR, suffix=os.path.splitext(upload_path)[1])
+            try:
+                with os.fdopen(fd, 'wb') as staged:
+                    get_storage_backend().download(upload_path, staged)
+            except Exception:
+                discard_staged(staged_path)
+                raise
+            return staged_path
+
+        return self._with_retries(upload_path, _download)
+
+    def store_image(self, staged_path: Optional[str]) -> Tuple[Optional[BlobRef], List[ProductImageVariant]]:
+        """
+        Store a local image and its derivatives. The original is None if it
+        could not be stored; the caller owns every reference returned.
+        """
+        image_blob = self._store(staged_path)
+        variants = self._store_derivatives(staged_path, image_blob) if image_blob else []
+        return image_blob, variants
+
+    def _store(self, source_ref: Optional[str]) -> Optional[BlobRef]:
+        """Store the staged original under its content hash; re-uploads of known content are skipped."""
+        if not source_ref or not os.path.exists(source_ref):
+            print(f"Staged image {source_ref} is missing")
+            return None
+
+        with open(source_ref, 'rb') as staged:
+            digest = content_hash(staged)
+        key = content_key(digest, os.path.splitext(source_ref)[1])
+        return self._with_retries(key, lambda: blob_index.acquire(key, upload_path(source_ref, key)))
+
+    def _store_derivatives(self, source_ref: str, image_blob: BlobRef) -> List[ProductImageVariant]:
+        """
+        Reference the sized WebP derivatives of the image, rendering them on
+        the process pool and uploading them as one parallel batch only when
+        this content has not been seen before.
+        Best effort: an image without derivatives is still usable.
+        """
+        digest = os.path.splitext(image_blob.key)[0]
+        keys = {name: content_key(digest, '.webp', name) for name in DERIVATIVE_SIZES}
+        refs = {name: blob_index.acquire_existing(key) for name, key in keys.items()}
+
+        missing = [name for name, ref in refs.items() if ref is None]
+        if missing:
+            try:
+                derivatives = generate_derivatives(source_ref)
+            except Exception as e:
+                print(f"Failed to render derivatives for {source_ref}: {str(e)}")
+                derivatives = []
+
+            to_upload = [derivative for derivative in derivatives if derivative.name in missing]
+            files = [open(derivative.path, 'rb') for derivative in to_upload]
+            try:
+                urls = self._with_retries(
+                    digest,
+                    lambda: get_storage_backend().put_many([
+                        (file_obj, object_path(keys[derivative.name]))
+                        for file_obj, derivative in zip(files, to_upload)
+                    ])
+                ) if to_upload else []
+                for derivative, url in zip(to_upload, urls or []):
+                    refs[derivative.name] = blob_index.register(
+                        keys[derivative.name], url, derivative.width, derivative.height
+                    )
+            finally:
+                for file_obj in files:
+                    file_obj.close()
+                for derivative in derivatives:
+                    discard_staged(derivative.path)
+
+        return [
+            ProductImageVariant(name=name, url=ref.url, width=ref.width, height=ref.height, blob_key=ref.key)
+            for name, ref in refs.items() if ref
+        ]
+
+    def _with_retries(self, label: str, operation):
+        for attempt in range(1, IMAGE_UPLOAD_ATTEMPTS + 1):
+            try:
+                return operation()
+            except Exception as e:
+                print(f"Upload attempt {attempt} for {label} failed: {str(e)}")
+                if attempt < IMAGE_UPLOAD_ATTEMPTS:
+                    time.sleep(2 ** attempt)
+        return None
+
+image_worker = ImageWorkerPool(LocalJobQueue(), IMAGE_WORKERS)
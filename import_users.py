@@ -0,0 +1,44 @@
+"""
+Operator tool for creating accounts in bulk from a CSV file with a header
+line or an NDJSON file, one object per line; admins can do the same over
+HTTP with POST /auth/import. Rows need email, password, first_name,
+last_name and user_type. Accounts are created unverified and no
+verification email is sent; users request one through
+/auth/resend-verification. Prints one NDJSON result per row, then a
+summary line.
+
+    python import_users.py users.csv
+    python import_users.py users.ndjson
+    python import_users.py --format ndjson - < users.ndjson
+"""
+from auth import AuthService, iter_csv_rows, iter_ndjson_rows
+import argparse
+import json
+import sys
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Bulk-create user accounts")
+    parser.add_argument('path', help="CSV or NDJSON file, or - for stdin")
+    parser.add_argument('--format', choices=['csv', 'ndjson'], help="Defaults to the file extension")
+    args = parser.parse_args()
+
+    file_format = args.format or ('csv' if args.path.lower().endswith('.csv') else 'ndjson')
+    stream = sys.stdin.buffer if args.path == '-' else open(args.path, 'rb')
+    rows = iter_csv_rows(stream) if file_format == 'csv' else iter_ndjson_rows(stream)
+
+    summary = {}
+    try:
+        for result in AuthService().import_users(rows):
+            print(json.dumps(result), flush=True)
+            summary = result.get('summary', summary)
+    except Exception as e:
+        print(f"User import error: {str(e)}", file=sys.stderr)
+        print("Import aborted; rows without a result were not imported", file=sys.stderr)
+        return 1
+    finally:
+        stream.close()
+
+    return 1 if summary.get('invalid') else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
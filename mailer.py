@@ -0,0 +1,177 @@
+from dataclasses import dataclass
+from email.message import Message
+from typing import List, Optional
+from dotenv import load_dotenv
+import smtplib
+import threading
+import queue
+import os
+
+load_dotenv()
+
+SMTP_SERVER = os.getenv('SMTP_SERVER', 'localhost')
+SMTP_PORT = int(os.getenv('SMTP_PORT', '587'))
+SMTP_USERNAME = os.getenv('SMTP_USERNAME')
+SMTP_PASSWORD = os.getenv('SMTP_PASSWORD')
+# Local stand-ins usually speak plain SMTP without auth
+SMTP_USE_TLS = os.getenv('SMTP_USE_TLS', 'true').lower() in ('1', 'true', 'yes')
+SMTP_TIMEOUT_SECONDS = float(os.getenv('SMTP_TIMEOUT_SECONDS', '30'))
+MAIL_WORKERS = int(os.getenv('MAIL_WORKERS', '2'))
+MAIL_BATCH_SIZE = int(os.getenv('MAIL_BATCH_SIZE', '20'))
+MAIL_QUEUE_MAX = int(os.getenv('MAIL_QUEUE_MAX', '10000'))
+MAIL_SEND_ATTEMPTS = int(os.getenv('MAIL_SEND_ATTEMPTS', '5'))
+MAIL_RETRY_BASE_SECONDS = float(os.getenv('MAIL_RETRY_BASE_SECONDS', '2'))
+MAIL_IDLE_TIMEOUT_SECONDS = float(os.getenv('MAIL_IDLE_TIMEOUT_SECONDS', '60'))
+
+@dataclass
+class OutboundMail:
+    message: Message
+    attempts: int = 0
+
+class Mailer:
+    """
+    Outbound mail queue drained by background workers. Each worker keeps
+    its SMTP connection open between messages, sends whatever has queued
+    up as one batch over it, and closes it after sitting idle. Failed
+    sends are retried with exponential backoff. Threads are started on
+    first use so forking servers start them in each worker process.
+    """
+
+    def __init__(self, workers: int = 2, batch_size: int = 20, max_queued: int = 10000):
+        self.workers = workers
+        self.batch_size = batch_size
+        self._queue: "queue.Queue[OutboundMail]" = queue.Queue(maxsize=max_queued)
+        self._threads: list[threading.Thread] = []
+        self._lock = threading.Lock()
+        self._metrics = {
+            "queued": 0,
+            "sent": 0,
+            "retried": 0,
+            "failed": 0,
+            "dropped": 0,
+            "batches": 0,
+            "connections_opened": 0,
+        }
+
+    def send(self, message: Message) -> bool:
+        """Queue a message for delivery; returns False if the queue is full."""
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(OutboundMail(message))
+        except queue.Full:
+            self._count("dropped")
+            print(f"Mail queue full, dropping message to {message['To']}")
+            return False
+        self._count("queued")
+        return True
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {**self._metrics, "queue_depth": self._queue.qsize()}
+
+    def join(self) -> None:
+        self._queue.join()
+
+    def _ensure_started(self) -> None:
+        with self._lock:
+            if self._threads:
+                return
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._run, name=f'mail-worker-{i}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def _count(self, metric: str, amount: int = 1) -> None:
+        with self._lock:
+            self._metrics[metric] += amount
+
+    def _run(self) -> None:
+        connection: Optional[smtplib.SMTP] = None
+        while True:
+            try:
+                batch = [self._queue.get(timeout=MAIL_IDLE_TIMEOUT_SECONDS)]
+            except queue.Empty:
+                connection = self._close(connection)
+                continue
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            connection = self._send_batch(connection, batch)
+
+    def _send_batch(self, connection: Optional[smtplib.SMTP], batch: List[OutboundMail]) -> Optional[smtplib.SMTP]:
+        for mail in batch:
+            try:
+                connection = self._deliver(connection, mail)
+                self._count("sent")
+            except smtplib.SMTPRecipientsRefused as e:
+                self._count("failed")
+                print(f"Mail to {mail.message['To']} refused: {str(e)}")
+            except (smtplib.SMTPException, OSError) as e:
+                connection = self._close(connection)
+                if isinstance(e, smtplib.SMTPResponseException) and 500 <= e.smtp_code < 600:
+                    # Permanent rejection, retrying cannot help
+                    self._count("failed")
+                    print(f"Mail to {mail.message['To']} rejected: {str(e)}")
+                else:
+                    self._retry(mail, e)
+            finally:
+                self._queue.task_done()
+        self._count("batches")
+        return connection
+
+    def _deliver(self, connection: Optional[smtplib.SMTP], mail: OutboundMail) -> smtplib.SMTP:
+        if connection is not None:
+            try:
+                connection.send_message(mail.message)
+                return connection
+            except smtplib.SMTPServerDisconnected:
+                # The server dropped the idle connection; reconnect once
+                pass
+
+        connection = self._connect()
+        try:
+            connection.send_message(mail.message)
+        except Exception:
+            self._close(connection)
+            raise
+        return connection
+
+    def _connect(self) -> smtplib.SMTP:
+        connection = smtplib.SMTP(SMTP_SERVER, SMTP_PORT, timeout=SMTP_TIMEOUT_SECONDS)
+        try:
+            if SMTP_USE_TLS:
+                connection.starttls()
+            if SMTP_USERNAME:
+                connection.login(SMTP_USERNAME, SMTP_PASSWORD or '')
+        except Exception:
+            self._close(connection)
+            raise
+        self._count("connections_opened")
+        return connection
+
+    def _close(self, connection: Optional[smtplib.SMTP]) -> None:
+        if connection is None:
+            return None
+        try:
+            connection.quit()
+        except Exception:
+            connection.close()
+        return None
+
+    def _retry(self, mail: OutboundMail, error: Exception) -> None:
+        mail.attempts += 1
+        if mail.attempts >= MAIL_SEND_ATTEMPTS:
+            self._count("failed")
+            print(f"Giving up on mail to {mail.message['To']} after {mail.attempts} attempts: {str(error)}")
+            return
+
+        delay = MAIL_RETRY_BASE_SECONDS * 2 ** (mail.attempts - 1)
+        print(f"Mail to {mail.message['To']} failed, retrying in {delay:g}s: {str(error)}")
+        self._count("retried")
+        timer = threading.Timer(delay, self._queue.put, args=(mail,))
+        timer.daemon = True
+        timer.start()
+
+mailer = Mailer(MAIL_WORKERS, MAIL_BATCH_SIZE, MAIL_QUEUE_MAX)
@@ -0,0 +1,130 @@
+from dataclasses import dataclass, field
+from typing import Callable, List, Union
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+from models import engine, init_db, Base, ProductImageVariant, StoredBlob, RowCounter
+
+# Arbitrary key for pg_advisory_lock so only one process migrates at a time
+MIGRATION_LOCK_ID = 4129071
+
+Step = Union[str, Callable[[Connection], None]]
+
+@dataclass(frozen=True)
+class Migration:
+    version: int
+    name: str
+    steps: List[Step] = field(default_factory=list)
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction block
+    transactional: bool = True
+
+def _create_tables(*models) -> Callable[[Connection], None]:
+    tables = [model.__table__ for model in models]
+    return lambda conn: Base.metadata.create_all(conn, tables=tables)
+
+def _create_index_concurrently(name: str, table: str, columns: str, unique: bool = False) -> Callable[[Connection], None]:
+    """
+    Build an index without blocking writes. A previous interrupted build
+    leaves an invalid index behind that IF NOT EXISTS would keep, so it is
+    dropped first.
+    """
+    def _step(conn: Connection) -> None:
+        invalid = conn.scalar(
+            text(
+                "SELECT 1 FROM pg_index JOIN pg_class ON pg_class.oid = pg_index.indexrelid "
+                "WHERE pg_class.relname = :name AND NOT pg_index.indisvalid"
+            ),
+            {"name": name}
+        )
+        if invalid:
+            conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {name}"))
+        conn.execute(text(f"CREATE {'UNIQUE ' if unique else ''}INDEX CONCURRENTLY IF NOT EXISTS {name} ON {table} ({columns})"))
+    return _step
+
+# Append only; applied versions are recorded in schema_migrations.
+# Every step is idempotent so databases created by init_db() after a
+# change can run the migration that introduced it without harm.
+MIGRATIONS: List[Migration] = [
+    Migration(1, 'product image processing', [
+        "ALTER TABLE product_images ALTER COLUMN url DROP NOT NULL",
+        "ALTER TABLE product_images ADD COLUMN IF NOT EXISTS status VARCHAR(20) NOT NULL DEFAULT 'ready'",
+        "ALTER TABLE product_images ADD COLUMN IF NOT EXISTS source_ref VARCHAR(500)",
+        "ALTER TABLE product_images ADD COLUMN IF NOT EXISTS blob_key VARCHAR(200)",
+        _create_tables(ProductImageVariant, StoredBlob),
+    ]),
+    Migration(2, 'row counters', [
+        _create_tables(RowCounter),
+    ]),
+    Migration(3, 'user token versions', [
+        "ALTER TABLE users ADD COLUMN IF NOT EXISTS token_version INTEGER NOT NULL DEFAULT 0",
+    ]),
+    Migration(4, 'listing indexes', [
+        _create_index_concurrently('ix_products_created_at_utc_id', 'products', 'created_at_utc, id'),
+        _create_index_concurrently('ix_products_owner_id_created_at_utc_id', 'products', 'owner_id, created_at_utc, id'),
+        _create_index_concurrently('ix_orders_created_at_utc_id', 'orders', 'created_at_utc, id'),
+        _create_index_concurrently('ix_orders_customer_id_created_at_utc_id', 'orders', 'customer_id, created_at_utc, id'),
+        _create_index_concurrently('ix_order_items_order_id_product_id', 'order_items', 'order_id, product_id'),
+        _create_index_concurrently('ix_order_items_product_id', 'order_items', 'product_id'),
+        _create_index_concurrently('ix_product_images_product_id', 'product_images', 'product_id'),
+        # Superseded by the composite indexes above
+        "DROP INDEX CONCURRENTLY IF EXISTS ix_products_owner_id",
+        "DROP INDEX CONCURRENTLY IF EXISTS ix_order_items_order_id",
+    ], transactional=False),
+    Migration(5, 'confirmed upload paths', [
+        "ALTER TABLE product_images ADD COLUMN IF NOT EXISTS upload_path VARCHAR(500)",
+        "UPDATE product_images SET upload_path = substr(source_ref, length('storage:') + 1) "
+        "WHERE source_ref LIKE 'storage:%' AND upload_path IS NULL",
+        _create_index_concurrently('ix_product_images_upload_path', 'product_images', 'upload_path', unique=True),
+    ], transactional=False),
+    Migration(6, 'image processing claims', [
+        "ALTER TABLE product_images ADD COLUMN IF NOT EXISTS claimed_at_utc TIMESTAMP",
+    ]),
+]
+
+def _run_steps(conn: Connection, migration: Migration) -> None:
+    for step in migration.steps:
+        if callable(step):
+            step(conn)
+        else:
+            conn.execute(text(step))
+
+def _record(conn: Connection, migration: Migration) -> None:
+    conn.execute(
+        text("INSERT INTO schema_migrations (version, name) VALUES (:version, :name)"),
+        {"version": migration.version, "name": migration.name}
+    )
+
+def run_migrations() -> List[int]:
+    """Apply pending migrations in version order and return the versions applied."""
+    applied_now = []
+    with engine.connect() as lock_conn:
+        lock_conn = lock_conn.execution_options(isolation_level='AUTOCOMMIT')
+        lock_conn.execute(text("SELECT pg_advisory_lock(:id)"), {"id": MIGRATION_LOCK_ID})
+        try:
+            lock_conn.execute(text(
+                "CREATE TABLE IF NOT EXISTS schema_migrations ("
+                "version INTEGER PRIMARY KEY, "
+                "name VARCHAR(100) NOT NULL, "
+                "applied_at_utc TIMESTAMP NOT NULL DEFAULT (now() AT TIME ZONE 'utc'))"
+            ))
+            applied = set(lock_conn.scalars(text("SELECT version FROM schema_migrations")).all())
+
+            for migration in sorted(MIGRATIONS, key=lambda m: m.version):
+                if migration.version in applied:
+                    continue
+                print(f"Applying migration {migration.version}: {migration.name}")
+                if migration.transactional:
+                    with engine.begin() as conn:
+                        _run_steps(conn, migration)
+                        _record(conn, migration)
+                else:
+                    _run_steps(lock_conn, migration)
+                    _record(lock_conn, migration)
+                applied_now.append(migration.version)
+        finally:
+            lock_conn.execute(text("SELECT pg_advisory_unlock(:id)"), {"id": MIGRATION_LOCK_ID})
+    return applied_now
+
+if __name__ == '__main__':
+    init_db()
+    applied = run_migrations()
+    print(f"Applied {len(applied)} migration(s)" if applied else "Schema is up to date")
@@ -1,6 +1,6 @@
 from datetime import datetime
 from typing import List, Optional
-from sqlalchemy import create_engine, ForeignKey, String
+from sqlalchemy import create_engine, ForeignKey, Index, String
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
 from dotenv import load_dotenv
 import os
@@ -24,6 +24,22 @@ engine = create_engine(
     pool_pre_ping=True
 )
 
+# Optional streaming replica for read-only traffic; see read_routing.py
+READ_DATABASE_URL = os.getenv('READ_DATABASE_URL')
+
+read_engine = create_engine(
+    READ_DATABASE_URL,
+    connect_args={
+        'sslmode': 'require',
+        'target_session_attrs': 'any'
+    },
+    pool_size=10,
+    max_overflow=20,
+    pool_timeout=30,
+    pool_recycle=1800,
+    pool_pre_ping=True
+) if READ_DATABASE_URL else None
+
 class Base(DeclarativeBase):
     pass
 
@@ -37,6 +53,8 @@ class User(Base):
     last_name: Mapped[str] = mapped_column(String(50), nullable=False)
     user_type: Mapped[str] = mapped_column(String(20), nullable=False)
     is_email_verified: Mapped[bool] = mapped_column(default=False)
+    # Bumped to revoke every access token issued to the user so far
+    token_version: Mapped[int] = mapped_column(default=0)
     created_at_utc: Mapped[datetime] = mapped_column(default=datetime.utcnow)
     
     # Relationships
@@ -56,6 +74,12 @@ class Product(Base):
     created_at_utc: Mapped[datetime] = mapped_column(default=datetime.utcnow)
     owner_id: Mapped[int] = mapped_column(ForeignKey('users.id'), nullable=False)
 
+    # Listings page newest first with (created_at_utc, id) as the keyset
+    __table_args__ = (
+        Index('ix_products_created_at_utc_id', 'created_at_utc', 'id'),
+        Index('ix_products_owner_id_created_at_utc_id', 'owner_id', 'created_at_utc', 'id'),
+    )
+
     # Relationships
     images: Mapped[List["ProductImage"]] = relationship("ProductImage", back_populates="product", cascade="all, delete-orphan")
 
@@ -76,6 +100,11 @@ class Order(Base):
     status: Mapped[str] = mapped_column(String(20), default='PLACED')
     created_at_utc: Mapped[datetime] = mapped_column(default=datetime.utcnow)
 
+    __table_args__ = (
+        Index('ix_orders_created_at_utc_id', 'created_at_utc', 'id'),
+        Index('ix_orders_customer_id_created_at_utc_id', 'customer_id', 'created_at_utc', 'id'),
+    )
+
     # Relationships
     customer: Mapped["User"] = relationship(back_populates='orders')
     items: Mapped[List["OrderItem"]] = relationship(back_populates='order', cascade="all, delete-orphan")
@@ -87,28 +116,70 @@ class ProductImage(Base):
     __tablename__ = 'product_images'
 
     id: Mapped[int] = mapped_column(primary_key=True)
-    url: Mapped[str] = mapped_column(String(500), nullable=False)
+    # Unset until the background worker has uploaded the image
+    url: Mapped[Optional[str]] = mapped_column(String(500))
     is_primary: Mapped[bool] = mapped_column(default=False)
-    product_id: Mapped[int] = mapped_column(ForeignKey('products.id'), nullable=False)
+    product_id: Mapped[int] = mapped_column(ForeignKey('products.id'), nullable=False, index=True)
+    status: Mapped[str] = mapped_column(String(20), default='ready')
+    # Local staging path of the raw upload while it waits for the worker
+    source_ref: Mapped[Optional[str]] = mapped_column(String(500))
+    blob_key: Mapped[Optional[str]] = mapped_column(String(200))
+    # Object path of a direct upload; kept after processing so a repeated confirm is recognised
+    upload_path: Mapped[Optional[str]] = mapped_column(String(500), unique=True, index=True)
+    # When a worker claimed the image; the claim lapses after IMAGE_CLAIM_LEASE_SECONDS
+    claimed_at_utc: Mapped[Optional[datetime]] = mapped_column()
     created_at_utc: Mapped[datetime] = mapped_column(default=datetime.utcnow)
 
     # Relationships
     product: Mapped["Product"] = relationship(back_populates='images')
+    variants: Mapped[List["ProductImageVariant"]] = relationship(back_populates='image', cascade="all, delete-orphan")
+    thumbnail: Mapped[Optional["ProductImageVariant"]] = relationship(
+        primaryjoin="and_(ProductImageVariant.image_id == ProductImage.id, ProductImageVariant.name == 'thumbnail')",
+        viewonly=True,
+        uselist=False
+    )
+
+    @property
+    def thumbnail_url(self) -> Optional[str]:
+        return self.thumbnail.url if self.thumbnail else None
 
     def __repr__(self) -> str:
         return f'<ProductImage {self.id}>'
 
+class ProductImageVariant(Base):
+    __tablename__ = 'product_image_variants'
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    image_id: Mapped[int] = mapped_column(ForeignKey('product_images.id'), nullable=False, index=True)
+    name: Mapped[str] = mapped_column(String(20), nullable=False)
+    url: Mapped[str] = mapped_column(String(500), nullable=False)
+    width: Mapped[int] = mapped_column(nullable=False)
+    height: Mapped[int] = mapped_column(nullable=False)
+    blob_key: Mapped[Optional[str]] = mapped_column(String(200))
+    created_at_utc: Mapped[datetime] = mapped_column(default=datetime.utcnow)
+
+    # Relationships
+    image: Mapped["ProductImage"] = relationship(back_populates='variants')
+
+    def __repr__(self) -> str:
+        return f'<ProductImageVariant {self.image_id}:{self.name}>'
+
 class OrderItem(Base):
     __tablename__ = 'order_items'
 
     id: Mapped[int] = mapped_column(primary_key=True)
     order_id: Mapped[int] = mapped_column(ForeignKey('orders.id'), nullable=False)
-    product_id: Mapped[int] = mapped_column(ForeignKey('products.id'), nullable=False)
+    product_id: Mapped[int] = mapped_column(ForeignKey('products.id'), nullable=False, index=True)
     product_name: Mapped[str] = mapped_column(String(100), nullable=False)
     product_price: Mapped[float] = mapped_column(nullable=False)
     quantity: Mapped[int] = mapped_column(nullable=False)
     total_price: Mapped[float] = mapped_column(nullable=False)
 
+    # Covers loading an order's items and the vendor EXISTS check
+    __table_args__ = (
+        Index('ix_order_items_order_id_product_id', 'order_id', 'product_id'),
+    )
+
     # Relationships
     order: Mapped["Order"] = relationship(back_populates='items')
     product: Mapped["Product"] = relationship(back_populates='order_items')
@@ -116,5 +187,29 @@ class OrderItem(Base):
     def __repr__(self) -> str:
         return f'<OrderItem {self.id}>'
 
+class StoredBlob(Base):
+    __tablename__ = 'stored_blobs'
+
+    # Content-addressed name, e.g. '<sha256>.jpg' or '<sha256>_thumbnail.webp'
+    key: Mapped[str] = mapped_column(String(200), primary_key=True)
+    url: Mapped[str] = mapped_column(String(500), nullable=False)
+    ref_count: Mapped[int] = mapped_column(nullable=False, default=1)
+    width: Mapped[Optional[int]] = mapped_column()
+    height: Mapped[Optional[int]] = mapped_column()
+    created_at_utc: Mapped[datetime] = mapped_column(default=datetime.utcnow)
+
+    def __repr__(self) -> str:
+        return f'<StoredBlob {self.key} refs={self.ref_count}>'
+
+class RowCounter(Base):
+    __tablename__ = 'row_counters'
+
+    key: Mapped[str] = mapped_column(String(100), primary_key=True)
+    value: Mapped[int] = mapped_column(nullable=False, default=0)
+
+    def __repr__(self) -> str:
+        return f'<RowCounter {self.key}={self.value}>'
+
 def init_db():
+    """Create missing tables; changes to existing tables go through migrations.py."""
     Base.metadata.create_all(engine)
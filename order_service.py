@@ -1,17 +1,31 @@
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, selectinload
 from models import Order, OrderItem, Product, User
-from contracts import PlaceOrderRequest, OrderResponse, OrderItem as OrderItemResponse
-from sqlalchemy import and_, or_
+from contracts import (
+    PlaceOrderRequest, OrderResponse, OrderItem as OrderItemResponse,
+    BulkUpdateOrderStatusResponse, OrderStatusResult
+)
+from sqlalchemy import and_, or_, select, insert, update
 from datetime import datetime
-from typing import List, Tuple
+from typing import Iterable, List, Optional, Tuple
+from pagination import paginate, next_cursor
+from counts import count_provider, customer_orders_key, vendor_orders_key
+from read_routing import read_router, user_scope
 
 def place_order(db: Session, request: PlaceOrderRequest, customer_id: int) -> OrderResponse:
+    if not request.items:
+        raise ValueError("Order must contain at least one item")
+
     total_amount = 0
     order_items = []
     
     product_ids = [item.product_id for item in request.items]
     
-    products = {p.id: p for p in db.query(Product).filter(Product.id.in_(product_ids)).all()}
+    products = {
+        p.id: p for p in db.execute(
+            select(Product.id, Product.name, Product.price, Product.owner_id)
+            .where(Product.id.in_(product_ids))
+        ).all()
+    }
     
     for item in request.items:
         product = products.get(item.product_id)
@@ -22,93 +36,136 @@ def place_order(db: Session, request: PlaceOrderRequest, customer_id: int) -> Or
         total_amount += item_total
         
         order_items.append({
-            "product": product,
+            "product_id": product.id,
+            "product_name": product.name,
+            "product_price": product.price,
             "quantity": item.quantity,
-            "price_at_time": product.price,
             "total_price": item_total
         })
 
-    order = Order(
+    created_at_utc = datetime.utcnow()
+    order_id = db.scalar(
+        insert(Order)
+        .values(
+            customer_id=customer_id,
+            total_amount=total_amount,
+            shipping_address=request.shipping_address,
+            status="PLACED",
+            created_at_utc=created_at_utc
+        )
+        .returning(Order.id)
+    )
+
+    # One multi-row INSERT; ids come back in the order the items were given
+    item_ids = db.scalars(
+        insert(OrderItem).returning(OrderItem.id, sort_by_parameter_order=True),
+        [{"order_id": order_id, **item} for item in order_items]
+    ).all()
+
+    vendor_ids = {p.owner_id for p in products.values()}
+    count_keys = [customer_orders_key(customer_id)] + [vendor_orders_key(owner_id) for owner_id in vendor_ids]
+    count_provider.adjust(db, count_keys, 1)
+    db.commit()
+    # Vendors' order listings change too; keep their reads, and count refills, on the primary
+    read_router.record_write(user_scope(customer_id), *(user_scope(owner_id) for owner_id in vendor_ids))
+    count_provider.invalidate(count_keys)
+    
+    return OrderResponse(
+        id=order_id,
         customer_id=customer_id,
+        items=[
+            OrderItemResponse(id=item_id, **item)
+            for item_id, item in zip(item_ids, order_items)
+        ],
         total_amount=total_amount,
         shipping_address=request.shipping_address,
         status="PLACED",
-        created_at_utc=datetime.utcnow()
+        created_at_utc=created_at_utc
     )
-    db.add(order)
-    db.flush()
-
-    for item in order_items:
-        order_item = OrderItem(
-            order_id=order.id,
-            product_id=item["product"].id,
-            product_name=item["product"].name,
-            product_price=item["price_at_time"],
-            quantity=item["quantity"],
-            total_price=item["total_price"]
-        )
-        db.add(order_item)
-
-    db.commit()
-    
-    return get_order_by_id(db, order.id)
 
 def get_order_by_id(db: Session, order_id: int) -> OrderResponse:
-    order = db.query(Order).filter(Order.id == order_id).first()
+    order = db.query(Order).options(selectinload(Order.items)).filter(Order.id == order_id).first()
     if not order:
         raise ValueError(f"Order with ID {order_id} not found")
         
     return create_order_response(order)
 
-def get_vendor_orders(db: Session, vendor_id: int, page: int = 1, limit: int = 10) -> Tuple[List[OrderResponse], int]:
-    vendor_product_ids = db.query(Product.id).filter(Product.owner_id == vendor_id).all()
-    vendor_product_ids = [p[0] for p in vendor_product_ids]
-    
-    if not vendor_product_ids:
-        return [], 0
-        
-    base_query = db.query(Order).join(OrderItem).filter(OrderItem.product_id.in_(vendor_product_ids))
+def vendor_order_filter(vendor_id: int):
+    """EXISTS clause matching orders that contain at least one of the vendor's products."""
+    return (
+        select(OrderItem.id)
+        .join(Product, OrderItem.product_id == Product.id)
+        .where(OrderItem.order_id == Order.id, Product.owner_id == vendor_id)
+        .exists()
+    )
+
+def get_vendor_orders(db: Session, vendor_id: int, page: int = 1, limit: int = 10, cursor: Optional[str] = None) -> Tuple[List[OrderResponse], int, Optional[str]]:
+    base_query = select(Order).where(vendor_order_filter(vendor_id))
     
-    total = base_query.count()
+    total = count_provider.count(db, vendor_orders_key(vendor_id), base_query)
     
-    orders = base_query.order_by(Order.created_at_utc.desc()) \
-        .offset((page - 1) * limit) \
-        .limit(limit) \
-        .all()
+    orders = db.scalars(
+        paginate(base_query.options(selectinload(Order.items)), Order, page, limit, cursor)
+    ).all()
+    orders, cursor = next_cursor(list(orders), limit)
     
-    return [create_order_response(order) for order in orders], total
+    return [create_order_response(order) for order in orders], total, cursor
 
-def get_customer_orders(db: Session, customer_id: int, page: int = 1, limit: int = 10) -> Tuple[List[OrderResponse], int]:
-    base_query = db.query(Order).filter(Order.customer_id == customer_id)
+def get_customer_orders(db: Session, customer_id: int, page: int = 1, limit: int = 10, cursor: Optional[str] = None) -> Tuple[List[OrderResponse], int, Optional[str]]:
+    base_query = select(Order).where(Order.customer_id == customer_id)
     
-    total = base_query.count()
+    total = count_provider.count(db, customer_orders_key(customer_id), base_query)
     
-    orders = base_query.order_by(Order.created_at_utc.desc()) \
-        .offset((page - 1) * limit) \
-        .limit(limit) \
-        .all()
+    orders = db.scalars(
+        paginate(base_query.options(selectinload(Order.items)), Order, page, limit, cursor)
+    ).all()
+    orders, cursor = next_cursor(list(orders), limit)
     
-    return [create_order_response(order) for order in orders], total
+    return [create_order_response(order) for order in orders], total, cursor
 
 def create_order_response(order: Order) -> OrderResponse:
-    return OrderResponse(
-        id=order.id,
-        customer_id=order.customer_id,
-        items=[
-            OrderItemResponse(
-                id=item.id,
-                product_id=item.product_id,
-                product_name=item.product_name,
-                product_price=item.product_price,
-                quantity=item.quantity,
-                total_price=item.total_price
-            ) for item in order.items
-        ],
-        total_amount=order.total_amount,
-        shipping_address=order.shipping_address,
-        status=order.status,
-        created_at_utc=order.created_at_utc
-    )
+    """Serialize an order; load order.items with selectinload to avoid a query per order."""
+    return OrderResponse.model_validate(order)
+
+VALID_ORDER_STATUSES = ['PLACED', 'SHIPPED', 'DELIVERED', 'CANCELLED']
+
+def _validate_status_change(new_status: str, user_type: str) -> str:
+    """Role and status checks that do not depend on the order; returns the normalized status."""
+    if user_type in ('buyer', 'customer'):
+        # Customers can only cancel orders
+        if new_status.upper() != 'CANCELLED':
+            raise ValueError('Customers can only cancel orders')
+    elif user_type != 'vendor':
+        raise ValueError('Invalid user type')
+
+    if new_status.upper() not in VALID_ORDER_STATUSES:
+        raise ValueError(f'Invalid status. Must be one of: {", ".join(VALID_ORDER_STATUSES)}')
+    return new_status.upper()
+
+def order_access_filter(user_id: int, user_type: str):
+    """
+    Orders the user may change the status of:
+    - Vendors can only update orders containing their products
+    - Customers can only update their own orders
+    """
+    if user_type == 'vendor':
+        return vendor_order_filter(user_id)
+    return Order.customer_id == user_id
+
+def _permission_error(user_type: str) -> str:
+    if user_type == 'vendor':
+        return 'You do not have permission to update this order'
+    return 'You can only update your own orders'
+
+def _order_scopes(db: Session, order_ids: List[int], customer_ids: Iterable[int]) -> List[str]:
+    """Read scopes of everyone whose order listings include these orders: their customers and vendors."""
+    vendor_ids = db.scalars(
+        select(Product.owner_id)
+        .join(OrderItem, OrderItem.product_id == Product.id)
+        .where(OrderItem.order_id.in_(order_ids))
+        .distinct()
+    ).all() if order_ids else []
+    return [user_scope(user_id) for user_id in {*customer_ids, *vendor_ids}]
 
 def update_order_status(db: Session, order_id: int, new_status: str, user_id: int, user_type: str) -> OrderResponse:
     """
@@ -116,41 +173,65 @@ def update_order_status(db: Session, order_id: int, new_status: str, user_id: in
     - Vendors can only update orders containing their products
     - Customers can only cancel their own orders
     """
-    order = db.query(Order).filter(Order.id == order_id).first()
+    order = db.query(Order).options(selectinload(Order.items)).filter(Order.id == order_id).first()
     if not order:
         raise ValueError(f'Order with ID {order_id} not found')
-    
+
     # Check permissions based on user type
     if user_type == 'vendor':
-        # Vendor can only update orders containing their products
-        vendor_product_ids = db.query(Product.id).filter(Product.owner_id == user_id).all()
-        vendor_product_ids = [p[0] for p in vendor_product_ids]
-        
-        order_product_ids = [item.product_id for item in order.items]
-        has_vendor_products = any(pid in vendor_product_ids for pid in order_product_ids)
-        
-        if not has_vendor_products:
-            raise ValueError('You do not have permission to update this order')
-    
-    elif user_type == 'buyer' or user_type == 'customer':
-        # Customer can only update their own orders
-        if order.customer_id != user_id:
-            raise ValueError('You can only update your own orders')
-        
-        # Customers can only cancel orders
-        if new_status.upper() != 'CANCELLED':
-            raise ValueError('Customers can only cancel orders')
-    
+        has_access = db.scalar(
+            select(Order.id).where(Order.id == order_id, order_access_filter(user_id, user_type))
+        )
+    elif user_type in ('buyer', 'customer'):
+        has_access = order.customer_id == user_id
     else:
         raise ValueError('Invalid user type')
+
+    if not has_access:
+        raise ValueError(_permission_error(user_type))
+
+    status = _validate_status_change(new_status, user_type)
     
-    # Validate status
-    valid_statuses = ['PLACED', 'SHIPPED', 'DELIVERED', 'CANCELLED']
-    if new_status.upper() not in valid_statuses:
-        raise ValueError(f'Invalid status. Must be one of: {", ".join(valid_statuses)}')
-    
-    order.status = new_status.upper()
+    order.status = status
+    # Serialize before commit so expiry does not force the order and its items to reload
+    response = create_order_response(order)
+    scopes = _order_scopes(db, [order_id], [order.customer_id])
     db.commit()
-    db.refresh(order)
+    read_router.record_write(*scopes)
     
-    return create_order_response(order)
\ No newline at end of file
+    return response
+
+def bulk_update_order_status(db: Session, order_ids: List[int], new_status: str, user_id: int, user_type: str) -> BulkUpdateOrderStatusResponse:
+    """
+    Apply one status to many orders with a single UPDATE whose WHERE clause
+    carries the permission check. Orders that were not updated are looked
+    up afterwards, only to report why.
+    """
+    status = _validate_status_change(new_status, user_type)
+    order_ids = list(dict.fromkeys(order_ids))
+
+    updated = db.execute(
+        update(Order)
+        .where(Order.id.in_(order_ids), order_access_filter(user_id, user_type))
+        .values(status=status)
+        .returning(Order.id, Order.customer_id)
+        .execution_options(synchronize_session=False)
+    ).all()
+    updated_ids = {row.id for row in updated}
+    scopes = _order_scopes(db, list(updated_ids), (row.customer_id for row in updated))
+    db.commit()
+    read_router.record_write(*scopes)
+
+    missing_ids = [order_id for order_id in order_ids if order_id not in updated_ids]
+    existing_ids = set(db.scalars(select(Order.id).where(Order.id.in_(missing_ids))).all()) if missing_ids else set()
+
+    results = []
+    for order_id in order_ids:
+        if order_id in updated_ids:
+            results.append(OrderStatusResult(order_id=order_id, updated=True))
+        elif order_id in existing_ids:
+            results.append(OrderStatusResult(order_id=order_id, updated=False, error=_permission_error(user_type)))
+        else:
+            results.append(OrderStatusResult(order_id=order_id, updated=False, error=f'Order with ID {order_id} not found'))
+
+    return BulkUpdateOrderStatusResponse(status=status, updated=len(updated_ids), results=results)
@@ -0,0 +1,44 @@
+import base64
+from datetime import datetime
+from typing import Optional, Tuple
+from sqlalchemy import Select, tuple_
+
+def encode_cursor(created_at_utc: datetime, row_id: int) -> str:
+    raw = f"{created_at_utc.isoformat()}|{row_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        created_at, row_id = base64.urlsafe_b64decode(padded).decode().split('|')
+        return datetime.fromisoformat(created_at), int(row_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+def paginate(stmt: Select, model, page: int, limit: int, cursor: Optional[str] = None) -> Select:
+    """
+    Order a listing newest-first on (created_at_utc, id) and restrict it to one page.
+    - With a cursor, seek past the last row of the previous page instead of
+      scanning and discarding an offset.
+    - Without a cursor, fall back to the classic page/limit offset.
+    One extra row is fetched in both modes so the caller can tell whether
+    another page follows.
+    """
+    stmt = stmt.order_by(model.created_at_utc.desc(), model.id.desc())
+
+    if cursor is not None:
+        created_at, row_id = decode_cursor(cursor)
+        return stmt.where(
+            tuple_(model.created_at_utc, model.id) < tuple_(created_at, row_id)
+        ).limit(limit + 1)
+
+    return stmt.offset((page - 1) * limit).limit(limit + 1)
+
+def next_cursor(rows: list, limit: int) -> Tuple[list, Optional[str]]:
+    """Trim the look-ahead row of a page and build the cursor for the next one."""
+    if len(rows) <= limit:
+        return rows, None
+
+    rows = rows[:limit]
+    last = rows[-1]
+    return rows, encode_cursor(last.created_at_utc, last.id)
@@ -0,0 +1,84 @@
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import List, Optional
+from werkzeug.security import generate_password_hash, check_password_hash
+from dotenv import load_dotenv
+import multiprocessing
+import threading
+import os
+
+load_dotenv()
+
+PASSWORD_HASH_PROCESSES = int(os.getenv('PASSWORD_HASH_PROCESSES', str(os.cpu_count() or 1)))
+PASSWORD_HASH_MAX_PENDING = int(os.getenv('PASSWORD_HASH_MAX_PENDING', str(PASSWORD_HASH_PROCESSES * 8)))
+# Any werkzeug method string, e.g. "scrypt:32768:8:1" or "pbkdf2:sha256:600000"
+PASSWORD_HASH_METHOD = os.getenv('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1')
+
+class HashingBusyError(Exception):
+    """Raised when too many hashes are already queued; callers should retry later."""
+
+    def __init__(self):
+        super().__init__("Server is busy, please retry shortly")
+
+_executor: Optional[ProcessPoolExecutor] = None
+_executor_lock = threading.Lock()
+_pending = threading.BoundedSemaphore(PASSWORD_HASH_MAX_PENDING)
+_method_prefix: Optional[str] = None
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # Spawned rather than forked: callers are request threads
+            _executor = ProcessPoolExecutor(
+                max_workers=PASSWORD_HASH_PROCESSES,
+                mp_context=multiprocessing.get_context('spawn')
+            )
+        return _executor
+
+def _submit(blocking: bool, fn, *args) -> Future:
+    if not _pending.acquire(blocking=blocking):
+        raise HashingBusyError()
+    try:
+        future = _get_executor().submit(fn, *args)
+    except Exception:
+        _pending.release()
+        raise
+    future.add_done_callback(lambda _: _pending.release())
+    return future
+
+def _run(fn, *args):
+    """Run a KDF call on the pool, refusing work beyond the queue-depth limit."""
+    return _submit(False, fn, *args).result()
+
+def _hash_many(passwords: List[str], method: str) -> List[str]:
+    return [generate_password_hash(password, method) for password in passwords]
+
+def hash_password(password: str) -> str:
+    return _run(generate_password_hash, password, PASSWORD_HASH_METHOD)
+
+def hash_passwords(passwords: List[str]) -> List[str]:
+    """
+    Hash a batch split into one task per pool process. Bulk callers wait
+    for queue capacity instead of failing, and never hold more than one
+    slot per process, so interactive logins keep some headroom.
+    """
+    if not passwords:
+        return []
+    chunk_size = -(-len(passwords) // PASSWORD_HASH_PROCESSES)
+    futures = [
+        _submit(True, _hash_many, passwords[i:i + chunk_size], PASSWORD_HASH_METHOD)
+        for i in range(0, len(passwords), chunk_size)
+    ]
+    return [password_hash for future in futures for password_hash in future.result()]
+
+def check_password(password_hash: str, password: str) -> bool:
+    return _run(check_password_hash, password_hash, password)
+
+def needs_rehash(password_hash: str) -> bool:
+    """True if the stored hash was made with different parameters than PASSWORD_HASH_METHOD."""
+    global _method_prefix
+    if _method_prefix is None:
+        # werkzeug fills in defaults for omitted parameters, so read the
+        # normalized method back from a real hash once
+        _method_prefix = hash_password('').split('$', 1)[0]
+    return password_hash.split('$', 1)[0] != _method_prefix
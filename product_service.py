@@ -1,64 +1,119 @@
-from sqlalchemy.orm import Session
-from sqlalchemy import select, func
-from models import Product, ProductImage
-from typing import List, Optional
+from sqlalchemy.orm import Session, selectinload
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from models import Product, ProductImage, ProductImageVariant
+from typing import BinaryIO, List, Optional, Tuple
 from contracts import (
     CreateProductRequest, CreateProductResponse, ProductResponse,
-    ProductListRequest, ProductListResponse, ProductImage as ProductImageSchema
+    ProductListRequest, ProductListResponse, ProductImage as ProductImageSchema,
+    CreateImageUploadsRequest, CreateImageUploadsResponse, ImageUpload, ConfirmImageUploadsRequest
 )
-from firebase_config import upload_image_to_firebase
+from blob_store import blob_index, BlobRef
+from pagination import paginate, next_cursor
+from counts import count_provider, products_key, owner_products_key
+from response_cache import catalog_cache
+from read_routing import read_router, CATALOG_SCOPE
+from image_worker import image_worker, stage_image, discard_staged, discard_source, storage_source_ref
+from storage_backend import get_storage_backend, validate_object_path
+from enums import ImageStatusEnum
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from dotenv import load_dotenv
 import uuid
+import os
+
+load_dotenv()
+
+IMAGE_UPLOAD_WORKERS = int(os.getenv('IMAGE_UPLOAD_WORKERS', '4'))
+BACKGROUND_IMAGE_PROCESSING = os.getenv('BACKGROUND_IMAGE_PROCESSING', 'true').lower() == 'true'
+MAX_UPLOAD_BYTES = int(os.getenv('MAX_UPLOAD_BYTES', str(32 * 1024 * 1024)))
+SIGNED_UPLOAD_TTL_SECONDS = int(os.getenv('SIGNED_UPLOAD_TTL_SECONDS', '900'))
+UPLOAD_PREFIX = 'uploads/'
+
+_upload_executor = ThreadPoolExecutor(max_workers=IMAGE_UPLOAD_WORKERS, thread_name_prefix='image-upload')
+
+# Listings only need each image's thumbnail, not every variant
+_LISTING_IMAGES = selectinload(Product.images).selectinload(ProductImage.thumbnail)
+
+def _image_extension(original_filename: str) -> str:
+    original_filename = original_filename.lower()
+    
+    if original_filename.endswith('.jpg') or original_filename.endswith('.jpeg'):
+        return 'jpg'
+    elif original_filename.endswith('.png'):
+        return 'png'
+    elif original_filename.endswith('.gif'):
+        return 'gif'
+    elif original_filename.endswith('.webp'):
+        return 'webp'
+    return 'jpg'
+
+def _storage_filename(original_filename: str) -> str:
+    return f"{uuid.uuid4()}.{_image_extension(original_filename)}"
+
+def _store_image(image_file: BinaryIO, original_filename: str) -> Tuple[BlobRef, List[ProductImageVariant]]:
+    """Store an image and its derivatives the way the background worker does."""
+    staged_path = stage_image(image_file, _storage_filename(original_filename))
+    try:
+        image_blob, variants = image_worker.store_image(staged_path)
+    finally:
+        discard_staged(staged_path)
+    if image_blob is None:
+        raise ValueError("upload failed")
+    return image_blob, variants
+
+def _acquired_keys(stored_images: List[Tuple[BlobRef, List[ProductImageVariant]]]) -> List[str]:
+    return [key for image_blob, variants in stored_images for key in [image_blob.key, *(v.blob_key for v in variants)]]
 
 class ProductService:
     def __init__(self, db: Session):
         self.db = db
 
-    def create_product(self, request: CreateProductRequest, owner_id: int, images: Optional[List[tuple[bytes, str]]] = None) -> CreateProductResponse:
-        new_product = Product(
-            name=request.name,
-            description=request.description,
-            price=request.price,
-            owner_id=owner_id
-        )
-        
-        self.db.add(new_product)
-        self.db.flush()
-
-        product_images = []
-        if images:
-            for i, (image_file, original_filename) in enumerate(images):
-                try:
-                    original_filename = original_filename.lower()
-                    
-                    if original_filename.endswith('.jpg') or original_filename.endswith('.jpeg'):
-                        file_extension = 'jpg'
-                    elif original_filename.endswith('.png'):
-                        file_extension = 'png'
-                    elif original_filename.endswith('.gif'):
-                        file_extension = 'gif'
-                    elif original_filename.endswith('.webp'):
-                        file_extension = 'webp'
-                    else:
-                        file_extension = 'jpg'
-                        
-                    filename = f"{uuid.uuid4()}.{file_extension}"
-                    
-                    image_url = upload_image_to_firebase(image_file, filename)
-                    
-                    product_image = ProductImage(
-                        url=image_url,
-                        is_primary=(i == 0),
-                        product_id=new_product.id
-                    )
-                    self.db.add(product_image)
-                    product_images.append(ProductImageSchema(
-                        url=image_url,
-                        is_primary=(i == 0)
-                    ))
-                except Exception as e:
-                    raise ValueError(f"Failed to process image {i+1}: {str(e)}")
-        
-        self.db.commit()
+    def create_product(self, request: CreateProductRequest, owner_id: int, images: Optional[List[tuple[BinaryIO, str]]] = None) -> CreateProductResponse:
+        if images and BACKGROUND_IMAGE_PROCESSING:
+            return self._create_product_deferred(request, owner_id, images)
+
+        # Upload before touching the database so no connection is held during network I/O
+        stored_images = self._upload_images(images) if images else []
+
+        try:
+            new_product = Product(
+                name=request.name,
+                description=request.description,
+                price=request.price,
+                owner_id=owner_id
+            )
+            
+            self.db.add(new_product)
+            self.db.flush()
+
+            product_images = []
+            for i, (image_blob, variants) in enumerate(stored_images):
+                product_image = ProductImage(
+                    url=image_blob.url,
+                    blob_key=image_blob.key,
+                    is_primary=(i == 0),
+                    product_id=new_product.id,
+                    variants=variants
+                )
+                self.db.add(product_image)
+                product_images.append(ProductImageSchema(
+                    url=image_blob.url,
+                    is_primary=(i == 0),
+                    thumbnail_url=next((v.url for v in variants if v.name == 'thumbnail'), None)
+                ))
+            
+            count_keys = [products_key(), owner_products_key(owner_id)]
+            count_provider.adjust(self.db, count_keys, 1)
+            self.db.commit()
+        except Exception:
+            self.db.rollback()
+            blob_index.release_now(_acquired_keys(stored_images))
+            raise
+
+        read_router.record_write(CATALOG_SCOPE)
+        count_provider.invalidate(count_keys)
+        catalog_cache.invalidate()
         self.db.refresh(new_product)
         
         return CreateProductResponse(
@@ -71,91 +126,256 @@ class ProductService:
             owner_id=new_product.owner_id
         )
 
+    def _create_product_deferred(self, request: CreateProductRequest, owner_id: int, images: List[tuple[BinaryIO, str]]) -> CreateProductResponse:
+        """
+        Persist the product with pending image rows pointing at locally staged
+        files and hand the uploads to the background image worker.
+        """
+        staged_paths = []
+        try:
+            for image_file, original_filename in images:
+                staged_paths.append(stage_image(image_file, _storage_filename(original_filename)))
+
+            new_product = Product(
+                name=request.name,
+                description=request.description,
+                price=request.price,
+                owner_id=owner_id
+            )
+            new_product.images = [
+                ProductImage(
+                    is_primary=(i == 0),
+                    status=ImageStatusEnum.PENDING.value,
+                    source_ref=staged_path
+                )
+                for i, staged_path in enumerate(staged_paths)
+            ]
+            self.db.add(new_product)
+            self.db.flush()
+
+            image_ids = [image.id for image in new_product.images]
+            response = CreateProductResponse(
+                id=new_product.id,
+                name=new_product.name,
+                description=new_product.description,
+                price=new_product.price,
+                images=[
+                    ProductImageSchema(is_primary=image.is_primary, status=image.status)
+                    for image in new_product.images
+                ],
+                created_at_utc=new_product.created_at_utc,
+                owner_id=new_product.owner_id
+            )
+
+            count_keys = [products_key(), owner_products_key(owner_id)]
+            count_provider.adjust(self.db, count_keys, 1)
+            self.db.commit()
+        except Exception as e:
+            self.db.rollback()
+            for staged_path in staged_paths:
+                discard_staged(staged_path)
+            if isinstance(e, OSError):
+                raise ValueError(f"Failed to stage image: {str(e)}")
+            raise
+
+        read_router.record_write(CATALOG_SCOPE)
+        count_provider.invalidate(count_keys)
+        catalog_cache.invalidate()
+
+        for image_id in image_ids:
+            image_worker.submit(image_id)
+
+        return response
+
+    def _upload_images(self, images: List[tuple[BinaryIO, str]]) -> List[Tuple[BlobRef, List[ProductImageVariant]]]:
+        """
+        Store images, with their derivatives, concurrently on the shared
+        upload pool. Content that is already in storage is referenced
+        instead of uploaded again.
+        Results come back in input order so the first image stays primary;
+        if any upload fails, the references already taken are released.
+        """
+        futures = [
+            _upload_executor.submit(_store_image, image_file, original_filename)
+            for image_file, original_filename in images
+        ]
+
+        stored_images = []
+        failure = None
+        for i, future in enumerate(futures):
+            try:
+                stored_images.append(future.result())
+            except Exception as e:
+                if failure is None:
+                    failure = ValueError(f"Failed to process image {i+1}: {str(e)}")
+
+        if failure is not None:
+            blob_index.release_now(_acquired_keys(stored_images))
+            raise failure
+
+        return stored_images
+
     def get_all_products(self, request: ProductListRequest) -> ProductListResponse:
-        skip = (request.page - 1) * request.limit
-        
-        total = self.db.scalar(select(func.count()).select_from(Product)) or 0
+        total = count_provider.count(self.db, products_key(), select(Product), table=Product.__tablename__)
         
         total_pages = (total + request.limit - 1) // request.limit
         
         products = self.db.scalars(
-            select(Product)
-            .offset(skip)
-            .limit(request.limit)
-            .order_by(Product.created_at_utc.desc())
+            paginate(
+                select(Product).options(_LISTING_IMAGES),
+                Product, request.page, request.limit, request.cursor
+            )
         ).all()
+        products, cursor = next_cursor(list(products), request.limit)
         
         return ProductListResponse(
-            products=[
-                ProductResponse(
-                    id=product.id,
-                    name=product.name,
-                    description=product.description,
-                    price=product.price,
-                    images=[
-                        ProductImageSchema(url=img.url, is_primary=img.is_primary)
-                        for img in product.images
-                    ],
-                    created_at_utc=product.created_at_utc,
-                    owner_id=product.owner_id
-                )
-                for product in products
-            ],
+            products=[self._to_product_response(product) for product in products],
             total=total,
             page=request.page,
-            total_pages=total_pages
+            total_pages=total_pages,
+            next_cursor=cursor
         )
 
     def get_my_products(self, owner_id: int, request: ProductListRequest) -> ProductListResponse:
-        skip = (request.page - 1) * request.limit
-        
-        total = self.db.scalar(
-            select(func.count())
-            .select_from(Product)
-            .where(Product.owner_id == owner_id)
-        ) or 0
+        total = count_provider.count(
+            self.db,
+            owner_products_key(owner_id),
+            select(Product).where(Product.owner_id == owner_id)
+        )
         
         total_pages = (total + request.limit - 1) // request.limit
         
         products = self.db.scalars(
-            select(Product)
-            .where(Product.owner_id == owner_id)
-            .offset(skip)
-            .limit(request.limit)
-            .order_by(Product.created_at_utc.desc())
+            paginate(
+                select(Product)
+                .where(Product.owner_id == owner_id)
+                .options(_LISTING_IMAGES),
+                Product, request.page, request.limit, request.cursor
+            )
         ).all()
+        products, cursor = next_cursor(list(products), request.limit)
         
         return ProductListResponse(
-            products=[
-                ProductResponse(
-                    id=product.id,
-                    name=product.name,
-                    description=product.description,
-                    price=product.price,
-                    images=[
-                        ProductImageSchema(url=img.url, is_primary=img.is_primary)
-                        for img in product.images
-                    ],
-                    created_at_utc=product.created_at_utc,
-                    owner_id=product.owner_id
-                )
-                for product in products
-            ],
+            products=[self._to_product_response(product) for product in products],
             total=total,
             page=request.page,
-            total_pages=total_pages
+            total_pages=total_pages,
+            next_cursor=cursor
         )
 
-    def delete_product(self, product_id: int, owner_id: int) -> None:
-        """Delete a product. Only the owner can delete their product."""
+    def _to_product_response(self, product: Product) -> ProductResponse:
+        """Build a listing entry; expects product.images and their thumbnails to have been eager-loaded."""
+        return ProductResponse.model_validate(product)
+
+    def create_image_uploads(self, product_id: int, owner_id: int, request: CreateImageUploadsRequest) -> CreateImageUploadsResponse:
+        """Issue short-lived signed URLs so the client can upload images straight to storage."""
+        self._get_owned_product(product_id, owner_id)
+
+        storage = get_storage_backend()
+        expires_at_utc = datetime.utcnow() + timedelta(seconds=SIGNED_UPLOAD_TTL_SECONDS)
+        uploads = []
+        for file in request.files:
+            object_path = f"{UPLOAD_PREFIX}{product_id}/{_storage_filename(file.filename)}"
+            uploads.append(ImageUpload(
+                object_path=object_path,
+                upload_url=storage.signed_upload_url(object_path, file.content_type, SIGNED_UPLOAD_TTL_SECONDS),
+                headers={'Content-Type': file.content_type},
+                expires_at_utc=expires_at_utc
+            ))
+        return CreateImageUploadsResponse(uploads=uploads)
+
+    def confirm_image_uploads(self, product_id: int, owner_id: int, request: ConfirmImageUploadsRequest) -> ProductResponse:
+        """
+        Verify that direct uploads landed and attach them to the product as
+        pending images for the background worker to process. Uploads that
+        were confirmed before are left as they are, so a retried confirm
+        returns the same product even after the worker has consumed them.
+        """
+        product = self._get_owned_product(product_id, owner_id)
+
+        prefix = f"{UPLOAD_PREFIX}{product_id}/"
+        object_paths = list(dict.fromkeys(request.object_paths))
+        for object_path in object_paths:
+            if not object_path.startswith(prefix) or '/' in object_path[len(prefix):]:
+                raise ValueError(f'Invalid upload {object_path}')
+            validate_object_path(object_path)
+
+        confirmed = set(self.db.scalars(
+            select(ProductImage.upload_path)
+            .where(ProductImage.product_id == product_id, ProductImage.upload_path.in_(object_paths))
+        ))
+        new_paths = [object_path for object_path in object_paths if object_path not in confirmed]
+
+        storage = get_storage_backend()
+        for object_path in new_paths:
+            size = storage.stat(object_path)
+            if size is None:
+                raise ValueError(f'Upload {object_path} was not found')
+            if size > MAX_UPLOAD_BYTES:
+                storage.delete(object_path)
+                raise ValueError(f'Upload {object_path} exceeds the {MAX_UPLOAD_BYTES} byte limit')
+
+        if new_paths:
+            has_primary = any(image.is_primary for image in product.images)
+            new_images = [
+                ProductImage(
+                    is_primary=not has_primary and i == 0,
+                    status=ImageStatusEnum.PENDING.value,
+                    source_ref=storage_source_ref(object_path),
+                    upload_path=object_path
+                )
+                for i, object_path in enumerate(new_paths)
+            ]
+            product.images.extend(new_images)
+            try:
+                self.db.flush()
+            except IntegrityError:
+                self.db.rollback()
+                raise ValueError('These uploads are already being confirmed; retry the request')
+            image_ids = [image.id for image in new_images]
+            self.db.commit()
+            read_router.record_write(CATALOG_SCOPE)
+            catalog_cache.invalidate()
+
+            for image_id in image_ids:
+                image_worker.submit(image_id)
+
+        product = self.db.scalar(select(Product).where(Product.id == product_id).options(_LISTING_IMAGES))
+        return self._to_product_response(product)
+
+    def _get_owned_product(self, product_id: int, owner_id: int, action: str = 'modify') -> Product:
         product = self.db.get(Product, product_id)
         
         if not product:
             raise ValueError(f'Product with ID {product_id} not found')
         
         if product.owner_id != owner_id:
-            raise ValueError('You do not have permission to delete this product')
+            raise ValueError(f'You do not have permission to {action} this product')
+
+        return product
+
+    def delete_product(self, product_id: int, owner_id: int) -> None:
+        """Delete a product. Only the owner can delete their product."""
+        product = self._get_owned_product(product_id, owner_id, 'delete')
         
+        source_refs = [image.source_ref for image in product.images if image.source_ref]
+        blob_keys = [image.blob_key for image in product.images] + [
+            variant.blob_key for image in product.images for variant in image.variants
+        ]
+
         # Delete will cascade to ProductImage due to relationship config
         self.db.delete(product)
-        self.db.commit()
\ No newline at end of file
+        orphaned_blobs = blob_index.release(self.db, blob_keys)
+        count_keys = [products_key(), owner_products_key(owner_id)]
+        count_provider.adjust(self.db, count_keys, -1)
+        self.db.commit()
+        read_router.record_write(CATALOG_SCOPE)
+        count_provider.invalidate(count_keys)
+        catalog_cache.invalidate()
+
+        # Storage deletes only once the rows that referenced the blobs are gone
+        blob_index.purge(orphaned_blobs)
+
+        # Images still waiting for the worker are skipped once their row is gone
+        for source_ref in source_refs:
+            discard_source(source_ref)
\ No newline at end of file
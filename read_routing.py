@@ -0,0 +1,126 @@
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+from models import engine, read_engine
+from response_cache import MemoryBackend, RedisBackend, RESPONSE_CACHE_REDIS_URL
+from typing import Optional
+from dotenv import load_dotenv
+import threading
+import time
+import os
+
+load_dotenv()
+
+READ_REPLICA_MAX_LAG_SECONDS = float(os.getenv('READ_REPLICA_MAX_LAG_SECONDS', '5'))
+READ_REPLICA_CHECK_SECONDS = float(os.getenv('READ_REPLICA_CHECK_SECONDS', '1'))
+WRITE_MARK_MAX_ENTRIES = int(os.getenv('WRITE_MARK_MAX_ENTRIES', '10000'))
+# Write marks only reach other processes through Redis; set this to use the
+# replica without Redis when the app runs as a single process
+READ_REPLICA_SINGLE_PROCESS = os.getenv('READ_REPLICA_SINGLE_PROCESS', 'false').lower() == 'true'
+
+# Scope shared by everything that changes the public catalog
+CATALOG_SCOPE = 'catalog'
+
+REPLICA_LAG_SQL = text("""
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+    END
+""")
+
+def user_scope(user_id: int) -> str:
+    return f'user:{user_id}'
+
+class ReadRouter:
+    """
+    Sends reads to the replica when it is close enough to the primary and
+    falls back to the primary otherwise.
+
+    The replica's lag is measured at most every READ_REPLICA_CHECK_SECONDS,
+    giving a horizon: the wall-clock time up to which it has replayed every
+    commit. Writers record the time of their last write per scope (a user,
+    or the catalog); reads in that scope stay on the primary until the
+    horizon passes it, so a user always sees their own writes. Marks are
+    kept in Redis when RESPONSE_CACHE_REDIS_URL is set. Without Redis a
+    write served by one worker process is invisible to the others, so the
+    replica is only used if single_process says there are no others.
+    """
+
+    def __init__(self, primary: Engine, replica: Optional[Engine], max_lag_seconds: float = 5.0, check_seconds: float = 1.0,
+                 single_process: bool = False):
+        if replica is not None and not RESPONSE_CACHE_REDIS_URL and not single_process:
+            print(
+                "Warning: READ_DATABASE_URL is set without RESPONSE_CACHE_REDIS_URL; "
+                "reading from the primary because write marks cannot be shared between processes. "
+                "Set READ_REPLICA_SINGLE_PROCESS=true if the app runs as a single process."
+            )
+            replica = None
+        self.primary = primary
+        self.replica = replica
+        self.max_lag_seconds = max_lag_seconds
+        self.check_seconds = check_seconds
+        # A mark older than this is behind any horizon the router accepts
+        self.mark_ttl_seconds = max_lag_seconds + check_seconds + 1
+        self._marks = RedisBackend(RESPONSE_CACHE_REDIS_URL) if RESPONSE_CACHE_REDIS_URL else MemoryBackend(WRITE_MARK_MAX_ENTRIES)
+        self._horizon: Optional[float] = None
+        self._checked_at = 0.0
+        self._checking = False
+        self._lock = threading.Lock()
+
+    def session(self, *scopes: str) -> Session:
+        """Session for read-only work on behalf of the given scopes."""
+        return Session(self.engine_for(*scopes))
+
+    def engine_for(self, *scopes: str) -> Engine:
+        if self.replica is None:
+            return self.primary
+
+        horizon = self.replica_horizon()
+        if horizon is None:
+            return self.primary
+        for scope in scopes:
+            mark = self._marks.get(f'write-mark:{scope}')
+            if mark is not None and float(mark) >= horizon:
+                return self.primary
+        return self.replica
+
+    def record_write(self, *scopes: str) -> None:
+        """
+        Call after commit, and before invalidating any cache filled from
+        these reads, so a refill cannot come from a replica that has not
+        replayed the write yet.
+        """
+        if self.replica is None:
+            return
+        now = str(time.time()).encode()
+        for scope in scopes:
+            self._marks.set(f'write-mark:{scope}', now, self.mark_ttl_seconds)
+
+    def replica_horizon(self) -> Optional[float]:
+        """Wall-clock time the replica has caught up to, or None if it should not be used."""
+        with self._lock:
+            if self._checking or time.monotonic() - self._checked_at < self.check_seconds:
+                return self._horizon
+            # One thread measures; the rest keep using the previous horizon
+            self._checking = True
+
+        horizon = None
+        try:
+            measured_at = time.time()
+            with self.replica.connect() as conn:
+                lag = conn.scalar(REPLICA_LAG_SQL)
+            if lag is not None and float(lag) <= self.max_lag_seconds:
+                horizon = measured_at - float(lag)
+        except Exception as e:
+            print(f"Read replica check failed: {str(e)}")
+        finally:
+            with self._lock:
+                self._horizon = horizon
+                self._checked_at = time.monotonic()
+                self._checking = False
+        return horizon
+
+read_router = ReadRouter(
+    engine, read_engine, READ_REPLICA_MAX_LAG_SECONDS, READ_REPLICA_CHECK_SECONDS, READ_REPLICA_SINGLE_PROCESS
+)
@@ -0,0 +1,115 @@
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional
+from dotenv import load_dotenv
+import hashlib
+import threading
+import time
+import os
+
+load_dotenv()
+
+RESPONSE_CACHE_TTL_SECONDS = float(os.getenv('RESPONSE_CACHE_TTL_SECONDS', '30'))
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv('RESPONSE_CACHE_MAX_ENTRIES', '512'))
+RESPONSE_CACHE_REDIS_URL = os.getenv('RESPONSE_CACHE_REDIS_URL')
+
+@dataclass(frozen=True)
+class CachedResponse:
+    body: bytes
+    etag: str
+
+class MemoryBackend:
+    """Per-process LRU with TTL. Invalidation only reaches the worker that made the write."""
+
+    def __init__(self, max_entries: int = 512):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, tuple[bytes, float]]" = OrderedDict()
+        self._generations: dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if not entry:
+                return None
+            if entry[1] <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def set(self, key: str, value: bytes, ttl_seconds: float) -> None:
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + ttl_seconds)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def generation(self, namespace: str) -> int:
+        with self._lock:
+            return self._generations.get(namespace, 0)
+
+    def bump_generation(self, namespace: str) -> None:
+        with self._lock:
+            self._generations[namespace] = self._generations.get(namespace, 0) + 1
+
+class RedisBackend:
+    """Shared backend so every worker sees the same entries and invalidations."""
+
+    def __init__(self, url: str):
+        try:
+            import redis
+        except ImportError:
+            raise ValueError("RESPONSE_CACHE_REDIS_URL is set but the redis package is not installed")
+        self._client = redis.Redis.from_url(url)
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self._client.get(key)
+
+    def set(self, key: str, value: bytes, ttl_seconds: float) -> None:
+        self._client.set(key, value, px=int(ttl_seconds * 1000))
+
+    def generation(self, namespace: str) -> int:
+        return int(self._client.get(f'{namespace}:generation') or 0)
+
+    def bump_generation(self, namespace: str) -> None:
+        self._client.incr(f'{namespace}:generation')
+
+class ResponseCache:
+    """
+    Caches serialized response bodies with a strong ETag.
+    Invalidation bumps a generation number that is part of every key, so
+    entries written by a request that raced with the invalidating write are
+    stored under the old generation and never served.
+    """
+
+    def __init__(self, namespace: str, backend, ttl_seconds: float = 30.0):
+        self.namespace = namespace
+        self.backend = backend
+        self.ttl_seconds = ttl_seconds
+
+    def key_for(self, *params) -> str:
+        generation = self.backend.generation(self.namespace)
+        return f"{self.namespace}:{generation}:" + ':'.join('' if p is None else str(p) for p in params)
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        raw = self.backend.get(key)
+        if raw is None:
+            return None
+        etag, body = raw.split(b'\n', 1)
+        return CachedResponse(body=body, etag=etag.decode())
+
+    def set(self, key: str, body: bytes) -> CachedResponse:
+        etag = hashlib.sha256(body).hexdigest()
+        self.backend.set(key, etag.encode() + b'\n' + body, self.ttl_seconds)
+        return CachedResponse(body=body, etag=etag)
+
+    def invalidate(self) -> None:
+        self.backend.bump_generation(self.namespace)
+
+def _create_backend():
+    if RESPONSE_CACHE_REDIS_URL:
+        return RedisBackend(RESPONSE_CACHE_REDIS_URL)
+    return MemoryBackend(RESPONSE_CACHE_MAX_ENTRIES)
+
+catalog_cache = ResponseCache('catalog', _create_backend(), RESPONSE_CACHE_TTL_SECONDS)
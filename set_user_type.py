@@ -0,0 +1,28 @@
+"""
+Operator tool for moving an account to another role. The user's access
+tokens are revoked, so tokens carrying the old role stop working.
+
+    python set_user_type.py someone@example.com vendor
+    python set_user_type.py ops@example.com admin     # can read /stats
+"""
+from auth import AuthService
+from enums import UserTypeEnum
+import argparse
+import sys
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Change a user's role")
+    parser.add_argument('email')
+    parser.add_argument('user_type', choices=[user_type.value for user_type in UserTypeEnum])
+    args = parser.parse_args()
+
+    try:
+        result = AuthService().change_user_type(args.email, UserTypeEnum(args.user_type))
+    except ValueError as e:
+        print(str(e), file=sys.stderr)
+        return 1
+    print(result['message'])
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,165 @@
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from typing import BinaryIO, List, Optional, Tuple
+from urllib.parse import urlencode
+from dotenv import load_dotenv
+import threading
+import hashlib
+import hmac
+import time
+import tempfile
+import shutil
+import io
+import os
+
+load_dotenv()
+
+STORAGE_BACKEND = os.getenv('STORAGE_BACKEND', 'firebase')
+STORAGE_BATCH_WORKERS = int(os.getenv('STORAGE_BATCH_WORKERS', '8'))
+LOCAL_STORAGE_DIR = os.getenv('LOCAL_STORAGE_DIR', os.path.join(tempfile.gettempdir(), 'artizon-storage'))
+LOCAL_STORAGE_BASE_URL = os.getenv('LOCAL_STORAGE_BASE_URL', 'http://localhost:5000/media')
+STORAGE_SIGNING_KEY = os.getenv('STORAGE_SIGNING_KEY', os.getenv('JWT_SECRET_KEY', ''))
+
+_batch_executor = ThreadPoolExecutor(max_workers=STORAGE_BATCH_WORKERS, thread_name_prefix='storage-batch')
+
+def guess_content_type(path: str) -> str:
+    path = path.lower()
+    if path.endswith(('.jpg', '.jpeg')):
+        return 'image/jpeg'
+    elif path.endswith('.png'):
+        return 'image/png'
+    elif path.endswith('.gif'):
+        return 'image/gif'
+    elif path.endswith('.webp'):
+        return 'image/webp'
+    return 'application/octet-stream'
+
+def file_size(file_obj: BinaryIO) -> int:
+    file_obj.seek(0, io.SEEK_END)
+    size = file_obj.tell()
+    file_obj.seek(0)
+    return size
+
+def validate_object_path(path: str) -> str:
+    """Reject object paths that are absolute or have empty, '.' or '..' segments."""
+    if not path or path.startswith('/') or '\\' in path or any(segment in ('', '.', '..') for segment in path.split('/')):
+        raise ValueError(f"Invalid storage path: {path}")
+    return path
+
+class StorageBackend(ABC):
+    """Object storage for public product media, addressed by object path."""
+
+    @abstractmethod
+    def put(self, file_obj: BinaryIO, path: str) -> str:
+        """Store the file under path, make it publicly readable and return its URL."""
+
+    @abstractmethod
+    def delete(self, path: str) -> None:
+        pass
+
+    @abstractmethod
+    def signed_upload_url(self, path: str, content_type: str, expires_in: int) -> str:
+        """Short-lived URL a client can PUT the object's bytes to directly."""
+
+    @abstractmethod
+    def stat(self, path: str) -> Optional[int]:
+        """Size of the stored object in bytes, or None if it does not exist."""
+
+    @abstractmethod
+    def download(self, path: str, file_obj: BinaryIO) -> None:
+        pass
+
+    def put_many(self, items: List[Tuple[BinaryIO, str]]) -> List[str]:
+        """Store several files in parallel; URLs are returned in input order."""
+        if len(items) <= 1:
+            return [self.put(file_obj, path) for file_obj, path in items]
+        return list(_batch_executor.map(lambda item: self.put(*item), items))
+
+    def delete_many(self, paths: List[str]) -> None:
+        if len(paths) <= 1:
+            for path in paths:
+                self.delete(path)
+            return
+        list(_batch_executor.map(self.delete, paths))
+
+class LocalStorageBackend(StorageBackend):
+    """
+    Filesystem stand-in for tests and benchmarks. Files are served back over
+    HTTP by the /media route in app.py.
+    """
+
+    def __init__(self, root_dir: str, base_url: str):
+        self.root_dir = root_dir
+        self.base_url = base_url.rstrip('/')
+        os.makedirs(root_dir, exist_ok=True)
+
+    def local_path(self, path: str) -> str:
+        validate_object_path(path)
+        # Symlinks could still lead outside the root
+        full_path = os.path.realpath(os.path.join(self.root_dir, path))
+        if not full_path.startswith(os.path.realpath(self.root_dir) + os.sep):
+            raise ValueError(f"Invalid storage path: {path}")
+        return full_path
+
+    def put(self, file_obj: BinaryIO, path: str) -> str:
+        if not file_size(file_obj):
+            raise ValueError("Empty file data received")
+
+        full_path = self.local_path(path)
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        # Write to a temporary name first so readers never see a partial file
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(full_path))
+        with os.fdopen(fd, 'wb') as target:
+            shutil.copyfileobj(file_obj, target)
+        os.replace(temp_path, full_path)
+        return f"{self.base_url}/{path}"
+
+    def delete(self, path: str) -> None:
+        try:
+            os.remove(self.local_path(path))
+        except FileNotFoundError:
+            pass
+
+    def signed_upload_url(self, path: str, content_type: str, expires_in: int) -> str:
+        self.local_path(path)
+        expires = int(time.time()) + expires_in
+        signature = self._signature(path, content_type, expires)
+        return f"{self.base_url}/upload/{path}?{urlencode({'expires': expires, 'signature': signature})}"
+
+    def verify_upload_signature(self, path: str, content_type: str, expires: int, signature: str) -> bool:
+        if expires < time.time():
+            return False
+        return hmac.compare_digest(self._signature(path, content_type, expires), signature)
+
+    def stat(self, path: str) -> Optional[int]:
+        try:
+            return os.path.getsize(self.local_path(path))
+        except FileNotFoundError:
+            return None
+
+    def download(self, path: str, file_obj: BinaryIO) -> None:
+        with open(self.local_path(path), 'rb') as source:
+            shutil.copyfileobj(source, file_obj)
+
+    def _signature(self, path: str, content_type: str, expires: int) -> str:
+        message = f"PUT\n{path}\n{content_type}\n{expires}".encode()
+        return hmac.new(STORAGE_SIGNING_KEY.encode(), message, hashlib.sha256).hexdigest()
+
+def create_storage_backend() -> StorageBackend:
+    if STORAGE_BACKEND == 'local':
+        return LocalStorageBackend(LOCAL_STORAGE_DIR, LOCAL_STORAGE_BASE_URL)
+    if STORAGE_BACKEND == 'firebase':
+        from firebase_config import FirebaseStorageBackend
+        return FirebaseStorageBackend()
+    raise ValueError("STORAGE_BACKEND must be one of: firebase, local")
+
+_storage_backend = None
+_storage_backend_lock = threading.Lock()
+
+def get_storage_backend() -> StorageBackend:
+    """Process-wide backend, created on first use so its client is set up once."""
+    global _storage_backend
+    with _storage_backend_lock:
+        if _storage_backend is None:
+            _storage_backend = create_storage_backend()
+        return _storage_backend
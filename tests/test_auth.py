@@ -0,0 +1,131 @@
+import pytest
+from sqlalchemy.orm import Session
+from werkzeug.security import generate_password_hash, check_password_hash
+
+import auth
+from enums import UserTypeEnum
+from models import User
+
+
+@pytest.fixture
+def user_id(engine, monkeypatch):
+    # Hash in-process with a cheap method instead of on the process pool
+    monkeypatch.setattr(auth, 'hash_password', lambda password: generate_password_hash(password, 'pbkdf2:sha256:1000'))
+    monkeypatch.setattr(auth, 'check_password', check_password_hash)
+    monkeypatch.setattr(auth, 'needs_rehash', lambda password_hash: False)
+    monkeypatch.setattr(auth, 'engine', engine)
+    monkeypatch.setattr(auth, 'token_versions', auth.TokenVersionCache(ttl_seconds=60))
+    with Session(engine) as db:
+        user = User(
+            email='customer@example.com', password_hash=auth.get_password_hash('old-password'),
+            first_name='Ada', last_name='Lovelace', user_type='customer', is_email_verified=True
+        )
+        db.add(user)
+        db.commit()
+        return user.id
+
+
+def _token_payload(engine, user_id):
+    with Session(engine) as db:
+        return auth.verify_token(auth.create_access_token(auth.access_token_claims(db.get(User, user_id))))
+
+
+def test_change_password_revokes_existing_tokens(engine, user_id):
+    old_token = _token_payload(engine, user_id)
+    assert auth.is_token_current(old_token)
+
+    result = auth.AuthService().change_password(user_id, 'old-password', 'new-password')
+
+    assert not auth.is_token_current(old_token)
+    assert auth.is_token_current(auth.verify_token(result['access_token']))
+    auth.AuthService().login(auth.LoginRequest(email='customer@example.com', password='new-password'))
+
+
+def test_change_password_rejects_wrong_current_password(engine, user_id):
+    old_token = _token_payload(engine, user_id)
+
+    with pytest.raises(ValueError):
+        auth.AuthService().change_password(user_id, 'wrong-password', 'new-password')
+
+    assert auth.is_token_current(old_token)
+
+
+def test_logout_revokes_tokens(engine, user_id):
+    old_token = _token_payload(engine, user_id)
+
+    auth.AuthService().logout(user_id)
+
+    assert not auth.is_token_current(old_token)
+
+
+def test_change_user_type_revokes_tokens_with_old_role(engine, user_id):
+    old_token = _token_payload(engine, user_id)
+
+    auth.AuthService().change_user_type('customer@example.com', UserTypeEnum.VENDOR)
+
+    assert not auth.is_token_current(old_token)
+    assert _token_payload(engine, user_id)['user_type'] == 'vendor'
+
+
+def test_version_lookup_racing_a_revocation_is_not_cached(engine, user_id, monkeypatch):
+    cache = auth.token_versions
+    real_session = auth.Session
+
+    class RevokingSession(real_session):
+        def scalar(self, *args, **kwargs):
+            version = super().scalar(*args, **kwargs)
+            # A revocation lands after this read but before the result is cached
+            cache.invalidate(user_id)
+            return version
+
+    monkeypatch.setattr(auth, 'Session', RevokingSession)
+    assert cache.get(user_id) == 0
+    monkeypatch.setattr(auth, 'Session', real_session)
+
+    assert user_id not in cache._entries
+
+
+def test_signup_cannot_create_admins():
+    with pytest.raises(ValueError):
+        auth.SignupRequest(
+            first_name='Eve', last_name='Mallory', user_type='admin',
+            email='eve@example.com', password='password1'
+        )
+
+
+def test_signing_up_twice_with_one_email_is_rejected(client, user_id, monkeypatch):
+    sent = []
+    monkeypatch.setattr(auth, 'send_verification_email', lambda email, token: sent.append(email))
+    signup = {
+        'email': 'new@example.com', 'password': 'password1',
+        'first_name': 'Grace', 'last_name': 'Hopper', 'user_type': 'customer'
+    }
+
+    first = client.post('/auth/signup', json=signup)
+    second = client.post('/auth/signup', json=signup)
+    existing = client.post('/auth/signup', json={**signup, 'email': 'customer@example.com'})
+
+    assert first.status_code == 201
+    assert second.status_code == existing.status_code == 400
+    assert second.get_json() == existing.get_json() == {'error': 'Email already registered'}
+    assert sent == ['new@example.com']
+
+
+def test_verify_email_revokes_tokens_claiming_an_unverified_email(engine, user_id):
+    with Session(engine) as db:
+        db.get(User, user_id).is_email_verified = False
+        db.commit()
+    old_token = _token_payload(engine, user_id)
+    assert auth.is_token_current(old_token)
+    verification_token = auth.create_access_token({'sub': str(user_id), 'type': 'email_verification'})
+
+    auth.AuthService().verify_email(verification_token)
+
+    assert not auth.is_token_current(old_token)
+    new_token = _token_payload(engine, user_id)
+    assert new_token['email_verified']
+    assert auth.is_token_current(new_token)
+
+    # Following the link again changes nothing
+    auth.AuthService().verify_email(verification_token)
+    assert auth.is_token_current(new_token)
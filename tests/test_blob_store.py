@@ -0,0 +1,72 @@
+import pytest
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+import blob_store
+from models import StoredBlob
+
+
+class RecordingStorage:
+    def __init__(self):
+        self.deleted = []
+
+    def delete_many(self, paths):
+        self.deleted.extend(paths)
+
+
+@pytest.fixture
+def storage(engine, monkeypatch):
+    storage = RecordingStorage()
+    monkeypatch.setattr(blob_store, 'engine', engine)
+    monkeypatch.setattr(blob_store, 'get_storage_backend', lambda: storage)
+    return storage
+
+
+@pytest.fixture
+def blob(engine, storage):
+    return blob_store.blob_index.register('abc.jpg', 'https://cdn/abc.jpg')
+
+
+def _ref_count(engine, key):
+    with Session(engine) as db:
+        return db.scalar(select(StoredBlob.ref_count).where(StoredBlob.key == key))
+
+
+def test_release_keeps_objects_when_transaction_rolls_back(engine, storage, blob):
+    with Session(engine) as db:
+        assert blob_store.blob_index.release(db, [blob.key]) == [blob.key]
+        db.rollback()
+
+    assert storage.deleted == []
+    assert _ref_count(engine, blob.key) == 1
+
+
+def test_purge_after_commit_deletes_object_and_row(engine, storage, blob):
+    with Session(engine) as db:
+        orphaned = blob_store.blob_index.release(db, [blob.key])
+        db.commit()
+    blob_store.blob_index.purge(orphaned)
+
+    assert storage.deleted == [blob_store.object_path(blob.key)]
+    assert _ref_count(engine, blob.key) is None
+
+
+def test_purge_skips_blob_acquired_again_after_release(engine, storage, blob):
+    with Session(engine) as db:
+        orphaned = blob_store.blob_index.release(db, [blob.key])
+        db.commit()
+    assert blob_store.blob_index.acquire_existing(blob.key) is not None
+
+    assert blob_store.blob_index.purge(orphaned) == []
+    assert storage.deleted == []
+    assert _ref_count(engine, blob.key) == 1
+
+
+def test_purge_without_keys_sweeps_unreferenced_blobs(engine, storage, blob):
+    kept = blob_store.blob_index.register('def.jpg', 'https://cdn/def.jpg')
+    with Session(engine) as db:
+        blob_store.blob_index.release(db, [blob.key])
+        db.commit()
+
+    assert blob_store.blob_index.purge() == [blob.key]
+    assert _ref_count(engine, kept.key) == 1
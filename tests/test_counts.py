@@ -0,0 +1,51 @@
+import pytest
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import StaticPool
+
+import counts
+import models
+from models import User, Product, RowCounter
+
+
+@pytest.fixture
+def provider(engine, monkeypatch):
+    monkeypatch.setattr(counts, 'engine', engine)
+    return counts.CountProvider('counter')
+
+
+def _add_products(engine, owner_email, n):
+    with Session(engine) as db:
+        owner = User(email=owner_email, password_hash='-', first_name='V', last_name='V', user_type='vendor')
+        db.add_all([owner] + [Product(name=f'p{i}', price=1.0, owner=owner) for i in range(n)])
+        db.commit()
+
+
+def test_counter_is_seeded_from_the_primary_not_the_read_session(engine, provider):
+    _add_products(engine, 'vendor@example.com', 3)
+    # A replica that has not received the products yet
+    replica = create_engine('sqlite://', connect_args={'check_same_thread': False}, poolclass=StaticPool)
+    models.Base.metadata.create_all(replica)
+
+    with Session(replica) as replica_db:
+        assert provider.count(replica_db, counts.products_key(), select(Product)) == 3
+
+    with Session(engine) as db:
+        assert db.scalar(select(RowCounter.value).where(RowCounter.key == counts.products_key())) == 3
+
+
+def test_adjust_updates_a_seeded_counter(engine, provider):
+    _add_products(engine, 'vendor@example.com', 2)
+    with Session(engine) as db:
+        assert provider.count(db, counts.products_key(), select(Product)) == 2
+        provider.adjust(db, [counts.products_key()], 1)
+        db.commit()
+        assert provider.count(db, counts.products_key(), select(Product)) == 3
+
+
+def test_existing_counter_is_not_reseeded(engine, provider):
+    with Session(engine) as db:
+        db.add(RowCounter(key=counts.products_key(), value=7))
+        db.commit()
+
+    assert provider._seed(counts.products_key(), select(Product)) == 7
@@ -0,0 +1,117 @@
+import queue
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy.orm import Session
+
+import blob_store
+import image_worker
+from enums import ImageStatusEnum
+from models import User, Product, ProductImage
+
+LAPSED = datetime.utcnow() - timedelta(seconds=image_worker.IMAGE_CLAIM_LEASE_SECONDS + 60)
+
+
+class RecordingQueue:
+    def __init__(self):
+        self.submitted = queue.Queue()
+
+    def put(self, image_id):
+        self.submitted.put(image_id)
+
+
+class DownloadingStorage:
+    def download(self, path, file_obj):
+        file_obj.write(b'image bytes')
+
+
+@pytest.fixture
+def images(engine, monkeypatch):
+    monkeypatch.setattr(image_worker, 'engine', engine)
+    monkeypatch.setattr(blob_store, 'engine', engine)
+    with Session(engine) as db:
+        vendor = User(email='vendor@example.com', password_hash='-', first_name='V', last_name='V', user_type='vendor')
+        product = Product(name='Mug', price=12.0, owner=vendor)
+
+        def image(name, **values):
+            return ProductImage(product=product, source_ref=image_worker.storage_source_ref(f'uploads/{name}.jpg'), **values)
+
+        rows = {
+            'abandoned': image('abandoned', status=ImageStatusEnum.PENDING.value, created_at_utc=LAPSED),
+            'queued': image('queued', status=ImageStatusEnum.PENDING.value),
+            'lapsed': image('lapsed', status=ImageStatusEnum.PROCESSING.value, created_at_utc=LAPSED, claimed_at_utc=LAPSED),
+            'claimed': image('claimed', status=ImageStatusEnum.PROCESSING.value, created_at_utc=LAPSED, claimed_at_utc=datetime.utcnow()),
+            'missing': ProductImage(
+                product=product, status=ImageStatusEnum.PENDING.value, created_at_utc=LAPSED, source_ref='/nonexistent/mug.jpg'
+            ),
+            'ready': ProductImage(product=product, status=ImageStatusEnum.READY.value, url='https://cdn/mug.jpg', created_at_utc=LAPSED),
+        }
+        db.add_all([vendor, product, *rows.values()])
+        db.commit()
+        return {name: row.id for name, row in rows.items()}
+
+
+def _submitted(jobs):
+    submitted = []
+    while not jobs.submitted.empty():
+        submitted.append(jobs.submitted.get_nowait())
+    return submitted
+
+
+def test_requeue_pending_resubmits_only_stale_reachable_images(images):
+    jobs = RecordingQueue()
+    pool = image_worker.ImageWorkerPool(jobs, workers=0)
+
+    assert pool.requeue_pending() == 2
+    assert sorted(_submitted(jobs)) == sorted([images['abandoned'], images['lapsed']])
+
+
+def test_start_requeues_stale_images_once(images):
+    jobs = RecordingQueue()
+    pool = image_worker.ImageWorkerPool(jobs, workers=0)
+
+    pool.start()
+    pool.start()
+
+    submitted = {jobs.submitted.get(timeout=5), jobs.submitted.get(timeout=5)}
+    assert submitted == {images['abandoned'], images['lapsed']}
+    with pytest.raises(queue.Empty):
+        jobs.submitted.get(timeout=0.2)
+
+
+def test_only_one_worker_claims_an_image(engine, images):
+    pool = image_worker.ImageWorkerPool(RecordingQueue(), workers=0)
+    now = datetime.utcnow()
+
+    with Session(engine) as db:
+        assert pool._claim(db, images['queued'], now) is not None
+        assert pool._claim(db, images['queued'], now + timedelta(seconds=1)) is None
+        assert pool._claim(db, images['claimed'], now) is None
+        assert pool._claim(db, images['ready'], now) is None
+
+        image = db.get(ProductImage, images['queued'])
+        assert image.status == ImageStatusEnum.PROCESSING.value
+        assert image.claimed_at_utc == now
+
+
+def test_lapsed_claim_can_be_taken_over(engine, images):
+    pool = image_worker.ImageWorkerPool(RecordingQueue(), workers=0)
+
+    with Session(engine) as db:
+        assert pool._claim(db, images['lapsed'], datetime.utcnow()) is not None
+
+
+def test_downloads_are_staged_in_files_of_their_own(tmp_path, monkeypatch):
+    monkeypatch.setattr(image_worker, 'IMAGE_STAGING_DIR', str(tmp_path))
+    monkeypatch.setattr(image_worker, 'get_storage_backend', lambda: DownloadingStorage())
+    pool = image_worker.ImageWorkerPool(RecordingQueue(), workers=0)
+    source_ref = image_worker.storage_source_ref('uploads/1/mug.jpg')
+
+    first = pool._fetch(source_ref)
+    second = pool._fetch(source_ref)
+
+    assert first != second
+    assert first.endswith('.jpg') and second.endswith('.jpg')
+    for path in (first, second):
+        with open(path, 'rb') as staged:
+            assert staged.read() == b'image bytes'
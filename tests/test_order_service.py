@@ -0,0 +1,145 @@
+import pytest
+from pydantic import ValidationError
+from sqlalchemy import func, select
+
+import order_service
+from contracts import PlaceOrderRequest, OrderItemRequest
+from counts import CountProvider
+from models import Order, Product, User
+
+
+@pytest.fixture
+def marketplace(db, monkeypatch):
+    monkeypatch.setattr(order_service, 'count_provider', CountProvider('exact'))
+
+    def user(name, user_type):
+        return User(email=f'{name}@example.com', password_hash='-', first_name=name, last_name='X', user_type=user_type)
+
+    users = {name: user(name, user_type) for name, user_type in [
+        ('potter', 'vendor'), ('weaver', 'vendor'), ('alice', 'customer'), ('bob', 'customer')
+    ]}
+    products = {
+        'mug': Product(name='Mug', price=12.0, owner=users['potter']),
+        'bowl': Product(name='Bowl', price=20.0, owner=users['potter']),
+        'rug': Product(name='Rug', price=90.0, owner=users['weaver']),
+    }
+    db.add_all([*users.values(), *products.values()])
+    db.commit()
+    return users, products
+
+
+def _order(db, customer, *products):
+    request = PlaceOrderRequest(
+        items=[OrderItemRequest(product_id=product.id, quantity=1) for product in products], shipping_address='1 Main St'
+    )
+    return order_service.place_order(db, request, customer.id).id
+
+
+def test_place_order_request_requires_items():
+    with pytest.raises(ValidationError):
+        PlaceOrderRequest(items=[], shipping_address='1 Main St')
+
+
+def test_place_order_rejects_empty_order(db):
+    request = PlaceOrderRequest.model_construct(items=[], shipping_address='1 Main St')
+
+    with pytest.raises(ValueError, match='at least one item'):
+        order_service.place_order(db, request, customer_id=1)
+
+    assert db.scalar(select(func.count()).select_from(Order)) == 0
+
+
+def test_vendor_orders_list_each_order_once(db, marketplace):
+    users, products = marketplace
+    # Three of the potter's items in one order would be three rows in a join
+    mixed = _order(db, users['alice'], products['mug'], products['bowl'], products['mug'], products['rug'])
+    single = _order(db, users['bob'], products['bowl'])
+    _order(db, users['bob'], products['rug'])
+
+    orders, total, cursor = order_service.get_vendor_orders(db, users['potter'].id, limit=10)
+
+    assert [order.id for order in orders] == [single, mixed]
+    assert len(orders[1].items) == 4
+    assert total == 2
+    assert cursor is None
+
+
+def test_vendor_order_pages_count_orders_not_items(db, marketplace):
+    users, products = marketplace
+    placed = [_order(db, users['alice'], products['mug'], products['bowl'], products['mug']) for _ in range(3)]
+
+    seen, cursor = [], None
+    while True:
+        orders, total, cursor = order_service.get_vendor_orders(db, users['potter'].id, limit=2, cursor=cursor)
+        assert len(orders) <= 2
+        assert total == 3
+        seen.extend(order.id for order in orders)
+        if cursor is None:
+            break
+
+    assert sorted(seen) == sorted(placed)
+    assert len(seen) == len(set(seen))
+
+
+def _statuses(db, *order_ids):
+    db.expire_all()
+    return [db.get(Order, order_id).status for order_id in order_ids]
+
+
+def test_vendor_bulk_update_reports_each_order(db, marketplace):
+    users, products = marketplace
+    mine = _order(db, users['alice'], products['rug'], products['mug'])
+    theirs = _order(db, users['bob'], products['rug'])
+
+    response = order_service.bulk_update_order_status(db, [mine, 9999, theirs], 'shipped', users['potter'].id, 'vendor')
+
+    assert response.status == 'SHIPPED'
+    assert response.updated == 1
+    assert [(r.order_id, r.updated, r.error) for r in response.results] == [
+        (mine, True, None),
+        (9999, False, 'Order with ID 9999 not found'),
+        (theirs, False, 'You do not have permission to update this order'),
+    ]
+    assert _statuses(db, mine, theirs) == ['SHIPPED', 'PLACED']
+
+
+def test_customer_bulk_cancel_reports_each_order(db, marketplace):
+    users, products = marketplace
+    mine = _order(db, users['alice'], products['mug'])
+    theirs = _order(db, users['bob'], products['mug'])
+
+    response = order_service.bulk_update_order_status(db, [theirs, mine, 9999, mine], 'cancelled', users['alice'].id, 'customer')
+
+    assert response.updated == 1
+    assert [(r.order_id, r.updated, r.error) for r in response.results] == [
+        (theirs, False, 'You can only update your own orders'),
+        (mine, True, None),
+        (9999, False, 'Order with ID 9999 not found'),
+    ]
+    assert _statuses(db, mine, theirs) == ['CANCELLED', 'PLACED']
+
+
+class RecordingRouter:
+    def __init__(self):
+        self.scopes = []
+
+    def record_write(self, *scopes):
+        self.scopes.extend(scopes)
+
+
+def test_status_updates_mark_writes_for_customers_and_vendors(db, marketplace, monkeypatch):
+    users, products = marketplace
+    alices = _order(db, users['alice'], products['mug'])
+    bobs = _order(db, users['bob'], products['bowl'], products['rug'])
+    weavers = _order(db, users['bob'], products['rug'])
+    router = RecordingRouter()
+    monkeypatch.setattr(order_service, 'read_router', router)
+
+    order_service.bulk_update_order_status(db, [alices, bobs, weavers], 'shipped', users['potter'].id, 'vendor')
+
+    assert sorted(router.scopes) == sorted(f'user:{users[name].id}' for name in ('alice', 'bob', 'potter', 'weaver'))
+
+    router.scopes.clear()
+    order_service.update_order_status(db, alices, 'cancelled', users['alice'].id, 'customer')
+
+    assert sorted(router.scopes) == sorted(f'user:{users[name].id}' for name in ('alice', 'potter'))
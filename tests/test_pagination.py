@@ -0,0 +1,70 @@
+import base64
+from datetime import datetime, timedelta
+
+import pytest
+
+from models import User, Product
+from pagination import encode_cursor
+
+
+@pytest.fixture
+def tied_catalog(db):
+    vendor = User(email='vendor@example.com', password_hash='-', first_name='V', last_name='V', user_type='vendor')
+    base = datetime(2024, 1, 1)
+    # Runs of products share a timestamp, so only the id breaks the tie
+    products = [
+        Product(name=f'Product {i}', price=10.0, owner=vendor, created_at_utc=base + timedelta(minutes=i // 4))
+        for i in range(23)
+    ]
+    db.add_all([vendor, *products])
+    db.commit()
+    return sorted(products, key=lambda p: (p.created_at_utc, p.id), reverse=True)
+
+
+def _walk(client, limit):
+    ids, cursor = [], None
+    while True:
+        query = f'/products?limit={limit}' + (f'&cursor={cursor}' if cursor else '')
+        response = client.get(query)
+        assert response.status_code == 200
+        body = response.get_json()
+        assert len(body['products']) <= limit
+        ids.extend(product['id'] for product in body['products'])
+        cursor = body['next_cursor']
+        if cursor is None:
+            return ids
+
+
+@pytest.mark.parametrize('limit', [1, 3, 4, 5, 23, 50])
+def test_cursor_walk_visits_every_product_once_across_tied_timestamps(client, tied_catalog, limit):
+    ids = _walk(client, limit)
+
+    assert ids == [product.id for product in tied_catalog]
+
+
+def test_cursor_inside_a_run_of_tied_timestamps_resumes_after_it(client, tied_catalog):
+    # The third product shares its timestamp with the first four
+    last = tied_catalog[2]
+
+    response = client.get(f'/products?limit=3&cursor={encode_cursor(last.created_at_utc, last.id)}')
+
+    assert [product['id'] for product in response.get_json()['products']] == [p.id for p in tied_catalog[3:6]]
+
+
+def _b64(raw):
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+@pytest.mark.parametrize('cursor', [
+    'garbage!',
+    _b64('not-a-date|1'),
+    _b64('2024-01-01T00:00:00|not-an-id'),
+    _b64('2024-01-01T00:00:00'),
+    _b64('2024-01-01T00:00:00|1|2'),
+    encode_cursor(datetime(2024, 1, 1), 5)[:-3],
+])
+def test_malformed_or_tampered_cursor_is_a_bad_request(client, tied_catalog, cursor):
+    response = client.get(f'/products?cursor={cursor}')
+
+    assert response.status_code == 400
+    assert response.get_json() == {'error': 'Invalid cursor'}
@@ -0,0 +1,173 @@
+import io
+import os
+from datetime import datetime, timedelta
+
+import pytest
+from PIL import Image
+from sqlalchemy import event, select
+
+import blob_store
+import image_pipeline
+import image_worker
+import product_service
+from contracts import ConfirmImageUploadsRequest, CreateProductRequest, ProductListRequest
+from counts import CountProvider
+from enums import ImageStatusEnum
+from image_pipeline import Derivative
+from models import User, Product, ProductImage, ProductImageVariant
+from storage_backend import LocalStorageBackend
+
+
+@pytest.fixture
+def storage(tmp_path, monkeypatch):
+    storage = LocalStorageBackend(str(tmp_path), 'http://localhost/media')
+    monkeypatch.setattr(product_service, 'get_storage_backend', lambda: storage)
+    return storage
+
+
+@pytest.fixture
+def submitted(monkeypatch):
+    submitted = []
+    monkeypatch.setattr(product_service.image_worker, 'submit', submitted.append)
+    return submitted
+
+
+@pytest.fixture
+def product(db):
+    vendor = User(email='vendor@example.com', password_hash='-', first_name='V', last_name='V', user_type='vendor')
+    product = Product(name='Mug', price=12.0, owner=vendor)
+    db.add_all([vendor, product])
+    db.commit()
+    return product
+
+
+@pytest.fixture
+def catalog(db):
+    vendor = User(email='catalog@example.com', password_hash='-', first_name='C', last_name='V', user_type='vendor')
+    base = datetime(2024, 1, 1)
+    for i in range(100):
+        product = Product(name=f'Product {i}', price=10.0, owner=vendor, created_at_utc=base + timedelta(minutes=i))
+        for j in range(3):
+            image = ProductImage(product=product, url=f'https://cdn/{i}-{j}.jpg', is_primary=(j == 0))
+            image.variants = [ProductImageVariant(name='thumbnail', url=f'https://cdn/{i}-{j}_thumbnail.webp', width=256, height=256)]
+        db.add(product)
+    db.commit()
+    return vendor.id
+
+
+def _upload(storage, product, name):
+    path = f'{product_service.UPLOAD_PREFIX}{product.id}/{name}'
+    storage.put(io.BytesIO(b'image bytes'), path)
+    return path
+
+
+def test_retried_confirm_returns_images_already_processed(db, storage, submitted, product):
+    path = _upload(storage, product, 'a.jpg')
+    service = product_service.ProductService(db)
+    request = ConfirmImageUploadsRequest(object_paths=[path])
+
+    first = service.confirm_image_uploads(product.id, product.owner_id, request)
+
+    # The worker processes the image and removes the raw upload
+    image = db.scalar(select(ProductImage).where(ProductImage.upload_path == path))
+    image.status, image.url, image.source_ref = ImageStatusEnum.READY.value, 'https://cdn/a.jpg', None
+    db.commit()
+    storage.delete(path)
+
+    second = service.confirm_image_uploads(product.id, product.owner_id, request)
+
+    assert len(first.images) == len(second.images) == 1
+    assert second.images[0].url == 'https://cdn/a.jpg'
+    assert submitted == [image.id]
+
+
+def test_confirm_adds_only_new_uploads(db, storage, submitted, product):
+    first_path = _upload(storage, product, 'a.jpg')
+    second_path = _upload(storage, product, 'b.jpg')
+    service = product_service.ProductService(db)
+
+    service.confirm_image_uploads(product.id, product.owner_id, ConfirmImageUploadsRequest(object_paths=[first_path]))
+    result = service.confirm_image_uploads(
+        product.id, product.owner_id, ConfirmImageUploadsRequest(object_paths=[first_path, second_path])
+    )
+
+    assert len(result.images) == 2
+    assert [image.is_primary for image in result.images].count(True) == 1
+    assert len(submitted) == 2
+
+
+@pytest.mark.parametrize('name', ['..', '.', ''])
+def test_confirm_rejects_dot_segments(db, storage, submitted, product, name):
+    path = f'{product_service.UPLOAD_PREFIX}{product.id}/{name}'
+
+    with pytest.raises(ValueError):
+        product_service.ProductService(db).confirm_image_uploads(
+            product.id, product.owner_id, ConfirmImageUploadsRequest(object_paths=[path])
+        )
+    assert submitted == []
+
+
+@pytest.mark.parametrize('path', ['../outside.jpg', 'uploads/1/../../outside.jpg', '/etc/passwd', 'uploads//a.jpg'])
+def test_local_storage_rejects_paths_outside_the_root(storage, path):
+    with pytest.raises(ValueError):
+        storage.local_path(path)
+
+
+def test_listing_query_count_does_not_grow_with_page_size(engine, db, catalog, monkeypatch):
+    # Count on every call so each page issues the same statements
+    monkeypatch.setattr(product_service, 'count_provider', CountProvider('exact'))
+    service = product_service.ProductService(db)
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    listings = {
+        'catalog': lambda request: service.get_all_products(request),
+        'vendor': lambda request: service.get_my_products(catalog, request),
+    }
+    event.listen(engine, 'before_cursor_execute', record)
+    try:
+        for name, listing in listings.items():
+            counts = {}
+            for limit in (10, 50, 100):
+                db.expunge_all()
+                statements.clear()
+                result = listing(ProductListRequest(page=1, limit=limit))
+                assert len(result.products) == limit
+                assert all(len(product.images) == 3 and product.images[0].thumbnail_url for product in result.products)
+                counts[limit] = len(statements)
+            assert len(set(counts.values())) == 1, f'{name} listing statements per page size: {counts}'
+    finally:
+        event.remove(engine, 'before_cursor_execute', record)
+
+
+def test_create_product_without_the_worker_stores_derivatives(engine, db, storage, tmp_path, monkeypatch):
+    monkeypatch.setattr(product_service, 'BACKGROUND_IMAGE_PROCESSING', False)
+    monkeypatch.setattr(blob_store, 'engine', engine)
+    monkeypatch.setattr(blob_store, 'get_storage_backend', lambda: storage)
+    monkeypatch.setattr(image_worker, 'get_storage_backend', lambda: storage)
+    monkeypatch.setattr(image_worker, 'IMAGE_STAGING_DIR', str(tmp_path / 'staging'))
+    # Render in-process rather than on the spawned pool
+    monkeypatch.setattr(image_worker, 'generate_derivatives', lambda path: [
+        Derivative(*rendered) for rendered in image_pipeline._render_derivatives(path)
+    ])
+    vendor = User(email='vendor@example.com', password_hash='-', first_name='V', last_name='V', user_type='vendor')
+    db.add(vendor)
+    db.commit()
+    png = io.BytesIO()
+    Image.new('RGB', (1200, 600), 'teal').save(png, 'PNG')
+    png.seek(0)
+
+    result = product_service.ProductService(db).create_product(
+        CreateProductRequest(name='Mug', price=12.0), vendor.id, [(png, 'mug.png')]
+    )
+
+    assert result.images[0].url and result.images[0].thumbnail_url
+    image = db.scalar(select(ProductImage).where(ProductImage.product_id == result.id))
+    assert image.status == ImageStatusEnum.READY.value
+    assert {variant.name: (variant.width, variant.height) for variant in image.variants} == {
+        'thumbnail': (320, 160), 'medium': (1024, 512), 'original': (1200, 600)
+    }
+    assert image.thumbnail_url == result.images[0].thumbnail_url
+    assert os.listdir(tmp_path / 'staging') == []
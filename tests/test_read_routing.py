@@ -0,0 +1,64 @@
+import threading
+from contextlib import contextmanager
+
+import pytest
+
+import read_routing
+
+
+class SlowReplica:
+    """Stands in for the replica engine; connections block until released."""
+
+    def __init__(self, lag=0.0):
+        self.lag = lag
+        self.connecting = threading.Event()
+        self.release = threading.Event()
+
+    @contextmanager
+    def connect(self):
+        self.connecting.set()
+        self.release.wait(5)
+        yield self
+
+    def scalar(self, stmt):
+        return self.lag
+
+
+@pytest.fixture(autouse=True)
+def no_redis(monkeypatch):
+    monkeypatch.setattr(read_routing, 'RESPONSE_CACHE_REDIS_URL', None)
+
+
+def test_replica_is_not_used_when_write_marks_are_per_process():
+    primary, replica = object(), SlowReplica()
+    router = read_routing.ReadRouter(primary, replica)
+
+    assert router.replica is None
+    assert router.engine_for('user:1') is primary
+
+
+def test_single_process_router_sends_reads_to_the_replica_until_a_write():
+    primary, replica = object(), SlowReplica()
+    replica.release.set()
+    router = read_routing.ReadRouter(primary, replica, check_seconds=60, single_process=True)
+
+    assert router.engine_for('user:1') is replica
+    router.record_write('user:1')
+    assert router.engine_for('user:1') is primary
+    assert router.engine_for('user:2') is replica
+
+
+def test_slow_lag_check_does_not_block_other_reads():
+    primary, replica = object(), SlowReplica()
+    router = read_routing.ReadRouter(primary, replica, single_process=True)
+
+    checker = threading.Thread(target=router.replica_horizon)
+    checker.start()
+    assert replica.connecting.wait(5)
+
+    # Served from the previous (empty) horizon while the check is in flight
+    assert router.engine_for('user:1') is primary
+
+    replica.release.set()
+    checker.join(5)
+    assert router.replica_horizon() is not None
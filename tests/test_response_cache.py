@@ -0,0 +1,61 @@
+import pytest
+from sqlalchemy.orm import Session
+
+from models import User, Product
+
+
+@pytest.fixture
+def vendor(engine):
+    with Session(engine, expire_on_commit=False) as db:
+        vendor = User(
+            email='vendor@example.com', password_hash='-', first_name='V', last_name='V',
+            user_type='vendor', is_email_verified=True
+        )
+        db.add_all([vendor, Product(name='Mug', price=12.0, owner=vendor)])
+        db.commit()
+        return vendor
+
+
+def test_repeated_get_with_matching_etag_is_not_modified(client, vendor):
+    first = client.get('/products')
+    etag = first.headers['ETag']
+
+    second = client.get('/products', headers={'If-None-Match': etag})
+
+    assert first.status_code == 200
+    assert first.get_json()['total'] == 1
+    assert second.status_code == 304
+    assert second.get_data() == b''
+    assert second.headers['ETag'] == etag
+
+
+def test_stale_etag_gets_the_full_body(client, vendor):
+    response = client.get('/products', headers={'If-None-Match': '"stale"'})
+
+    assert response.status_code == 200
+    assert response.get_json()['total'] == 1
+
+
+def test_creating_a_product_changes_the_listing_etag(client, vendor, bearer):
+    before = client.get('/products')
+
+    created = client.post('/products/create', data={'name': 'Bowl', 'price': '20'}, headers=bearer(vendor))
+    after = client.get('/products', headers={'If-None-Match': before.headers['ETag']})
+
+    assert created.status_code == 201
+    assert after.status_code == 200
+    assert after.headers['ETag'] != before.headers['ETag']
+    assert [product['name'] for product in after.get_json()['products']] == ['Bowl', 'Mug']
+
+
+def test_deleting_a_product_changes_the_listing_etag(client, vendor, bearer):
+    before = client.get('/products')
+    product_id = before.get_json()['products'][0]['id']
+
+    deleted = client.delete(f'/products/{product_id}', headers=bearer(vendor))
+    after = client.get('/products', headers={'If-None-Match': before.headers['ETag']})
+
+    assert deleted.status_code == 200
+    assert after.status_code == 200
+    assert after.headers['ETag'] != before.headers['ETag']
+    assert after.get_json()['products'] == []
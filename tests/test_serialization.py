@@ -0,0 +1,51 @@
+import asyncio
+import json
+from datetime import datetime
+
+from flask import Flask, jsonify
+from quart import Quart
+
+from contracts import OrderResponse, OrderItem
+from serialization import dumps, json_response
+
+
+def _order():
+    return OrderResponse(
+        id=1, customer_id=2, total_amount=0.1 + 0.2, shipping_address='1 Main St', status='PLACED',
+        created_at_utc=datetime(2024, 1, 2, 3, 4, 5),
+        items=[OrderItem(id=3, product_id=4, product_name='Mug', product_price=12.5, quantity=2, total_price=25.0)]
+    )
+
+
+def test_dumps_matches_jsonify_encoding():
+    order = _order()
+    with Flask(__name__).app_context():
+        expected = json.loads(jsonify(order.model_dump()).get_data())
+
+    assert json.loads(dumps(order)) == expected
+
+
+def test_dumps_writes_http_dates_and_shortest_floats():
+    body = dumps(_order())
+
+    assert b'"created_at_utc":"Tue, 02 Jan 2024 03:04:05 GMT"' in body
+    assert b'"total_amount":0.30000000000000004' in body
+    assert b'"total_price":25.0' in body
+
+
+def test_json_response_is_served_by_flask_and_quart():
+    flask_app, quart_app = Flask(__name__), Quart(__name__)
+    flask_app.route('/order')(lambda: json_response(_order(), 201))
+
+    @quart_app.route('/order')
+    async def order():
+        return json_response(_order(), 201)
+
+    async def quart_get():
+        response = await quart_app.test_client().get('/order')
+        return response.status_code, response.mimetype, await response.get_data()
+
+    flask_response = flask_app.test_client().get('/order')
+    served = [(flask_response.status_code, flask_response.mimetype, flask_response.get_data()), asyncio.run(quart_get())]
+
+    assert served == [(201, 'application/json', dumps(_order()) + b'\n')] * 2
@@ -0,0 +1,86 @@
+import time
+
+import jwt
+import pytest
+
+import auth
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(auth, 'time', clock)
+    return clock
+
+
+def test_entry_is_not_served_after_exp(clock):
+    cache = auth.TokenCache()
+    cache.put('token', {'sub': '1', 'exp': clock.now + 60})
+
+    assert cache.get('token') == {'sub': '1', 'exp': clock.now + 60}
+    clock.now += 60
+    assert cache.get('token') is None
+    assert cache.stats() == {'hits': 1, 'misses': 1, 'size': 0}
+
+
+def test_payload_without_numeric_exp_is_not_cached(clock):
+    cache = auth.TokenCache()
+    cache.put('token', {'sub': '1'})
+
+    assert cache.get('token') is None
+    assert cache.stats()['size'] == 0
+
+
+def test_least_recently_used_entry_is_evicted_at_the_bound(clock):
+    cache = auth.TokenCache(max_entries=3)
+    for token in ('a', 'b', 'c'):
+        cache.put(token, {'sub': token, 'exp': clock.now + 60})
+    cache.get('a')
+
+    for token in ('d', 'e'):
+        cache.put(token, {'sub': token, 'exp': clock.now + 60})
+        assert cache.stats()['size'] <= 3
+
+    assert [token for token in 'abcde' if cache.get(token)] == ['a', 'd', 'e']
+
+
+def test_hits_and_misses_are_counted(clock):
+    cache = auth.TokenCache()
+    cache.get('token')
+    cache.put('token', {'sub': '1', 'exp': clock.now + 60})
+    cache.get('token')
+    cache.get('token')
+    cache.get('other')
+
+    assert cache.stats() == {'hits': 2, 'misses': 2, 'size': 1}
+
+
+def test_cached_payload_is_a_copy(clock):
+    cache = auth.TokenCache()
+    cache.put('token', {'sub': '1', 'exp': clock.now + 60})
+
+    cache.get('token')['sub'] = '2'
+
+    assert cache.get('token')['sub'] == '1'
+
+
+def test_verify_token_stops_accepting_a_cached_token_at_exp(monkeypatch):
+    monkeypatch.setattr(auth, 'token_cache', auth.TokenCache())
+    exp = int(time.time()) + 1
+    token = jwt.encode({'sub': '1', 'exp': exp}, auth.JWT_SECRET_KEY, algorithm=auth.JWT_ALGORITHM)
+
+    assert auth.verify_token(token)['sub'] == '1'
+    assert auth.verify_token(token)['sub'] == '1'
+    assert auth.token_cache.stats()['hits'] == 1
+    while time.time() < exp:
+        time.sleep(0.05)
+
+    assert auth.verify_token(token) is None
@@ -0,0 +1,114 @@
+import io
+import json
+
+import pytest
+from sqlalchemy.orm import Session
+from werkzeug.security import generate_password_hash
+
+import app as app_module
+import auth
+from models import User
+
+
+@pytest.fixture
+def importer(engine, monkeypatch):
+    monkeypatch.setattr(auth, 'engine', engine)
+    monkeypatch.setattr(auth, 'token_versions', auth.TokenVersionCache(ttl_seconds=60))
+    # Hash in-process with a cheap method instead of on the process pool
+    monkeypatch.setattr(auth, 'hash_passwords', lambda passwords: [
+        generate_password_hash(password, 'pbkdf2:sha256:1000') for password in passwords
+    ])
+    with Session(engine) as db:
+        db.add(User(
+            email='existing@example.com', password_hash='-', first_name='E', last_name='X',
+            user_type='customer', is_email_verified=True
+        ))
+        db.commit()
+    return auth.AuthService()
+
+
+def _row(email, **overrides):
+    row = {'email': email, 'password': 'password123', 'first_name': 'Imp', 'last_name': 'Orted', 'user_type': 'customer'}
+    row.update(overrides)
+    return row
+
+
+def test_duplicate_and_existing_emails_are_conflicts(engine, importer):
+    results = importer._import_batch(list(enumerate([
+        _row('new@example.com'),
+        _row('new@example.com'),
+        _row('existing@example.com'),
+    ], start=1)))
+
+    assert [(r['row'], r['status']) for r in results] == [(1, 'created'), (2, 'conflict'), (3, 'conflict')]
+    with Session(engine) as db:
+        created = db.get(User, int(results[0]['user_id']))
+        assert created.email == 'new@example.com'
+        assert not created.is_email_verified
+
+
+def test_invalid_rows_are_reported_with_their_line_number(importer):
+    results = importer._import_batch([
+        (7, _row('not-an-email')),
+        (8, {'_error': 'Invalid JSON: Expecting value'}),
+        (9, _row('short@example.com', password='short')),
+        (10, _row('admin@example.com', user_type='admin')),
+        (11, _row('valid@example.com')),
+    ])
+
+    assert [(r['row'], r['status']) for r in results] == [
+        (7, 'invalid'), (8, 'invalid'), (9, 'invalid'), (10, 'invalid'), (11, 'created')
+    ]
+    assert results[1]['error'] == 'Invalid JSON: Expecting value'
+    assert 'password' in results[2]['error']
+
+
+def test_results_stay_in_order_across_batches(importer, monkeypatch):
+    monkeypatch.setattr(auth, 'USER_IMPORT_BATCH_SIZE', 2)
+    rows = [
+        _row('a@example.com'),
+        _row('b@example.com'),
+        _row('a@example.com'),
+        _row('bad'),
+        _row('c@example.com'),
+    ]
+
+    *results, summary = importer.import_users(rows)
+
+    assert [(r['row'], r['status']) for r in results] == [
+        (1, 'created'), (2, 'created'), (3, 'conflict'), (4, 'invalid'), (5, 'created')
+    ]
+    assert summary == {'summary': {'created': 3, 'conflict': 1, 'invalid': 1}}
+
+
+def _client_for(engine, monkeypatch, user_type):
+    monkeypatch.setattr(app_module, 'image_worker', type('Idle', (), {'start': lambda self: None})())
+    with Session(engine) as db:
+        user = User(
+            email=f'{user_type}@example.com', password_hash='-', first_name='A', last_name='B',
+            user_type=user_type, is_email_verified=True
+        )
+        db.add(user)
+        db.commit()
+        token = auth.create_access_token(auth.access_token_claims(user))
+    return app_module.app.test_client(), {'Authorization': f'Bearer {token}'}
+
+
+def test_import_endpoint_streams_results_for_admins(engine, importer, monkeypatch):
+    client, headers = _client_for(engine, monkeypatch, 'admin')
+    body = '\n'.join(json.dumps(row) for row in [_row('x@example.com'), _row('existing@example.com')])
+
+    response = client.post('/auth/import', data=io.BytesIO(body.encode()), headers=headers, content_type='application/x-ndjson')
+
+    assert response.status_code == 200
+    lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert [line.get('status') for line in lines[:2]] == ['created', 'conflict']
+    assert lines[-1] == {'summary': {'created': 1, 'conflict': 1, 'invalid': 0}}
+
+
+def test_import_endpoint_is_admin_only(engine, importer, monkeypatch):
+    client, headers = _client_for(engine, monkeypatch, 'vendor')
+
+    response = client.post('/auth/import', data=json.dumps(_row('x@example.com')), headers=headers, content_type='application/x-ndjson')
+
+    assert response.status_code == 403